@@ -1,9 +1,29 @@
-from app.agent.base import BaseAgent
-from app.agent.browser import BrowserAgent
-from app.agent.mcp import MCPAgent
-from app.agent.react import ReActAgent
-from app.agent.swe import SWEAgent
-from app.agent.toolcall import ToolCallAgent
+from typing import TYPE_CHECKING
+
+from app.lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from app.agent.base import BaseAgent
+    from app.agent.browser import BrowserAgent
+    from app.agent.mcp import MCPAgent
+    from app.agent.react import ReActAgent
+    from app.agent.swe import SWEAgent
+    from app.agent.toolcall import ToolCallAgent
+
+
+# Agents are imported on first access, see app.tool for the rationale
+__getattr__ = lazy_exports(
+    __name__,
+    {
+        "BaseAgent": "app.agent.base",
+        "BrowserAgent": "app.agent.browser",
+        "MCPAgent": "app.agent.mcp",
+        "ReActAgent": "app.agent.react",
+        "SWEAgent": "app.agent.swe",
+        "ToolCallAgent": "app.agent.toolcall",
+    },
+)
 
 
 __all__ = [
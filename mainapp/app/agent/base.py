@@ -1,15 +1,40 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
-from typing import List, Optional
-
-from pydantic import BaseModel, Field, model_validator
-
+from typing import AsyncIterator, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+
+from app.budget import RunBudget
+from app.events import (
+    BaseEvent,
+    StepFinished,
+    StepStarted,
+    collect_result,
+    emit,
+    is_streaming,
+    stream_events,
+)
+from app.exceptions import BudgetExceeded
 from app.llm import LLM
 from app.logger import logger
-from app.sandbox.client import SANDBOX_CLIENT
+from app.profiling.cpu import profile_phase
+from app.profiling.memory import record_step
+from app.run import run_scope
+from app.sandbox.client import current_sandbox_client
 from app.schema import ROLE_TYPE, AgentState, Memory, Message
 
 
+class AgentSnapshot(BaseModel):
+    """The run state of an agent at one point, see BaseAgent.snapshot()."""
+
+    memory: Memory
+    state: AgentState
+    current_step: int
+    next_step_prompt: Optional[str] = None
+
+
 class BaseAgent(BaseModel, ABC):
     """Abstract base class for managing agent state and execution.
 
@@ -40,8 +65,17 @@ class BaseAgent(BaseModel, ABC):
     max_steps: int = Field(default=10, description="Maximum steps before termination")
     current_step: int = Field(default=0, description="Current step in execution")
 
+    budget: Optional[RunBudget] = Field(
+        None, description="Run budget, the enclosing flow's budget applies if unset"
+    )
+
     duplicate_threshold: int = 2
 
+    # Fields passed to the constructor, copied by spawn()
+    _init_fields: frozenset = PrivateAttr(default=frozenset())
+    # Why the last run stopped before the agent finished, see stop_reason
+    _stop_reason: Optional[str] = PrivateAttr(default=None)
+
     class Config:
         arbitrary_types_allowed = True
         extra = "allow"  # Allow extra fields for flexibility in subclasses
@@ -49,12 +83,59 @@ class BaseAgent(BaseModel, ABC):
     @model_validator(mode="after")
     def initialize_agent(self) -> "BaseAgent":
         """Initialize agent with default settings if not provided."""
+        self._init_fields = frozenset(self.model_fields_set)
         if self.llm is None or not isinstance(self.llm, LLM):
             self.llm = LLM(config_name=self.name.lower())
         if not isinstance(self.memory, Memory):
             self.memory = Memory()
         return self
 
+    def spawn(self) -> "BaseAgent":
+        """Create an idle agent with the same configuration.
+
+        Flows use this to run independent steps in parallel. Values passed to
+        the constructor are shared with the copy; fields left at their
+        defaults, such as tool collections built by ``default_factory``, are
+        created fresh, so the copy gets its own tools and an empty memory.
+        """
+        shared = self._init_fields - {"memory", "state", "current_step"}
+        return type(self)(**{name: getattr(self, name) for name in shared})
+
+    @property
+    def stop_reason(self) -> Optional[str]:
+        """Why the last run was cut short by its budget or step limit, else None"""
+        return self._stop_reason
+
+    def snapshot(self) -> AgentSnapshot:
+        """Capture memory, state and step count, also between steps of a run.
+
+        The snapshot holds copies, later steps of the agent do not change it.
+        """
+        return AgentSnapshot(
+            memory=self.memory.model_copy(deep=True),
+            state=self.state,
+            current_step=self.current_step,
+            next_step_prompt=self.next_step_prompt,
+        )
+
+    def restore(self, snapshot: AgentSnapshot) -> None:
+        """Reset memory, state and step count to a snapshot"""
+        self.memory = snapshot.memory.model_copy(deep=True)
+        self.state = snapshot.state
+        self.current_step = snapshot.current_step
+        self.next_step_prompt = snapshot.next_step_prompt
+
+    def fork(self, snapshot: Optional[AgentSnapshot] = None) -> "BaseAgent":
+        """Create a copy that continues from a snapshot, the current state by default.
+
+        The copy is built by spawn(), so it has tools of its own, and is left
+        idle: run() on it carries on from the snapshot's memory and step.
+        """
+        agent = self.spawn()
+        agent.restore(snapshot or self.snapshot())
+        agent.state = AgentState.IDLE
+        return agent
+
     @asynccontextmanager
     async def state_context(self, new_state: AgentState):
         """Context manager for safe agent state transitions.
@@ -125,34 +206,98 @@ class BaseAgent(BaseModel, ABC):
         Raises:
             RuntimeError: If the agent is not in IDLE state at start.
         """
+        if not is_streaming():
+            return await self._run_loop(request)
+        return await collect_result(self.run_stream(request))
+
+    async def run_stream(
+        self, request: Optional[str] = None
+    ) -> AsyncIterator[BaseEvent]:
+        """Execute the agent's main loop, yielding progress events as they happen.
+
+        The last event is RunFinished carrying the result run() would return.
+        Closing the generator early cancels the run.
+
+        Args:
+            request: Optional initial user request to process.
+        """
+        events = stream_events(lambda: self._run_loop(request), source=self.name)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    async def _run_loop(self, request: Optional[str] = None) -> str:
         if self.state != AgentState.IDLE:
             raise RuntimeError(f"Cannot run agent from state: {self.state}")
 
         if request:
             self.update_memory("user", request)
 
+        self._stop_reason = None
         results: List[str] = []
-        async with self.state_context(AgentState.RUNNING):
-            while (
-                self.current_step < self.max_steps and self.state != AgentState.FINISHED
-            ):
-                self.current_step += 1
-                logger.info(f"Executing step {self.current_step}/{self.max_steps}")
-                step_result = await self.step()
-
-                # Check for stuck state
-                if self.is_stuck():
-                    self.handle_stuck_state()
-
-                results.append(f"Step {self.current_step}: {step_result}")
-
-            if self.current_step >= self.max_steps:
-                self.current_step = 0
-                self.state = AgentState.IDLE
-                results.append(f"Terminated: Reached max steps ({self.max_steps})")
-        await SANDBOX_CLIENT.cleanup()
+        with run_scope(self.name, self.budget) as budget:
+            async with self.state_context(AgentState.RUNNING):
+                while (
+                    self.current_step < self.max_steps
+                    and self.state != AgentState.FINISHED
+                ):
+                    self.current_step += 1
+                    logger.info(f"Executing step {self.current_step}/{self.max_steps}")
+                    emit(StepStarted(step=self.current_step, max_steps=self.max_steps))
+                    started_at = time.monotonic()
+                    try:
+                        with profile_phase("step"), logger.contextualize(
+                            step=self.current_step
+                        ):
+                            step_result = await self._run_step(budget)
+                    except BudgetExceeded as e:
+                        logger.warning(f"Stopping at step {self.current_step}: {e}")
+                        self._stop_reason = str(e)
+                        self.current_step = 0
+                        results.append(f"Terminated: {e}")
+                        break
+
+                    # Check for stuck state
+                    if self.is_stuck():
+                        self.handle_stuck_state()
+
+                    record_step(self, self.current_step)
+
+                    emit(
+                        StepFinished(
+                            step=self.current_step,
+                            result=step_result,
+                            duration=time.monotonic() - started_at,
+                        )
+                    )
+                    results.append(f"Step {self.current_step}: {step_result}")
+
+                if self.current_step >= self.max_steps:
+                    self.current_step = 0
+                    self.state = AgentState.IDLE
+                    self._stop_reason = f"Reached max steps ({self.max_steps})"
+                    results.append(f"Terminated: {self._stop_reason}")
+        await current_sandbox_client().cleanup()
         return "\n".join(results) if results else "No steps executed"
 
+    async def _run_step(self, budget: Optional[RunBudget]) -> str:
+        """Run a single step, cancelling it if it would outlive the run budget."""
+        if budget is None:
+            return await self.step()
+
+        budget.check()
+        try:
+            async with asyncio.timeout(budget.remaining_time()) as deadline:
+                return await self.step()
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            raise BudgetExceeded(
+                budget.exceeded_reason() or "wall time budget exhausted"
+            ) from None
+
     @abstractmethod
     async def step(self) -> str:
         """Execute a single step in the agent's workflow.
@@ -1,12 +1,13 @@
+import asyncio
 import json
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Tuple
 
 from pydantic import Field, model_validator
 
 from app.agent.toolcall import ToolCallAgent
 from app.logger import logger
 from app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
-from app.schema import Message, ToolChoice
+from app.schema import Message, ToolCall, ToolChoice
 from app.tool import BrowserUseTool, Terminate, ToolCollection
 
 
@@ -15,33 +16,79 @@ if TYPE_CHECKING:
     from app.agent.base import BaseAgent  # Or wherever memory is defined
 
 
+BROWSER_TOOL_NAME = BrowserUseTool.model_fields["name"].default
+
+
 class BrowserContextHelper:
     def __init__(self, agent: "BaseAgent"):
         self.agent = agent
         self._current_base64_image: Optional[str] = None
+        # Background capture of the state for the next step, see schedule_prefetch
+        self._prefetch: Optional[asyncio.Task] = None
 
     async def get_browser_state(self) -> Optional[dict]:
-        browser_tool = self.agent.available_tools.get_tool(BrowserUseTool().name)
+        browser_state, self._current_base64_image = await self._capture_state()
+        return browser_state
+
+    async def _capture_state(self) -> Tuple[Optional[dict], Optional[str]]:
+        """Get the browser state and screenshot without touching helper state."""
+        browser_tool = self.agent.available_tools.get_tool(BROWSER_TOOL_NAME)
         if not browser_tool or not hasattr(browser_tool, "get_current_state"):
             logger.warning("BrowserUseTool not found or doesn't have get_current_state")
-            return None
+            return None, None
         try:
             result = await browser_tool.get_current_state()
             if result.error:
                 logger.debug(f"Browser state error: {result.error}")
-                return None
-            if hasattr(result, "base64_image") and result.base64_image:
-                self._current_base64_image = result.base64_image
-            else:
-                self._current_base64_image = None
-            return json.loads(result.output)
+                return None, None
+            return json.loads(result.output), getattr(result, "base64_image", None)
         except Exception as e:
             logger.debug(f"Failed to get browser state: {str(e)}")
-            return None
+            return None, None
+
+    def schedule_prefetch(self) -> None:
+        """Start capturing the state for the next step in the background.
+
+        Called right after a browser action so the capture overlaps with the
+        remaining tool calls of the step instead of delaying the next LLM call.
+        """
+        self.invalidate_prefetch()
+        self._prefetch = asyncio.create_task(self._capture_state())
+
+    def invalidate_prefetch(self) -> None:
+        """Drop a pending capture, e.g. because another action changes the page."""
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+            self._prefetch = None
+
+    @property
+    def has_prefetch(self) -> bool:
+        return self._prefetch is not None
+
+    def on_tool_start(self, name: str) -> None:
+        if name == BROWSER_TOOL_NAME:
+            self.invalidate_prefetch()
+
+    def on_tool_end(self, name: str) -> None:
+        if name == BROWSER_TOOL_NAME:
+            self.schedule_prefetch()
+
+    async def _take_browser_state(self) -> Optional[dict]:
+        """Use the prefetched state if there is one, otherwise capture it now."""
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return await self.get_browser_state()
+        try:
+            browser_state, self._current_base64_image = await prefetch
+        except asyncio.CancelledError:
+            if not prefetch.cancelled():
+                raise
+            return await self.get_browser_state()
+        return browser_state
 
     async def format_next_step_prompt(self) -> str:
         """Gets browser state and formats the browser prompt."""
-        browser_state = await self.get_browser_state()
+        browser_state = await self._take_browser_state()
         url_info, tabs_info, content_above_info, content_below_info = "", "", "", ""
         results_info = ""  # Or get from agent if needed elsewhere
 
@@ -74,7 +121,8 @@ class BrowserContextHelper:
         )
 
     async def cleanup_browser(self):
-        browser_tool = self.agent.available_tools.get_tool(BrowserUseTool().name)
+        self.invalidate_prefetch()
+        browser_tool = self.agent.available_tools.get_tool(BROWSER_TOOL_NAME)
         if browser_tool and hasattr(browser_tool, "cleanup"):
             await browser_tool.cleanup()
 
@@ -119,6 +167,12 @@ class BrowserAgent(ToolCallAgent):
         )
         return await super().think()
 
+    def _on_tool_start(self, command: ToolCall) -> None:
+        self.browser_context_helper.on_tool_start(command.function.name)
+
+    def _on_tool_end(self, command: ToolCall, result: str) -> None:
+        self.browser_context_helper.on_tool_end(command.function.name)
+
     async def cleanup(self):
         """Clean up browser agent resources by calling parent cleanup."""
         await self.browser_context_helper.cleanup_browser()
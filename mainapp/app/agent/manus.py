@@ -1,18 +1,17 @@
+import asyncio
 from typing import Dict, List, Optional
 
-from pydantic import Field, model_validator
+from pydantic import Field, PrivateAttr, model_validator
 
-from app.agent.browser import BrowserContextHelper
+from app.agent.browser import BROWSER_TOOL_NAME, BrowserContextHelper
 from app.agent.toolcall import ToolCallAgent
 from app.config import config
 from app.logger import logger
 from app.prompt.manus import NEXT_STEP_PROMPT, SYSTEM_PROMPT
+from app.schema import ToolCall
 from app.tool import Terminate, ToolCollection
-from app.tool.ask_human import AskHuman
-from app.tool.browser_use_tool import BrowserUseTool
 from app.tool.mcp import MCPClients, MCPClientTool
-from app.tool.python_execute import PythonExecute
-from app.tool.str_replace_editor import StrReplaceEditor
+from app.tool.registry import lazy_tool
 
 
 class Manus(ToolCallAgent):
@@ -30,14 +29,20 @@ class Manus(ToolCallAgent):
     # MCP clients for remote tool access
     mcp_clients: MCPClients = Field(default_factory=MCPClients)
 
-    # Add general-purpose tools to the tool collection
+    # Add general-purpose tools to the tool collection, each is constructed
+    # on first use
     available_tools: ToolCollection = Field(
         default_factory=lambda: ToolCollection(
-            PythonExecute(),
-            BrowserUseTool(),
-            StrReplaceEditor(),
-            AskHuman(),
-            Terminate(),
+            *(
+                lazy_tool(name)
+                for name in (
+                    "python_execute",
+                    "browser_use",
+                    "str_replace_editor",
+                    "ask_human",
+                    "terminate",
+                )
+            )
         )
     )
 
@@ -49,6 +54,8 @@ class Manus(ToolCallAgent):
         default_factory=dict
     )  # server_id -> url/command
     _initialized: bool = False
+    # Keeps a warm-up and the first step from connecting the servers twice
+    _init_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
 
     @model_validator(mode="after")
     def initialize_helper(self) -> "Manus":
@@ -64,6 +71,48 @@ class Manus(ToolCallAgent):
         instance._initialized = True
         return instance
 
+    def spawn(self) -> "Manus":
+        """Create an idle copy that shares this agent's MCP connections.
+
+        The copy gets the MCP tools connected so far instead of connecting the
+        servers again; the connections stay owned by this agent and are
+        closed by its cleanup().
+        """
+        agent = super().spawn()
+        if self._initialized:
+            agent.available_tools.add_tools(
+                *(
+                    tool
+                    for tool in self.available_tools.tools
+                    if isinstance(tool, MCPClientTool)
+                )
+            )
+            agent._initialized = True
+        return agent
+
+    async def warm_up(self) -> None:
+        """Connect MCP servers and index the tools ahead of the next run.
+
+        Callers can overlap this with other work, such as deciding whether a
+        query needs the agent at all; the first step then skips it.
+        """
+        await self._ensure_initialized()
+        if self.tool_selector is not None:
+            self.tool_selector.select(
+                self.available_tools, self.messages, pinned=self.special_tool_names
+            )
+
+    async def _ensure_initialized(self) -> None:
+        """Connect the MCP servers unless an earlier call already did.
+
+        The agent only counts as initialized once the connection attempt
+        returned, so a warm-up that failed is retried by the next step.
+        """
+        async with self._init_lock:
+            if not self._initialized:
+                await self.initialize_mcp_servers()
+                self._initialized = True
+
     async def initialize_mcp_servers(self) -> None:
         """Initialize connections to configured MCP servers."""
         for server_id, server_config in config.mcp_config.servers.items():
@@ -128,25 +177,34 @@ class Manus(ToolCallAgent):
         self.available_tools = ToolCollection(*base_tools)
         self.available_tools.add_tools(*self.mcp_clients.tools)
 
+    def _on_tool_start(self, command: ToolCall) -> None:
+        if self.browser_context_helper:
+            self.browser_context_helper.on_tool_start(command.function.name)
+
+    def _on_tool_end(self, command: ToolCall, result: str) -> None:
+        if self.browser_context_helper:
+            self.browser_context_helper.on_tool_end(command.function.name)
+
     async def cleanup(self):
         """Clean up Manus agent resources."""
         if self.browser_context_helper:
             await self.browser_context_helper.cleanup_browser()
-        # Disconnect from all MCP servers only if we were initialized
+        # Disconnect from all MCP servers only if we were initialized, copies
+        # made by spawn() connected none of their own
         if self._initialized:
-            await self.disconnect_mcp_server()
+            if self.connected_servers:
+                await self.disconnect_mcp_server()
             self._initialized = False
 
     async def think(self) -> bool:
         """Process current state and decide next actions with appropriate context."""
-        if not self._initialized:
-            await self.initialize_mcp_servers()
-            self._initialized = True
+        await self._ensure_initialized()
 
         original_prompt = self.next_step_prompt
         recent_messages = self.memory.messages[-3:] if self.memory.messages else []
-        browser_in_use = any(
-            tc.function.name == BrowserUseTool().name
+        # A pending prefetch means the browser was used in the last step
+        browser_in_use = self.browser_context_helper.has_prefetch or any(
+            tc.function.name == BROWSER_TOOL_NAME
             for msg in recent_messages
             if msg.tool_calls
             for tc in msg.tool_calls
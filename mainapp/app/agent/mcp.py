@@ -94,8 +94,12 @@ class MCPAgent(ToolCallAgent):
             return [], []
 
         # Get current tool schemas directly from the server
-        response = await self.mcp_clients.list_tools()
-        current_tools = {tool.name: tool.inputSchema for tool in response.tools}
+        responses = await self.mcp_clients.list_tools_by_server()
+        current_tools = {
+            tool.name: tool.inputSchema
+            for response in responses.values()
+            for tool in response.tools
+        }
 
         # Determine added, removed, and changed tools
         current_names = set(current_tools.keys())
@@ -129,6 +133,10 @@ class MCPAgent(ToolCallAgent):
         if changed_tools:
             logger.info(f"Changed MCP tools: {changed_tools}")
 
+        # Rebuild the client-side tool proxies so cached schemas stay current
+        if added_tools or removed_tools or changed_tools:
+            await self.mcp_clients.refresh_tools(responses)
+
         return added_tools, removed_tools
 
     async def think(self) -> bool:
@@ -174,12 +182,3 @@ class MCPAgent(ToolCallAgent):
         if self.mcp_clients.sessions:
             await self.mcp_clients.disconnect()
             logger.info("MCP connection closed")
-
-    async def run(self, request: Optional[str] = None) -> str:
-        """Run the agent with cleanup when done."""
-        try:
-            result = await super().run(request)
-            return result
-        finally:
-            # Ensure cleanup happens even if there's an error
-            await self.cleanup()
@@ -16,8 +16,9 @@ class SWEAgent(ToolCallAgent):
     system_prompt: str = SYSTEM_PROMPT
     next_step_prompt: str = ""
 
-    available_tools: ToolCollection = ToolCollection(
-        Bash(), StrReplaceEditor(), Terminate()
+    # Built per agent, so spawned and forked copies get a shell of their own
+    available_tools: ToolCollection = Field(
+        default_factory=lambda: ToolCollection(Bash(), StrReplaceEditor(), Terminate())
     )
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
@@ -1,15 +1,26 @@
 import asyncio
 import json
+import time
 from typing import Any, List, Optional, Union
 
 from pydantic import Field
 
 from app.agent.react import ReActAgent
+from app.events import ToolCallFinished, ToolCallStarted, emit, is_streaming
 from app.exceptions import TokenLimitExceeded
-from app.logger import logger
+from app.llm import ROUTINE, STRONG, current_llm_tier, tagged_tier, use_llm_tier
+from app.logger import log_payload, logger, truncate_payload
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
-from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
+from app.schema import (
+    TOOL_CHOICE_TYPE,
+    AgentState,
+    Message,
+    ToolCall,
+    ToolChoice,
+    ToolParams,
+)
 from app.tool import CreateChatCompletion, Terminate, ToolCollection
+from app.tool.tool_selector import ToolSelector
 
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
@@ -30,8 +41,14 @@ class ToolCallAgent(ReActAgent):
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # type: ignore
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
+    tool_selector: Optional[ToolSelector] = Field(default_factory=ToolSelector)
+
     tool_calls: List[ToolCall] = Field(default_factory=list)
     _current_base64_image: Optional[str] = None
+    _use_full_tool_set: bool = False
+    # Model cascade: steps left on the strong model, failed tool calls in a row
+    _escalated_steps: int = 0
+    _failed_tool_calls: int = 0
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
@@ -44,16 +61,18 @@ class ToolCallAgent(ReActAgent):
 
         try:
             # Get response with tool options
-            response = await self.llm.ask_tool(
-                messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
-                tools=self.available_tools.to_params(),
-                tool_choice=self.tool_choices,
-            )
+            with use_llm_tier(self._step_tier()):
+                response = await self.llm.ask_tool(
+                    messages=self.messages,
+                    system_msgs=(
+                        [Message.system_message(self.system_prompt)]
+                        if self.system_prompt
+                        else None
+                    ),
+                    tools=self._select_tool_params(),
+                    tool_choice=self.tool_choices,
+                    request_type="agent_step",
+                )
         except ValueError:
             raise
         except Exception as e:
@@ -78,7 +97,7 @@ class ToolCallAgent(ReActAgent):
         content = response.content if response and response.content else ""
 
         # Log response info
-        logger.info(f"✨ {self.name}'s thoughts: {content}")
+        log_payload("INFO", f"✨ {self.name}'s thoughts: ", content)
         logger.info(
             f"🛠️ {self.name} selected {len(tool_calls) if tool_calls else 0} tools to use"
         )
@@ -86,7 +105,9 @@ class ToolCallAgent(ReActAgent):
             logger.info(
                 f"🧰 Tools being prepared: {[call.function.name for call in tool_calls]}"
             )
-            logger.info(f"🔧 Tool arguments: {tool_calls[0].function.arguments}")
+            log_payload(
+                "INFO", "🔧 Tool arguments: ", tool_calls[0].function.arguments
+            )
 
         try:
             if response is None:
@@ -120,6 +141,7 @@ class ToolCallAgent(ReActAgent):
 
             return bool(self.tool_calls)
         except Exception as e:
+            self._escalate("the response could not be processed")
             logger.error(f"🚨 Oops! The {self.name}'s thinking process hit a snag: {e}")
             self.memory.add_message(
                 Message.assistant_message(
@@ -128,27 +150,93 @@ class ToolCallAgent(ReActAgent):
             )
             return False
 
+    def _step_tier(self) -> Optional[str]:
+        """The cascade tier of this step's LLM request.
+
+        Steps run on the cascade's fast model, unless the run is tagged
+        strong, until an error escalates the next few to the strong model.
+        """
+        if self._escalated_steps > 0:
+            self._escalated_steps -= 1
+            return STRONG
+        if self.llm.cascade_agent_steps and current_llm_tier() != STRONG:
+            return ROUTINE
+        return None
+
+    def _escalate(self, reason: str) -> None:
+        """Run the next steps on the strong model of the cascade"""
+        if not self.llm.cascade_llm or self._escalated_steps > 0:
+            return
+        logger.info(f"Escalating {self.name} to {self.llm.model}: {reason}")
+        self._escalated_steps = max(self.llm.escalation_steps, 1)
+        self._failed_tool_calls = 0
+
+    def _select_tool_params(self) -> ToolParams:
+        """Pick the tool schemas to send this step.
+
+        Falls back to the full tool set for one step after the model asked for
+        a tool that does not exist, in case the subset hid the one it needed.
+        """
+        if self.tool_selector is None or self._use_full_tool_set:
+            self._use_full_tool_set = False
+            return self.available_tools.to_params()
+        return self.tool_selector.select(
+            self.available_tools, self.messages, pinned=self.special_tool_names
+        )
+
     async def act(self) -> str:
         """Execute tool calls and handle their results"""
         if not self.tool_calls:
             if self.tool_choices == ToolChoice.REQUIRED:
+                self._escalate("no tool call in the response")
                 raise ValueError(TOOL_CALL_REQUIRED)
 
             # Return last message content if no tool calls
             return self.messages[-1].content or "No content or commands to execute"
 
         results = []
+        streaming = is_streaming()
         for command in self.tool_calls:
             # Reset base64_image for each tool call
             self._current_base64_image = None
 
-            result = await self.execute_tool(command)
+            if streaming:
+                emit(
+                    ToolCallStarted(
+                        tool=command.function.name,
+                        call_id=command.id,
+                        arguments=command.function.arguments,
+                    )
+                )
+            self._on_tool_start(command)
+            started_at = time.monotonic()
+            with logger.contextualize(
+                tool=command.function.name, tool_call_id=command.id
+            ):
+                result = await self.execute_tool(command)
+            self._on_tool_end(command, result)
+            success = not result.startswith("Error")
+            if streaming:
+                emit(
+                    ToolCallFinished(
+                        tool=command.function.name,
+                        call_id=command.id,
+                        result=result,
+                        success=success,
+                        duration=time.monotonic() - started_at,
+                    )
+                )
+            self._failed_tool_calls = 0 if success else self._failed_tool_calls + 1
+            if self._failed_tool_calls >= max(self.llm.escalate_after_failures, 1):
+                self._escalate(f"{self._failed_tool_calls} failed tool calls in a row")
 
             if self.max_observe:
                 result = result[: self.max_observe]
 
-            logger.info(
-                f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
+            log_payload(
+                "INFO",
+                f"🎯 Tool '{command.function.name}' completed its mission! Result: ",
+                result,
             )
 
             # Add tool response to memory
@@ -163,6 +251,12 @@ class ToolCallAgent(ReActAgent):
 
         return "\n\n".join(results)
 
+    def _on_tool_start(self, command: ToolCall) -> None:
+        """Hook called right before a tool call is executed"""
+
+    def _on_tool_end(self, command: ToolCall, result: str) -> None:
+        """Hook called right after a tool call finished, before the next one"""
+
     async def execute_tool(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
         if not command or not command.function or not command.function.name:
@@ -170,6 +264,8 @@ class ToolCallAgent(ReActAgent):
 
         name = command.function.name
         if name not in self.available_tools.tool_map:
+            self._use_full_tool_set = True
+            self._escalate(f"call of unknown tool '{name}'")
             return f"Error: Unknown tool '{name}'"
 
         try:
@@ -197,9 +293,10 @@ class ToolCallAgent(ReActAgent):
 
             return observation
         except json.JSONDecodeError:
+            self._escalate(f"invalid JSON arguments for '{name}'")
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
-                f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{command.function.arguments}"
+                f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{truncate_payload(command.function.arguments)}"
             )
             return f"Error: {error_msg}"
         except Exception as e:
@@ -207,6 +304,10 @@ class ToolCallAgent(ReActAgent):
             logger.exception(error_msg)
             return f"Error: {error_msg}"
 
+    def handle_stuck_state(self):
+        super().handle_stuck_state()
+        self._escalate("repeated responses")
+
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
         if not self._is_special_tool(name):
@@ -242,9 +343,11 @@ class ToolCallAgent(ReActAgent):
                     )
         logger.info(f"✨ Cleanup complete for agent '{self.name}'.")
 
-    async def run(self, request: Optional[str] = None) -> str:
-        """Run the agent with cleanup when done."""
+    async def _run_loop(self, request: Optional[str] = None) -> str:
+        """Run the agent loop with cleanup when done, also when cancelled."""
         try:
-            return await super().run(request)
+            # A request tagged [STRONG] keeps every step on the strong model
+            with use_llm_tier(tagged_tier(request)):
+                return await super()._run_loop(request)
         finally:
             await self.cleanup()
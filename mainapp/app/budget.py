@@ -0,0 +1,203 @@
+"""Per-run budgets for wall time, tokens and estimated cost.
+
+A budget is bound to the running task with ``use_budget`` and picked up by
+``LLM`` calls and ``ToolCollection.execute`` through ``current_budget``, so it
+does not have to be threaded through every signature. As the deadline
+approaches, per-call timeouts shrink to the remaining time and work that would
+outlive the budget is cancelled.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from app.config import config
+from app.exceptions import BudgetExceeded
+
+
+class RunBudget(BaseModel):
+    """Limits and usage counters for a single agent or flow run."""
+
+    max_seconds: Optional[float] = Field(None, description="Wall time limit")
+    max_input_tokens: Optional[int] = Field(None, description="Input token limit")
+    max_output_tokens: Optional[int] = Field(None, description="Output token limit")
+    max_cost: Optional[float] = Field(None, description="Estimated cost limit")
+
+    input_tokens: int = Field(default=0, description="Input tokens used so far")
+    output_tokens: int = Field(default=0, description="Output tokens used so far")
+    cost: float = Field(default=0.0, description="Estimated cost so far")
+    usage_by_model: Dict[str, Dict[str, float]] = Field(
+        default_factory=dict,
+        description="Input and output tokens and estimated cost of each model",
+    )
+
+    parent: Optional["RunBudget"] = Field(
+        default=None, description="Enclosing budget that is charged as well"
+    )
+
+    _started_at: Optional[float] = PrivateAttr(default=None)
+    # Blocks the budget is bound in, and whether use_budget set the parent
+    _active: int = PrivateAttr(default=0)
+    _linked_parent: bool = PrivateAttr(default=False)
+
+    @classmethod
+    def from_config(cls) -> "RunBudget":
+        """Create a budget with the limits from the [budget] config section"""
+        settings = config.budget
+        if settings is None:
+            return cls()
+        return cls(**settings.model_dump())
+
+    def start(self) -> None:
+        """Start the wall clock and clear the usage of an earlier run"""
+        self._started_at = time.monotonic()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.usage_by_model = {}
+
+    @property
+    def elapsed(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        return time.monotonic() - self._started_at
+
+    def remaining_time(self) -> Optional[float]:
+        """Seconds left before the deadline of this or any enclosing budget"""
+        remaining = None
+        if self.max_seconds is not None:
+            remaining = max(self.max_seconds - self.elapsed, 0.0)
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining_time()
+            if parent_remaining is not None:
+                remaining = (
+                    parent_remaining
+                    if remaining is None
+                    else min(remaining, parent_remaining)
+                )
+        return remaining
+
+    def clamp_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """Shrink a per-call timeout so it does not outlive the budget"""
+        remaining = self.remaining_time()
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+    def exceeded_reason(self, extra_input_tokens: int = 0) -> Optional[str]:
+        """Describe the first exhausted limit, or None if within budget"""
+        remaining = self.remaining_time()
+        if remaining is not None and remaining <= 0:
+            return f"wall time budget exhausted after {self.elapsed:.1f}s"
+        if (
+            self.max_input_tokens is not None
+            and self.input_tokens + extra_input_tokens > self.max_input_tokens
+        ):
+            return (
+                f"input token budget exhausted (used {self.input_tokens}, "
+                f"needed {extra_input_tokens}, max {self.max_input_tokens})"
+            )
+        if (
+            self.max_output_tokens is not None
+            and self.output_tokens >= self.max_output_tokens
+        ):
+            return f"output token budget exhausted (max {self.max_output_tokens})"
+        if self.max_cost is not None and self.cost >= self.max_cost:
+            return f"cost budget exhausted ({self.cost:.4f} of {self.max_cost})"
+        if self.parent is not None:
+            return self.parent.exceeded_reason(extra_input_tokens)
+        return None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.exceeded_reason() is not None
+
+    def check(self, extra_input_tokens: int = 0) -> None:
+        """Raise BudgetExceeded if a limit is exhausted.
+
+        Args:
+            extra_input_tokens: Input tokens about to be spent by the next call
+        """
+        reason = self.exceeded_reason(extra_input_tokens)
+        if reason:
+            raise BudgetExceeded(reason)
+
+    def record(
+        self,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cost: float = 0.0,
+        model: Optional[str] = None,
+    ) -> None:
+        """Charge usage to this budget and every enclosing one"""
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost += cost
+        if model is not None:
+            usage = self.usage_by_model.setdefault(
+                model, {"input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+            )
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+            usage["cost"] += cost
+        if self.parent is not None:
+            self.parent.record(input_tokens, output_tokens, cost, model)
+
+    def summary(self) -> str:
+        summary = (
+            f"elapsed={self.elapsed:.1f}s, input_tokens={self.input_tokens}, "
+            f"output_tokens={self.output_tokens}, cost={self.cost:.4f}"
+        )
+        if len(self.usage_by_model) > 1:
+            summary += "; " + ", ".join(
+                f"{model}: {usage['input_tokens']}+{usage['output_tokens']} "
+                f"tokens, cost={usage['cost']:.4f}"
+                for model, usage in self.usage_by_model.items()
+            )
+        return summary
+
+
+_current_budget: ContextVar[Optional[RunBudget]] = ContextVar(
+    "current_budget", default=None
+)
+
+
+def current_budget() -> Optional[RunBudget]:
+    """Get the budget bound to the running task, if any"""
+    return _current_budget.get()
+
+
+@contextmanager
+def use_budget(budget: Optional[RunBudget]) -> Iterator[Optional[RunBudget]]:
+    """Bind a budget for the duration of the block.
+
+    Binding a budget that is not bound yet starts a new run of it, with a
+    fresh clock and counters; binding it again while it is, e.g. by nested
+    agents sharing it, continues that run. A budget bound inside another one
+    is chained to it for the run, so usage is charged to both and the
+    tighter deadline wins. Passing None keeps the enclosing budget, if any.
+    """
+    if budget is None:
+        yield current_budget()
+        return
+
+    enclosing = current_budget()
+    if budget._active == 0:
+        budget.start()
+        if enclosing is not None and budget.parent is None:
+            budget.parent = enclosing
+            budget._linked_parent = True
+    budget._active += 1
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+        budget._active -= 1
+        if budget._active == 0 and budget._linked_parent:
+            budget.parent = None
+            budget._linked_parent = False
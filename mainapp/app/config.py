@@ -2,10 +2,12 @@ import json
 import threading
 import tomllib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
+from app.profiling.startup import startup_phase
+
 
 def get_project_root() -> Path:
     """Get the project root directory"""
@@ -28,6 +30,33 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    input_cost_per_million: float = Field(
+        0.0, description="Price per million input tokens, used for run budgets"
+    )
+    output_cost_per_million: float = Field(
+        0.0, description="Price per million output tokens, used for run budgets"
+    )
+    max_concurrent_requests: Optional[int] = Field(
+        None,
+        description="Requests in flight at once for this model across the process "
+        "(None for unlimited)",
+    )
+    cascade_llm: Optional[str] = Field(
+        None,
+        description="Name of an [llm.<name>] section with a cheaper model that "
+        "routine requests go to (None for no cascade)",
+    )
+    cascade_agent_steps: bool = Field(
+        True,
+        description="Agent steps start on the cascade model and escalate to this "
+        "one on errors, False keeps them on this model",
+    )
+    escalate_after_failures: int = Field(
+        2, description="Failed tool calls in a row that escalate agent steps"
+    )
+    escalation_steps: int = Field(
+        3, description="Agent steps run on this model once escalated"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -99,6 +128,235 @@ class SandboxSettings(BaseModel):
     )
 
 
+class BudgetSettings(BaseModel):
+    """Default per-run budget, unset limits are unbounded"""
+
+    max_seconds: Optional[float] = Field(
+        None, description="Wall time limit for a run in seconds"
+    )
+    max_input_tokens: Optional[int] = Field(
+        None, description="Input token limit for a run"
+    )
+    max_output_tokens: Optional[int] = Field(
+        None, description="Output token limit for a run"
+    )
+    max_cost: Optional[float] = Field(
+        None, description="Estimated cost limit for a run, in the LLM price unit"
+    )
+
+
+class ToolSelectionSettings(BaseModel):
+    """Configuration for per-step tool subset selection"""
+
+    enabled: bool = Field(True, description="Whether to send only relevant tools")
+    top_k: int = Field(8, description="Number of ranked tools to send per step")
+    min_tools: int = Field(
+        16, description="Only select a subset when more tools than this are available"
+    )
+    pinned_tools: List[str] = Field(
+        default_factory=lambda: ["terminate", "ask_human"],
+        description="Tools that are always sent regardless of ranking",
+    )
+    history_messages: int = Field(
+        4, description="Number of recent messages used to rank tools"
+    )
+
+
+class OutputLimitSettings(BaseModel):
+    """Configuration for max_tokens limits per request type"""
+
+    enabled: bool = Field(
+        True, description="Whether typed requests get their own max_tokens"
+    )
+    quantile: float = Field(
+        0.99, description="Quantile of the observed output lengths a limit covers"
+    )
+    headroom: float = Field(1.5, description="Factor applied on top of the quantile")
+    min_samples: int = Field(
+        20, description="Outputs of a request type observed before its limit is learned"
+    )
+    window: int = Field(
+        200, description="Recent outputs per request type the limit is learned from"
+    )
+    min_tokens: int = Field(32, description="Lowest learned limit")
+    defaults: Dict[str, int] = Field(
+        default_factory=lambda: {
+            "judge": 32,
+            "step_summary": 512,
+            "extract": 2048,
+            "split": 2048,
+            "plan": 2048,
+            "replan": 2048,
+            "plan_refill": 2048,
+        },
+        description="Limits of request types until enough outputs were observed",
+    )
+
+
+class ProfilingSettings(BaseModel):
+    """Configuration for opt-in runtime profiling"""
+
+    cpu: bool = Field(
+        False, description="Profile CPU per agent step, LLM call and tool call"
+    )
+    cpu_mode: str = Field(
+        "auto", description="CPU profiler: auto, sampling or cprofile"
+    )
+    sample_interval_ms: float = Field(
+        5.0, description="Sampling interval of the sampling profiler"
+    )
+    top_n: int = Field(20, description="Rows in the hot function and allocator tables")
+    memory: bool = Field(
+        False, description="Snapshot memory with tracemalloc after each agent step"
+    )
+    memory_frames: int = Field(
+        10, description="Stack frames tracemalloc keeps per allocation"
+    )
+    output_dir: str = Field(
+        "logs/profiles", description="Report directory, relative to the project root"
+    )
+
+
+class LoggingSettings(BaseModel):
+    """Configuration for the log file sink and payload capping"""
+
+    enqueue: bool = Field(
+        True, description="Write the log file from a background thread"
+    )
+    json_format: bool = Field(
+        False, description="Write JSON lines with run, step and tool ids to the file"
+    )
+    rotation: Optional[str] = Field(
+        "50 MB", description="Start a new file at this size or interval"
+    )
+    retention: Optional[str] = Field(
+        "14 days", description="Delete rotated files older than this"
+    )
+    compression: Optional[str] = Field(
+        None, description="Compress rotated files, e.g. zip or gz"
+    )
+    max_payload_chars: int = Field(
+        2000, description="Cap for logged tool arguments, results and thoughts"
+    )
+    payload_sample_rate: float = Field(
+        0.0, description="Share of capped payloads also logged in full at DEBUG"
+    )
+
+
+class MetricsSettings(BaseModel):
+    """Configuration for the metrics endpoint and per-run metric dumps"""
+
+    port: Optional[int] = Field(
+        None, description="Serve Prometheus metrics on this port, off when unset"
+    )
+    host: str = Field("127.0.0.1", description="Interface the endpoint binds to")
+    json_dir: Optional[str] = Field(
+        None,
+        description="Directory for per-run JSON dumps, relative to the project "
+        "root; no dumps when unset",
+    )
+
+
+class PlanStoreSettings(BaseModel):
+    """Configuration for where PlanningTool keeps its plans"""
+
+    backend: Literal["memory", "sqlite"] = Field(
+        "memory", description="Plan store backend"
+    )
+    path: str = Field(
+        "data/plans.db",
+        description="SQLite database file, relative to the project root",
+    )
+
+
+class PlanCacheSettings(BaseModel):
+    """Configuration for reusing plans of similar earlier requests"""
+
+    enabled: bool = Field(False, description="Whether PlanningFlow reuses plans")
+    path: str = Field(
+        "data/plan_cache.db",
+        description="SQLite database file, relative to the project root",
+    )
+    similarity_threshold: float = Field(
+        0.7,
+        description="Word-level similarity (0-1) a request needs to reuse a plan",
+    )
+    max_entries: int = Field(
+        500, description="Cached plans kept, the least recently used are evicted"
+    )
+    ttl_days: Optional[float] = Field(
+        30, description="Days after which a cached plan is planned afresh"
+    )
+    refill_llm: Optional[str] = Field(
+        None,
+        description="Name of an [llm.<name>] section used to adapt plans when "
+        "word substitution is not enough; such requests are planned afresh "
+        "when unset",
+    )
+
+
+class ServerSettings(BaseModel):
+    """Configuration for the multi-session agent server"""
+
+    host: str = Field("127.0.0.1", description="Interface the server binds to")
+    port: int = Field(8000, description="Port the server listens on")
+    max_sessions: int = Field(20, description="Sessions held at the same time")
+    session_idle_timeout: float = Field(
+        1800, description="Seconds after which an idle session is closed"
+    )
+
+
+class JobQueueSettings(BaseModel):
+    """Configuration for the durable job queue and its worker processes"""
+
+    path: str = Field(
+        "data/jobs.db",
+        description="SQLite database file, relative to the project root",
+    )
+    workers: int = Field(2, description="Worker processes started by run_jobs.py")
+    jobs_per_worker: int = Field(
+        2, description="Jobs each worker process runs at the same time"
+    )
+    lease_seconds: float = Field(
+        60,
+        description="Seconds a claimed job stays leased without a heartbeat "
+        "before another worker may take it over",
+    )
+    max_attempts: int = Field(3, description="Default attempts per job")
+    retry_delay: float = Field(
+        10, description="Seconds before the first retry, doubled for each attempt"
+    )
+    poll_interval: float = Field(
+        1.0, description="Seconds an idle worker waits before polling again"
+    )
+    restart_delay: float = Field(
+        5,
+        description="Seconds before a crashed worker process is restarted, "
+        "doubled for each further crash",
+    )
+    max_restarts: int = Field(
+        5,
+        description="Crashes in a row after which a worker process is no longer "
+        "restarted",
+    )
+
+
+class RouterSettings(BaseModel):
+    """Configuration for routing queries between a direct answer and an agent"""
+
+    confidence_threshold: float = Field(
+        0.8,
+        description="Confidence (0.5-1) the local scorer needs to decide without "
+        "the classifier LLM",
+    )
+    use_classifier: bool = Field(
+        True,
+        description="Ask the classifier LLM when the local scorer is unsure, "
+        "False always decides locally",
+    )
+    cache_size: int = Field(256, description="Recent routing decisions kept")
+
+
 class MCPServerConfig(BaseModel):
     """Configuration for a single MCP server"""
 
@@ -130,7 +388,7 @@ class MCPSettings(BaseModel):
             if not config_file:
                 return {}
 
-            with config_file.open() as f:
+            with startup_phase("load mcp.json"), config_file.open() as f:
                 data = json.load(f)
                 servers = {}
 
@@ -158,6 +416,39 @@ class AppConfig(BaseModel):
         None, description="Search configuration"
     )
     mcp_config: Optional[MCPSettings] = Field(None, description="MCP configuration")
+    tool_selection: Optional[ToolSelectionSettings] = Field(
+        None, description="Tool selection configuration"
+    )
+    budget: Optional[BudgetSettings] = Field(
+        None, description="Run budget configuration"
+    )
+    profiling: Optional[ProfilingSettings] = Field(
+        None, description="Profiling configuration"
+    )
+    metrics: Optional[MetricsSettings] = Field(
+        None, description="Metrics configuration"
+    )
+    logging: Optional[LoggingSettings] = Field(
+        None, description="Logging configuration"
+    )
+    plan_store: Optional[PlanStoreSettings] = Field(
+        None, description="Plan store configuration"
+    )
+    plan_cache: Optional[PlanCacheSettings] = Field(
+        None, description="Plan cache configuration"
+    )
+    server: Optional[ServerSettings] = Field(
+        None, description="Agent server configuration"
+    )
+    job_queue: Optional[JobQueueSettings] = Field(
+        None, description="Job queue configuration"
+    )
+    router: Optional[RouterSettings] = Field(
+        None, description="Query router configuration"
+    )
+    output_limits: Optional[OutputLimitSettings] = Field(
+        None, description="Output limit configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -180,7 +471,8 @@ class Config:
             with self._lock:
                 if not self._initialized:
                     self._config = None
-                    self._load_initial_config()
+                    with startup_phase("Config()"):
+                        self._load_initial_config()
                     self._initialized = True
 
     @staticmethod
@@ -196,7 +488,7 @@ class Config:
 
     def _load_config(self) -> dict:
         config_path = self._get_config_path()
-        with config_path.open("rb") as f:
+        with startup_phase(f"load {config_path.name}"), config_path.open("rb") as f:
             return tomllib.load(f)
 
     def _load_initial_config(self):
@@ -215,6 +507,13 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "input_cost_per_million": base_llm.get("input_cost_per_million", 0.0),
+            "output_cost_per_million": base_llm.get("output_cost_per_million", 0.0),
+            "max_concurrent_requests": base_llm.get("max_concurrent_requests"),
+            "cascade_llm": base_llm.get("cascade_llm"),
+            "cascade_agent_steps": base_llm.get("cascade_agent_steps", True),
+            "escalate_after_failures": base_llm.get("escalate_after_failures", 2),
+            "escalation_steps": base_llm.get("escalation_steps", 3),
         }
 
         # handle browser config.
@@ -269,6 +568,39 @@ class Config:
         else:
             mcp_settings = MCPSettings(servers=MCPSettings.load_server_config())
 
+        tool_selection_config = raw_config.get("tool_selection", {})
+        tool_selection_settings = ToolSelectionSettings(**tool_selection_config)
+
+        budget_config = raw_config.get("budget", {})
+        budget_settings = BudgetSettings(**budget_config)
+
+        profiling_config = raw_config.get("profiling", {})
+        profiling_settings = ProfilingSettings(**profiling_config)
+
+        metrics_config = raw_config.get("metrics", {})
+        metrics_settings = MetricsSettings(**metrics_config)
+
+        logging_config = raw_config.get("logging", {})
+        logging_settings = LoggingSettings(**logging_config)
+
+        plan_store_config = raw_config.get("plan_store", {})
+        plan_store_settings = PlanStoreSettings(**plan_store_config)
+
+        plan_cache_config = raw_config.get("plan_cache", {})
+        plan_cache_settings = PlanCacheSettings(**plan_cache_config)
+
+        server_config = raw_config.get("server", {})
+        server_settings = ServerSettings(**server_config)
+
+        job_queue_config = raw_config.get("job_queue", {})
+        job_queue_settings = JobQueueSettings(**job_queue_config)
+
+        router_config = raw_config.get("router", {})
+        router_settings = RouterSettings(**router_config)
+
+        output_limits_config = raw_config.get("output_limits", {})
+        output_limits_settings = OutputLimitSettings(**output_limits_config)
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -281,6 +613,17 @@ class Config:
             "browser_config": browser_settings,
             "search_config": search_settings,
             "mcp_config": mcp_settings,
+            "tool_selection": tool_selection_settings,
+            "budget": budget_settings,
+            "profiling": profiling_settings,
+            "metrics": metrics_settings,
+            "logging": logging_settings,
+            "plan_store": plan_store_settings,
+            "plan_cache": plan_cache_settings,
+            "server": server_settings,
+            "job_queue": job_queue_settings,
+            "router": router_settings,
+            "output_limits": output_limits_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -306,6 +649,61 @@ class Config:
         """Get the MCP configuration"""
         return self._config.mcp_config
 
+    @property
+    def tool_selection(self) -> ToolSelectionSettings:
+        """Get the tool selection configuration"""
+        return self._config.tool_selection
+
+    @property
+    def budget(self) -> BudgetSettings:
+        """Get the default run budget configuration"""
+        return self._config.budget
+
+    @property
+    def profiling(self) -> ProfilingSettings:
+        """Get the profiling configuration"""
+        return self._config.profiling
+
+    @property
+    def metrics(self) -> MetricsSettings:
+        """Get the metrics configuration"""
+        return self._config.metrics
+
+    @property
+    def logging(self) -> LoggingSettings:
+        """Get the logging configuration"""
+        return self._config.logging
+
+    @property
+    def plan_store(self) -> PlanStoreSettings:
+        """Get the plan store configuration"""
+        return self._config.plan_store
+
+    @property
+    def plan_cache(self) -> PlanCacheSettings:
+        """Get the plan cache configuration"""
+        return self._config.plan_cache
+
+    @property
+    def server(self) -> ServerSettings:
+        """Get the agent server configuration"""
+        return self._config.server
+
+    @property
+    def job_queue(self) -> JobQueueSettings:
+        """Get the job queue configuration"""
+        return self._config.job_queue
+
+    @property
+    def router(self) -> RouterSettings:
+        """Get the query router configuration"""
+        return self._config.router
+
+    @property
+    def output_limits(self) -> OutputLimitSettings:
+        """Get the output limit configuration"""
+        return self._config.output_limits
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
@@ -0,0 +1,202 @@
+"""Typed progress events for streaming agent and flow execution.
+
+Code deep inside a run (the LLM client, tool calls, plan updates) reports
+progress with ``emit``. ``BaseAgent.run_stream`` and
+``BaseFlow.execute_stream`` bind a sink for the duration of the run and
+yield the collected events to the caller. Without a bound sink ``emit`` is a
+no-op, and the plain ``run``/``execute`` paths call the run directly instead
+of streaming it; inside a streamed run they stream too, so events of nested
+runs carry their own source. Emitters of frequent or large events check
+``is_streaming`` first, so nothing is built for them when nobody listens.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Literal,
+    Optional,
+    Union,
+)
+
+from pydantic import BaseModel, Field
+
+
+class BaseEvent(BaseModel):
+    """Common fields for all progress events."""
+
+    type: str
+    source: Optional[str] = Field(
+        None, description="Name of the agent or flow that produced the event"
+    )
+    timestamp: float = Field(default_factory=time.time)
+
+
+class StepStarted(BaseEvent):
+    type: Literal["step_started"] = "step_started"
+    step: int
+    max_steps: int
+
+
+class StepFinished(BaseEvent):
+    type: Literal["step_finished"] = "step_finished"
+    step: int
+    result: str
+    duration: float
+
+
+class LLMDelta(BaseEvent):
+    """A chunk of model output, the whole content for non-streaming calls."""
+
+    type: Literal["llm_delta"] = "llm_delta"
+    content: str
+
+
+class ToolCallStarted(BaseEvent):
+    type: Literal["tool_call_started"] = "tool_call_started"
+    tool: str
+    call_id: str
+    arguments: Optional[str] = None
+
+
+class ToolCallFinished(BaseEvent):
+    type: Literal["tool_call_finished"] = "tool_call_finished"
+    tool: str
+    call_id: str
+    result: str
+    success: bool = True
+    duration: float
+
+
+class PlanStepStatusChanged(BaseEvent):
+    type: Literal["plan_step_status_changed"] = "plan_step_status_changed"
+    plan_id: str
+    step_index: int
+    step: Optional[str] = None
+    status: str
+
+
+class SubTaskStatusChanged(BaseEvent):
+    """Progress of one sub-task of a map-reduce flow, with its result when done."""
+
+    type: Literal["sub_task_status_changed"] = "sub_task_status_changed"
+    task_index: int
+    task: Optional[str] = None
+    status: str
+    attempt: int = 1
+    result: Optional[str] = None
+
+
+class BranchStatusChanged(BaseEvent):
+    """Progress of one branch of an explore flow, with its score once scored."""
+
+    type: Literal["branch_status_changed"] = "branch_status_changed"
+    branch_index: int
+    strategy: Optional[str] = None
+    status: str
+    score: Optional[float] = None
+    result: Optional[str] = None
+
+
+class RunFinished(BaseEvent):
+    """Always the last event of a stream, carries the same result run() returns."""
+
+    type: Literal["run_finished"] = "run_finished"
+    result: str
+
+
+AgentEvent = Union[
+    StepStarted,
+    StepFinished,
+    LLMDelta,
+    ToolCallStarted,
+    ToolCallFinished,
+    PlanStepStatusChanged,
+    SubTaskStatusChanged,
+    BranchStatusChanged,
+    RunFinished,
+]
+
+EventSink = Callable[[BaseEvent], None]
+
+_event_sink: ContextVar[Optional[EventSink]] = ContextVar("event_sink", default=None)
+
+
+def emit(event: BaseEvent) -> None:
+    """Report an event to the stream bound to the running task, if any"""
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event)
+
+
+def is_streaming() -> bool:
+    """Whether a consumer is listening, to skip building costly event payloads"""
+    return _event_sink.get() is not None
+
+
+async def stream_events(
+    run: Callable[[], Awaitable[str]], source: str
+) -> AsyncIterator[BaseEvent]:
+    """Run a coroutine in its own task and yield the events it emits.
+
+    The task gets a fresh sink, so events from nested runs land in the
+    innermost stream. The last event is RunFinished with the coroutine's
+    result; exceptions from the run are raised to the consumer. Closing the
+    generator early cancels the run.
+
+    Args:
+        run: Zero-argument coroutine function performing the run
+        source: Default source for events that do not set one
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def sink(event: BaseEvent) -> None:
+        if event.source is None:
+            event.source = source
+        queue.put_nowait(event)
+
+    async def worker() -> str:
+        _event_sink.set(sink)
+        try:
+            return await run()
+        finally:
+            queue.put_nowait(done)
+
+    task = asyncio.create_task(worker())
+    try:
+        while (event := await queue.get()) is not done:
+            yield event
+        yield RunFinished(source=source, result=await task)
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def collect_result(events: AsyncIterator[BaseEvent], default: str = "") -> str:
+    """Drain a stream for its final result.
+
+    Progress events are passed on to the enclosing stream, if any, so a flow
+    streaming its own run still sees what its agents are doing.
+    """
+    result = default
+    try:
+        async for event in events:
+            if isinstance(event, RunFinished):
+                result = event.result
+            else:
+                emit(event)
+    finally:
+        await events.aclose()
+    return result
+
+
+def event_to_dict(event: BaseEvent) -> Dict[str, Any]:
+    """JSON-friendly representation for servers and UIs"""
+    return event.model_dump()
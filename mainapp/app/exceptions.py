@@ -11,3 +11,27 @@ class OpenManusError(Exception):
 
 class TokenLimitExceeded(OpenManusError):
     """Exception raised when the token limit is exceeded"""
+
+
+class BudgetExceeded(OpenManusError):
+    """Exception raised when a run exceeds its time, token or cost budget"""
+
+
+class SessionError(OpenManusError):
+    """Base exception for agent server sessions"""
+
+
+class SessionNotFound(SessionError):
+    """Exception raised for an unknown or closed session id"""
+
+
+class SessionBusy(SessionError):
+    """Exception raised when a session is already processing a message"""
+
+
+class SessionLimitReached(SessionError):
+    """Exception raised when the server holds its maximum number of sessions"""
+
+
+class JobNotFound(OpenManusError):
+    """Exception raised for an unknown job id"""
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Union
+from typing import AsyncIterator, Dict, List, Optional, Union
 
 from pydantic import BaseModel
 
 from app.agent.base import BaseAgent
+from app.budget import RunBudget
+from app.events import BaseEvent, collect_result, is_streaming, stream_events
 
 
 class BaseFlow(BaseModel, ABC):
@@ -12,6 +14,7 @@ class BaseFlow(BaseModel, ABC):
     agents: Dict[str, BaseAgent]
     tools: Optional[List] = None
     primary_agent_key: Optional[str] = None
+    budget: Optional[RunBudget] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -52,6 +55,26 @@ class BaseFlow(BaseModel, ABC):
         """Add a new agent to the flow"""
         self.agents[key] = agent
 
-    @abstractmethod
     async def execute(self, input_text: str) -> str:
         """Execute the flow with given input"""
+        if not is_streaming():
+            return await self._execute(input_text)
+        return await collect_result(self.execute_stream(input_text))
+
+    async def execute_stream(self, input_text: str) -> AsyncIterator[BaseEvent]:
+        """Execute the flow, yielding progress events as they happen.
+
+        The last event is RunFinished carrying the result execute() returns.
+        """
+        events = stream_events(
+            lambda: self._execute(input_text), source=type(self).__name__
+        )
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    @abstractmethod
+    async def _execute(self, input_text: str) -> str:
+        """Run the flow, emitting its progress events, and return the result"""
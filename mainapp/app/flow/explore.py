@@ -0,0 +1,304 @@
+import asyncio
+import os
+import re
+import shutil
+import signal
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pydantic import Field
+
+from app.agent.base import AgentSnapshot, BaseAgent
+from app.config import PROJECT_ROOT
+from app.events import BranchStatusChanged, emit
+from app.exceptions import BudgetExceeded
+from app.flow.base import BaseFlow
+from app.llm import LLM
+from app.logger import logger, truncate_payload
+from app.run import run_scope
+from app.sandbox.client import isolated_sandbox
+from app.schema import Message
+from app.tool import Bash
+
+
+# Characters of a branch result shown to the LLM judge
+BRANCH_RESULT_CHARS = 4000
+
+DEFAULT_STRATEGIES = [
+    "Reproduce the problem first with a minimal script or command, then fix it "
+    "and rerun the reproduction.",
+    "Read the relevant code thoroughly before changing anything, then make the "
+    "smallest change that solves the task.",
+    "Write or extend a test that captures the task first, then change the code "
+    "until it passes.",
+    "Look for an approach other than the most obvious one and verify it works "
+    "before finishing.",
+]
+
+
+class Branch:
+    """A forked copy of the agent exploring one strategy."""
+
+    def __init__(
+        self, index: int, strategy: str, agent: BaseAgent, workspace: Optional[Path]
+    ):
+        self.index = index
+        self.strategy = strategy
+        self.agent = agent
+        self.workspace = workspace
+        self.status = "pending"
+        self.result: Optional[str] = None
+        self.score: Optional[float] = None
+
+
+Scorer = Callable[[Branch], Awaitable[float]]
+
+
+def command_scorer(command: str, timeout: float = 600) -> Scorer:
+    """Score 1.0 when the command succeeds in the branch's workspace, else 0.0"""
+
+    async def score(branch: Branch) -> float:
+        process = await asyncio.create_subprocess_shell(
+            command,
+            cwd=branch.workspace,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            returncode = await asyncio.wait_for(process.wait(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Kill the command's whole process group, e.g. a test runner's workers
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.warning(f"Scoring branch {branch.index} timed out: {command}")
+            return 0.0
+        return 1.0 if returncode == 0 else 0.0
+
+    return score
+
+
+def llm_judge(llm: LLM, task: str) -> Scorer:
+    """Score a branch's result from 0.0 to 1.0 with an LLM call"""
+
+    async def score(branch: Branch) -> float:
+        response = await llm.ask(
+            messages=[
+                Message.user_message(
+                    f"Task: {task}\n\nResult of an attempt:\n"
+                    f"{truncate_payload(branch.result or '', BRANCH_RESULT_CHARS)}"
+                    "\n\nRate from 0 to 10 how completely and correctly the "
+                    "attempt solves the task. Reply with the number only."
+                )
+            ],
+            system_msgs=[
+                Message.system_message(
+                    "You are a strict reviewer judging attempts at a task."
+                )
+            ],
+            stream=False,
+            request_type="judge",
+        )
+        match = re.search(r"\d+(?:\.\d+)?", response or "")
+        if match is None:
+            logger.warning(f"Unparseable score for branch {branch.index}: {response}")
+            return 0.0
+        return min(float(match.group()), 10.0) / 10
+
+    return score
+
+
+def _replace_dir(target: Path, replacement: Path) -> None:
+    """Swap the contents of a directory for a copy of another one"""
+    staged = target.with_name(f".{target.name}.explore-new")
+    old = target.with_name(f".{target.name}.explore-old")
+    shutil.rmtree(staged, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    # Copied next to the target first, so the swap is two renames
+    shutil.copytree(replacement, staged, symlinks=True)
+    target.rename(old)
+    staged.rename(target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+class ExploreFlow(BaseFlow):
+    """A flow that forks the primary agent into branches and keeps the best one.
+
+    Every branch starts from the same snapshot of the primary agent, by default
+    its current memory and step, and gets its own tools, sandbox and, when
+    ``workspace`` is set, its own copy of that directory. MCP tools the primary
+    agent connected are shared with the branches, see ``Manus.spawn``. Branches run
+    concurrently, each told to follow a different strategy, and are scored as
+    they finish: by ``scorer``, by ``test_command`` run in the branch's
+    workspace, or by an LLM judge. The first branch reaching ``accept_score``
+    wins and the others are cancelled; otherwise the best score wins once all
+    branches are done. The primary agent continues from the winner's state
+    and the winner's copy replaces the workspace.
+    """
+
+    llm: LLM = Field(default_factory=lambda: LLM())
+    branches: int = Field(3, description="Branches explored at once")
+    strategies: List[str] = Field(
+        default_factory=lambda: list(DEFAULT_STRATEGIES),
+        description="Strategy hints, branch i follows strategy i modulo their number",
+    )
+    workspace: Optional[str] = Field(
+        None,
+        description="Directory each branch gets a copy of, relative to the project "
+        "root; the winner's copy replaces it",
+    )
+    test_command: Optional[str] = Field(
+        None,
+        description="Command run in a branch's workspace copy to score it, "
+        "exit code 0 scores 1.0; an LLM judge scores when unset",
+    )
+    scorer: Optional[Scorer] = Field(
+        None, description="Custom scorer, takes precedence over test_command"
+    )
+    accept_score: float = Field(
+        1.0, description="Score that wins right away, cancelling the other branches"
+    )
+    snapshot: Optional[AgentSnapshot] = Field(
+        None,
+        description="State the branches start from, the primary agent's current "
+        "state when unset",
+    )
+
+    async def _execute(self, input_text: str) -> str:
+        """Execute the explore flow with agents."""
+        with run_scope(type(self).__name__, self.budget):
+            try:
+                return await self._explore(input_text)
+            except BudgetExceeded as e:
+                logger.warning(f"ExploreFlow stopped: {e}")
+                return f"Execution stopped: {e}"
+            except Exception as e:
+                logger.error(f"Error in ExploreFlow: {str(e)}")
+                return f"Execution failed: {str(e)}"
+
+    async def _explore(self, input_text: str) -> str:
+        if not self.primary_agent:
+            raise ValueError("No primary agent available")
+
+        source = None
+        if self.workspace:
+            source = PROJECT_ROOT / self.workspace
+            if not source.is_dir():
+                raise ValueError(f"Workspace {source} is not a directory")
+        if self.scorer is not None:
+            scorer = self.scorer
+        elif self.test_command:
+            scorer = command_scorer(self.test_command)
+        else:
+            scorer = llm_judge(self.llm, input_text)
+
+        snapshot = self.snapshot or self.primary_agent.snapshot()
+        work_dir = Path(tempfile.mkdtemp(prefix="explore-"))
+        try:
+            branches = await self._fork(snapshot, source, work_dir)
+            logger.info(f"Exploring {len(branches)} branches")
+            winner = await self._race(branches, input_text, scorer)
+            if winner is None:
+                return "Exploration failed: no branch finished"
+
+            self.primary_agent.restore(winner.agent.snapshot())
+            if source is not None:
+                await asyncio.to_thread(_replace_dir, source, winner.workspace)
+            return (
+                f"Explored {len(branches)} branches, branch {winner.index} won "
+                f"with score {winner.score:.2f} (strategy: {winner.strategy}):"
+                f"\n\n{winner.result}"
+            )
+        finally:
+            await asyncio.to_thread(shutil.rmtree, work_dir, ignore_errors=True)
+
+    async def _fork(
+        self, snapshot: AgentSnapshot, source: Optional[Path], work_dir: Path
+    ) -> List[Branch]:
+        branches = []
+        for index in range(max(self.branches, 1)):
+            workspace = None
+            if source is not None:
+                workspace = work_dir / f"branch-{index}"
+                await asyncio.to_thread(
+                    shutil.copytree, source, workspace, symlinks=True
+                )
+            agent = self.primary_agent.fork(snapshot)
+            # Shell commands start in the branch's copy
+            for tool in getattr(agent, "available_tools", None) or []:
+                if isinstance(tool, Bash) and workspace is not None:
+                    tool.cwd = str(workspace)
+            strategy = self.strategies[index % len(self.strategies)]
+            branches.append(Branch(index, strategy, agent, workspace))
+        return branches
+
+    async def _race(
+        self, branches: List[Branch], input_text: str, scorer: Scorer
+    ) -> Optional[Branch]:
+        """Run all branches, stopping the others once one is accepted."""
+        tasks: Dict[asyncio.Task, Branch] = {
+            asyncio.create_task(self._run_branch(branch, input_text, scorer)): branch
+            for branch in branches
+        }
+        try:
+            for finished in asyncio.as_completed(tasks):
+                branch = await finished
+                if branch.score is not None and branch.score >= self.accept_score:
+                    logger.info(f"Branch {branch.index} accepted, cancelling the rest")
+                    return branch
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        scored = [branch for branch in branches if branch.score is not None]
+        return max(scored, key=lambda branch: branch.score, default=None)
+
+    def _branch_prompt(self, input_text: str, branch: Branch) -> str:
+        parts = [input_text] if input_text.strip() else []
+        parts.append(f"STRATEGY: {branch.strategy}")
+        if branch.workspace is not None:
+            parts.append(
+                f"Work only in {branch.workspace}, your own copy of "
+                f"{PROJECT_ROOT / self.workspace}. Use absolute paths inside it "
+                "for every file you read or change."
+            )
+        return "\n\n".join(parts)
+
+    async def _run_branch(
+        self, branch: Branch, input_text: str, scorer: Scorer
+    ) -> Branch:
+        def report(status: str, **kwargs) -> None:
+            branch.status = status
+            emit(
+                BranchStatusChanged(
+                    branch_index=branch.index,
+                    strategy=branch.strategy,
+                    status=status,
+                    **kwargs,
+                )
+            )
+
+        report("running")
+        try:
+            async with isolated_sandbox():
+                branch.result = await branch.agent.run(
+                    self._branch_prompt(input_text, branch)
+                )
+                branch.score = await scorer(branch)
+        except asyncio.CancelledError:
+            report("cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"Branch {branch.index} failed: {e}")
+            report("failed")
+            return branch
+        logger.info(f"Branch {branch.index} scored {branch.score:.2f}")
+        report("completed", score=branch.score, result=branch.result)
+        return branch
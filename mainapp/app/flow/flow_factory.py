@@ -3,11 +3,15 @@ from typing import Dict, List, Union
 
 from app.agent.base import BaseAgent
 from app.flow.base import BaseFlow
+from app.flow.explore import ExploreFlow
+from app.flow.map_reduce import MapReduceFlow
 from app.flow.planning import PlanningFlow
 
 
 class FlowType(str, Enum):
     PLANNING = "planning"
+    MAP_REDUCE = "map_reduce"
+    EXPLORE = "explore"
 
 
 class FlowFactory:
@@ -21,6 +25,8 @@ class FlowFactory:
     ) -> BaseFlow:
         flows = {
             FlowType.PLANNING: PlanningFlow,
+            FlowType.MAP_REDUCE: MapReduceFlow,
+            FlowType.EXPLORE: ExploreFlow,
         }
 
         flow_class = flows.get(flow_type)
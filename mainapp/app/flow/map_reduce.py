@@ -0,0 +1,220 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from pydantic import Field
+
+from app.agent.base import BaseAgent
+from app.budget import current_budget
+from app.events import SubTaskStatusChanged, emit
+from app.exceptions import BudgetExceeded
+from app.flow.base import BaseFlow
+from app.llm import LLM
+from app.logger import logger, truncate_payload
+from app.run import run_scope
+from app.sandbox.client import isolated_sandbox
+from app.schema import Memory, Message, ToolChoice
+
+
+# Characters of each sub-task result passed to the reduce call
+SUB_TASK_RESULT_CHARS = 4000
+
+_SPLIT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "split_task",
+        "description": "Split a task into independent sub-tasks that can run in parallel.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "sub_tasks": {
+                    "description": "Self-contained sub-task descriptions, each understandable without the others.",
+                    "type": "array",
+                    "items": {"type": "string"},
+                },
+            },
+            "required": ["sub_tasks"],
+        },
+    },
+}
+
+
+class MapReduceFlow(BaseFlow):
+    """A flow that fans a task out into independent sub-tasks and merges the results.
+
+    The input is split into sub-tasks by the LLM, or taken from ``sub_tasks``
+    when given. Sub-tasks run on up to ``max_parallel`` copies of the primary
+    agent, each with an empty memory and a sandbox of its own, and a failed
+    sub-task is retried up to ``max_retries`` times. A sub-task stopped by the
+    budget counts as failed and is not retried. Every finished sub-task
+    is reported with a SubTaskStatusChanged event carrying its result, then a
+    final LLM call combines all results.
+    """
+
+    llm: LLM = Field(default_factory=lambda: LLM())
+    sub_tasks: Optional[List[str]] = Field(
+        None, description="Sub-tasks to run, the LLM splits the input when unset"
+    )
+    max_parallel: int = Field(4, description="Sub-tasks that may run at once")
+    max_sub_tasks: int = Field(
+        50, description="Upper bound on the sub-tasks the LLM may split into"
+    )
+    max_retries: int = Field(1, description="Extra attempts for a failed sub-task")
+
+    async def _execute(self, input_text: str) -> str:
+        """Execute the map-reduce flow with agents."""
+        with run_scope(type(self).__name__, self.budget):
+            try:
+                return await self._map_reduce(input_text)
+            except BudgetExceeded as e:
+                logger.warning(f"MapReduceFlow stopped: {e}")
+                return f"Execution stopped: {e}"
+            except Exception as e:
+                logger.error(f"Error in MapReduceFlow: {str(e)}")
+                return f"Execution failed: {str(e)}"
+
+    async def _map_reduce(self, input_text: str) -> str:
+        if not self.primary_agent:
+            raise ValueError("No primary agent available")
+
+        tasks = self.sub_tasks or await self._split(input_text)
+        logger.info(f"Running {len(tasks)} sub-tasks, {self.max_parallel} at a time")
+
+        results = await self._map(input_text, tasks)
+        return await self._reduce(input_text, tasks, results)
+
+    async def _split(self, input_text: str) -> List[str]:
+        """Ask the LLM to split the input, falling back to a single sub-task."""
+        try:
+            response = await self.llm.ask_tool(
+                messages=[Message.user_message(input_text)],
+                system_msgs=[
+                    Message.system_message(
+                        "You split tasks for parallel execution. Call split_task "
+                        "with independent sub-tasks, at most "
+                        f"{self.max_sub_tasks}. Put one item of work in each, "
+                        "e.g. one URL or one file per sub-task."
+                    )
+                ],
+                tools=[_SPLIT_TOOL],
+                tool_choice=ToolChoice.REQUIRED,
+                request_type="split",
+            )
+            for tool_call in (response.tool_calls if response else None) or []:
+                if tool_call.function.name == "split_task":
+                    sub_tasks = json.loads(tool_call.function.arguments)["sub_tasks"]
+                    sub_tasks = [task for task in sub_tasks if task.strip()]
+                    if sub_tasks:
+                        return sub_tasks[: self.max_sub_tasks]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to parse sub-tasks: {e}")
+        logger.warning("Running the input as a single sub-task")
+        return [input_text]
+
+    async def _map(self, input_text: str, tasks: List[str]) -> List[Optional[str]]:
+        """Run all sub-tasks, None marks a sub-task that failed or was skipped."""
+        semaphore = asyncio.Semaphore(max(self.max_parallel, 1))
+        idle_agents: List[BaseAgent] = []
+        budget = current_budget()
+
+        async def run(index: int, task: str) -> Optional[str]:
+            async with semaphore:
+                if budget is not None and budget.exhausted:
+                    emit(SubTaskStatusChanged(task_index=index, status="skipped"))
+                    return None
+                # Copies of the primary agent, so its own memory stays untouched
+                agent = idle_agents.pop() if idle_agents else self.primary_agent.spawn()
+                try:
+                    return await self._run_with_retries(agent, index, task, input_text)
+                finally:
+                    idle_agents.append(agent)
+
+        return await asyncio.gather(
+            *(run(index, task) for index, task in enumerate(tasks))
+        )
+
+    async def _run_with_retries(
+        self, agent: BaseAgent, index: int, task: str, input_text: str
+    ) -> Optional[str]:
+        prompt = (
+            f"You are working on one part of a larger task.\n\n"
+            f"OVERALL TASK:\n{input_text}\n\n"
+            f"YOUR PART:\n{task}\n\n"
+            "Only do your part, then give a complete summary of the result."
+        )
+        for attempt in range(1, self.max_retries + 2):
+            emit(
+                SubTaskStatusChanged(
+                    task_index=index, task=task, status="running", attempt=attempt
+                )
+            )
+            # Each attempt starts from scratch, in a sandbox of its own
+            agent.memory = Memory(max_messages=agent.memory.max_messages)
+            agent.current_step = 0
+            try:
+                async with isolated_sandbox():
+                    result = await agent.run(prompt)
+            except Exception as e:
+                logger.warning(f"Sub-task {index} failed on attempt {attempt}: {e}")
+                continue
+            # A run stopped by the budget has no result, and a retry would
+            # stop the same way
+            budget = agent.budget or current_budget()
+            reason = budget.exceeded_reason() if budget is not None else None
+            if reason:
+                logger.warning(f"Sub-task {index} stopped: {reason}")
+                break
+            emit(
+                SubTaskStatusChanged(
+                    task_index=index,
+                    task=task,
+                    status="completed",
+                    attempt=attempt,
+                    result=result,
+                )
+            )
+            return result
+        emit(
+            SubTaskStatusChanged(
+                task_index=index, task=task, status="failed", attempt=attempt
+            )
+        )
+        return None
+
+    async def _reduce(
+        self, input_text: str, tasks: List[str], results: List[Optional[str]]
+    ) -> str:
+        """Combine the sub-task results with one LLM call."""
+        parts = []
+        for index, (task, result) in enumerate(zip(tasks, results)):
+            body = (
+                truncate_payload(result, SUB_TASK_RESULT_CHARS)
+                if result is not None
+                else "FAILED, no result"
+            )
+            parts.append(f"## Sub-task {index}: {task}\n{body}")
+        results_text = "\n\n".join(parts)
+        failed = sum(result is None for result in results)
+
+        try:
+            response = await self.llm.ask(
+                messages=[
+                    Message.user_message(
+                        f"Task: {input_text}\n\nResults of the sub-tasks:\n\n"
+                        f"{results_text}\n\nCombine them into the final answer "
+                        "to the task. Mention sub-tasks that failed."
+                    )
+                ],
+                system_msgs=[
+                    Message.system_message(
+                        "You merge the results of sub-tasks that ran in parallel "
+                        "into one coherent answer."
+                    )
+                ],
+            )
+        except Exception as e:
+            logger.error(f"Error reducing sub-task results with LLM: {e}")
+            response = results_text
+
+        summary = f"{len(tasks) - failed}/{len(tasks)} sub-tasks completed"
+        return f"Map-reduce completed ({summary}):\n\n{response}"
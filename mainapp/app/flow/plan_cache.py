@@ -0,0 +1,315 @@
+"""Reuse of plans created for similar earlier requests.
+
+Recurring requests such as "weekly competitor summary for Acme" and "weekly
+competitor summary for Globex" differ in a few words only. ``PlanCache``
+stores the plan of every request PlanningFlow planned with the LLM and,
+for a new request, looks for the most similar stored request by word-level
+alignment. When the similarity reaches ``similarity_threshold`` the stored
+plan serves as a template: the words that differ between the two requests
+are its placeholders and are substituted in the title and steps. When the
+requests differ by added or dropped words rather than substitutions, the
+plan is adapted by the ``refill_llm`` model, or planned afresh without one.
+
+Entries expire after ``ttl_days``, can be dropped with ``invalidate``, and
+PlanningFlow drops an entry whose plan ended with blocked steps. Lookups are
+counted in the ``openmanus_cache_lookups_total`` metric (cache "plan").
+"""
+import difflib
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app import metrics
+from app.config import PROJECT_ROOT, PlanCacheSettings, config
+from app.llm import LLM
+from app.logger import logger
+from app.schema import Message
+
+
+_WORD_PATTERN = re.compile(r"\w+(?:[-'./]\w+)*")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall(text)
+
+
+class CachedPlan:
+    """A stored request with the plan made for it."""
+
+    def __init__(
+        self,
+        entry_id: int,
+        request: str,
+        plan: Dict,
+        hits: int,
+        created_at: float,
+        last_used_at: float,
+    ):
+        self.id = entry_id
+        self.request = request
+        self.plan = plan
+        self.hits = hits
+        self.created_at = created_at
+        self.last_used_at = last_used_at
+        self.words = _words(request)
+        self.key = [word.lower() for word in self.words]
+
+
+class PlanCache:
+    """Plans of earlier requests in a SQLite database, matched by similarity.
+
+    All entries are kept in memory for matching; the database keeps them
+    across restarts and is shared by the flows of all processes.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS plan_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request TEXT NOT NULL,
+            plan TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self, settings: Optional[PlanCacheSettings] = None):
+        import sqlite3
+
+        self.settings = settings or config.plan_cache or PlanCacheSettings()
+        db_path = PROJECT_ROOT / self.settings.path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, timeout=5.0, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self._SCHEMA)
+        self.entries: List[CachedPlan] = [
+            CachedPlan(entry_id, request, json.loads(plan), *rest)
+            for entry_id, request, plan, *rest in self._conn.execute(
+                "SELECT id, request, plan, hits, created_at, last_used_at "
+                "FROM plan_cache ORDER BY id"
+            )
+        ]
+        # Lookups of this process
+        self.hits = 0
+        self.misses = 0
+
+    def _execute(self, sql: str, *params) -> int:
+        """Run a statement, returning the id of an inserted row"""
+        with self._lock:
+            return self._conn.execute(sql, params).lastrowid
+
+    def _expired(self, entry: CachedPlan, now: float) -> bool:
+        ttl_days = self.settings.ttl_days
+        return ttl_days is not None and now - entry.created_at > ttl_days * 86400
+
+    def _match(self, request: str) -> Tuple[Optional[CachedPlan], List[tuple]]:
+        """The most similar live entry and its word alignment with the request"""
+        key = [word.lower() for word in _words(request)]
+        now = time.time()
+        best, best_ratio, best_opcodes = None, self.settings.similarity_threshold, []
+        for entry in list(self.entries):
+            if self._expired(entry, now):
+                self.invalidate(entry.id)
+                continue
+            matcher = difflib.SequenceMatcher(None, entry.key, key, autojunk=False)
+            # Cheap upper bounds first, most entries are not even close
+            if matcher.real_quick_ratio() < best_ratio:
+                continue
+            if matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio, best_opcodes = entry, ratio, matcher.get_opcodes()
+        return best, best_opcodes
+
+    async def lookup(self, request: str) -> Optional[Tuple[int, Dict]]:
+        """Return the entry id and a plan for the request, None on a miss.
+
+        The plan has the keys ``title``, ``steps`` and, when the cached plan
+        had them, ``step_dependencies``.
+        """
+        entry, opcodes = self._match(request)
+        plan = await self._refill(entry, request, opcodes) if entry else None
+        if plan is None:
+            self.misses += 1
+            metrics.CACHE_LOOKUPS.inc(cache="plan", result="miss")
+            return None
+
+        self.hits += 1
+        metrics.CACHE_LOOKUPS.inc(cache="plan", result="hit")
+        entry.hits += 1
+        entry.last_used_at = time.time()
+        self._execute(
+            "UPDATE plan_cache SET hits = hits + 1, last_used_at = ? WHERE id = ?",
+            entry.last_used_at,
+            entry.id,
+        )
+        logger.info(f"Reusing the plan of cached request: {entry.request}")
+        return entry.id, plan
+
+    async def _refill(
+        self, entry: CachedPlan, request: str, opcodes: List[tuple]
+    ) -> Optional[Dict]:
+        """Fill the cached plan's placeholders with the new request's words"""
+        words = _words(request)
+        if all(tag in ("equal", "replace") for tag, *_ in opcodes):
+            substitutions = {
+                " ".join(entry.key[i1:i2]): " ".join(words[j1:j2])
+                for tag, i1, i2, j1, j2 in opcodes
+                if tag == "replace"
+            }
+            return _substitute(entry.plan, substitutions)
+        if self.settings.refill_llm:
+            return await self._refill_with_llm(entry, request)
+        return None
+
+    async def _refill_with_llm(self, entry: CachedPlan, request: str) -> Optional[Dict]:
+        template = {"title": entry.plan["title"], "steps": entry.plan["steps"]}
+        try:
+            response = await LLM(config_name=self.settings.refill_llm).ask(
+                messages=[
+                    Message.user_message(
+                        f"This plan was made for the request: {entry.request}\n\n"
+                        f"{json.dumps(template, ensure_ascii=False)}\n\n"
+                        f"Adapt it to the request: {request}\n\nKeep the number "
+                        "and order of the steps. Reply with JSON only, with the "
+                        "keys title and steps."
+                    )
+                ],
+                system_msgs=[
+                    Message.system_message("You adapt existing plans to new requests.")
+                ],
+                stream=False,
+                request_type="plan_refill",
+            )
+            adapted = json.loads(
+                response[response.index("{") : response.rindex("}") + 1]
+            )
+        except Exception as e:
+            logger.warning(f"Failed to adapt cached plan {entry.id}: {e}")
+            return None
+
+        steps = adapted.get("steps")
+        if (
+            not isinstance(adapted.get("title"), str)
+            or not isinstance(steps, list)
+            or len(steps) != len(entry.plan["steps"])
+            or not all(isinstance(step, str) for step in steps)
+        ):
+            logger.warning(f"Adapted plan of cached plan {entry.id} does not fit")
+            return None
+        return {**entry.plan, "title": adapted["title"], "steps": steps}
+
+    def store(self, request: str, plan: Dict) -> int:
+        """Cache the plan made for a request, replacing one for the same words"""
+        plan = {
+            key: plan[key]
+            for key in ("title", "steps", "step_dependencies")
+            if plan.get(key) is not None
+        }
+        now = time.time()
+        key = [word.lower() for word in _words(request)]
+        for entry in list(self.entries):
+            if entry.key == key:
+                self.invalidate(entry.id)
+
+        entry_id = self._execute(
+            "INSERT INTO plan_cache (request, plan, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?)",
+            request,
+            json.dumps(plan, ensure_ascii=False),
+            now,
+            now,
+        )
+        self.entries.append(CachedPlan(entry_id, request, plan, 0, now, now))
+
+        excess = len(self.entries) - max(self.settings.max_entries, 1)
+        if excess > 0:
+            by_use = sorted(self.entries, key=lambda entry: entry.last_used_at)
+            for entry in by_use[:excess]:
+                self.invalidate(entry.id)
+        return entry_id
+
+    def invalidate(self, entry_id: int) -> bool:
+        """Drop an entry, False if it did not exist"""
+        before = len(self.entries)
+        self.entries = [entry for entry in self.entries if entry.id != entry_id]
+        self._execute("DELETE FROM plan_cache WHERE id = ?", entry_id)
+        return len(self.entries) < before
+
+    def invalidate_matching(self, request: str) -> int:
+        """Drop every entry a request would reuse, returning their number"""
+        dropped = 0
+        while True:
+            entry, _ = self._match(request)
+            if entry is None:
+                return dropped
+            self.invalidate(entry.id)
+            dropped += 1
+
+    def clear(self) -> int:
+        """Drop all entries, returning their number"""
+        dropped = len(self.entries)
+        self.entries = []
+        self._execute("DELETE FROM plan_cache")
+        return dropped
+
+    def stats(self) -> Dict:
+        """Entries, and hits and misses of this process' lookups"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "total_entry_hits": sum(entry.hits for entry in self.entries),
+        }
+
+
+def _substitute(plan: Dict, substitutions: Dict[str, str]) -> Dict:
+    """Replace whole-word phrases in the title and steps of a plan"""
+    if not substitutions:
+        return dict(plan)
+    # One pass for all phrases, so a replacement is never replaced again
+    pattern = re.compile(
+        "|".join(
+            r"(?<!\w)" + r"\W+".join(map(re.escape, phrase.split())) + r"(?!\w)"
+            for phrase in sorted(substitutions, key=len, reverse=True)
+        ),
+        re.IGNORECASE,
+    )
+
+    def replace(text: str) -> str:
+        return pattern.sub(
+            lambda match: substitutions.get(
+                " ".join(_words(match.group())).lower(), match.group()
+            ),
+            text,
+        )
+
+    return {
+        **plan,
+        "title": replace(plan["title"]),
+        "steps": [replace(step) for step in plan["steps"]],
+    }
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """The process' plan cache, None unless enabled in ``[plan_cache]``"""
+    global _plan_cache
+    settings = config.plan_cache
+    if settings is None or not settings.enabled:
+        return None
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache(settings)
+    return _plan_cache
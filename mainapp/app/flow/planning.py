@@ -1,15 +1,25 @@
+import asyncio
 import json
+import re
 import time
+import uuid
+from collections import deque
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Literal, Optional, Set, Tuple, Union
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
 from app.agent.base import BaseAgent
+from app.budget import current_budget
+from app.events import PlanStepStatusChanged, emit
+from app.exceptions import BudgetExceeded, ToolError
 from app.flow.base import BaseFlow
-from app.llm import LLM
-from app.logger import logger
-from app.schema import AgentState, Message, ToolChoice
+from app.flow.plan_cache import PlanCache, get_plan_cache
+from app.llm import LLM, ROUTINE, tagged_tier, use_llm_tier
+from app.logger import log_payload, logger, truncate_payload
+from app.run import run_scope
+from app.sandbox.client import isolated_sandbox
+from app.schema import AgentState, Memory, Message, ToolChoice
 from app.tool import PlanningTool
 
 
@@ -42,14 +52,173 @@ class PlanStepStatus(str, Enum):
         }
 
 
+# Characters of a step's result kept in its notes, for the steps that depend on it
+STEP_RESULT_NOTE_CHARS = 500
+
+# Step type given in the step text, e.g. [SEARCH] or [CODE]; [STRONG] is not a
+# type but asks for the strong model of the LLM cascade
+_STEP_TYPE_PATTERN = re.compile(r"\[(?!STRONG\])([A-Z_]+)\]")
+
+# Executors ask for the remaining steps to be revised with a line like this
+_REPLAN_PATTERN = re.compile(r"REPLAN:\s*(.+)")
+
+_REVISE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "revise_plan",
+        "description": "Replace the steps of the plan that are not completed yet.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "description": "The steps still needed to accomplish the task, in order. Empty if nothing is left to do.",
+                    "type": "array",
+                    "items": {"type": "string"},
+                },
+                "step_dependencies": {
+                    "description": "For each of these steps, the indices of earlier steps in this list it depends on. Omit to run them one after another.",
+                    "type": "array",
+                    "items": {"type": "array", "items": {"type": "integer"}},
+                },
+            },
+            "required": ["steps"],
+        },
+    },
+}
+
+
+class _StepIndex:
+    """Statuses of a plan's steps and the queue of steps ready to start.
+
+    Built once per version of the plan. Completing a step only updates the
+    steps that depend on it, so the next ready step is found in O(1) instead
+    of scanning the plan.
+    """
+
+    def __init__(self, statuses: List[str], dependencies: List[List[int]]):
+        self.statuses = list(statuses)
+        self.dependents: List[List[int]] = [[] for _ in statuses]
+        self.waiting_on = [0] * len(statuses)
+        for index, step_dependencies in enumerate(dependencies):
+            for dependency in step_dependencies:
+                self.dependents[dependency].append(index)
+                if statuses[dependency] != PlanStepStatus.COMPLETED.value:
+                    self.waiting_on[index] += 1
+        # In progress steps of a resumed plan start again
+        self.ready = deque(
+            index
+            for index, status in enumerate(statuses)
+            if status in PlanStepStatus.get_active_statuses()
+            and not self.waiting_on[index]
+        )
+
+    def pop_ready(self) -> Optional[int]:
+        """Take the next step that can start, None if there is none"""
+        while self.ready:
+            index = self.ready.popleft()
+            if self.statuses[index] in PlanStepStatus.get_active_statuses():
+                return index
+        return None
+
+    def set_status(self, index: int, status: PlanStepStatus) -> None:
+        previous = self.statuses[index]
+        self.statuses[index] = status.value
+        if status != PlanStepStatus.COMPLETED or previous == status.value:
+            return
+        for dependent in self.dependents[index]:
+            self.waiting_on[dependent] -= 1
+            if (
+                not self.waiting_on[dependent]
+                and self.statuses[dependent] == PlanStepStatus.NOT_STARTED.value
+            ):
+                self.ready.append(dependent)
+
+
+class _ExecutorPool:
+    """Hands out executors to concurrently running steps.
+
+    An agent runs one step at a time. When the configured executor is busy,
+    an idle copy made by ``BaseAgent.spawn`` is reused, or a new one is made.
+    """
+
+    def __init__(self):
+        self._busy: Set[int] = set()
+        self._origins: Dict[int, BaseAgent] = {}
+        self._spares: Dict[int, List[BaseAgent]] = {}
+
+    def acquire(self, agent: BaseAgent) -> BaseAgent:
+        if id(agent) not in self._busy:
+            executor = agent
+        elif self._spares.get(id(agent)):
+            executor = self._spares[id(agent)].pop()
+        else:
+            executor = agent.spawn()
+            self._origins[id(executor)] = agent
+            logger.info(f"Spawned another {agent.name} to run plan steps in parallel")
+        self._busy.add(id(executor))
+        return executor
+
+    def release(self, executor: BaseAgent) -> None:
+        self._busy.discard(id(executor))
+        origin = self._origins.get(id(executor))
+        if origin is not None:
+            self._spares.setdefault(id(origin), []).append(executor)
+
+
 class PlanningFlow(BaseFlow):
-    """A flow that manages planning and execution of tasks using agents."""
+    """A flow that manages planning and execution of tasks using agents.
+
+    Steps run as soon as the steps they depend on are completed, up to
+    ``max_parallel_steps`` at a time. Plans without ``step_dependencies`` run
+    their steps one after another.
+
+    Running a flow with the ``plan_id`` of a stored plan resumes it: the plan
+    is not created again and completed steps are skipped.
+
+    With ``step_context="isolated"`` every step runs on an empty executor
+    memory and sees earlier steps only through the plan status, where each
+    completed step carries a short summary of its result. Input tokens per
+    step then stay flat instead of growing with every step's tool output.
+
+    With ``[plan_cache]`` enabled, a request similar enough to an earlier one
+    reuses that request's plan instead of planning with the LLM.
+
+    When a step fails, or its executor reports that the remaining steps need
+    to change, the flow waits for the running steps and has the LLM revise
+    only the steps that are not completed, up to ``max_replans`` times per
+    run. Completed steps keep their results.
+    """
 
     llm: LLM = Field(default_factory=lambda: LLM())
     planning_tool: PlanningTool = Field(default_factory=PlanningTool)
     executor_keys: List[str] = Field(default_factory=list)
-    active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")
+    active_plan_id: str = Field(
+        default_factory=lambda: f"plan_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    )
+    # The most recently started step
     current_step_index: Optional[int] = None
+    max_parallel_steps: int = Field(
+        3, description="Plan steps that may run at the same time"
+    )
+    step_context: Literal["shared", "isolated"] = Field(
+        "shared",
+        description="shared: executors keep their memory across steps; "
+        "isolated: each step starts from an empty memory",
+    )
+    plan_cache: Optional[PlanCache] = Field(
+        default_factory=get_plan_cache,
+        description="Plans of similar earlier requests, see [plan_cache]",
+    )
+
+    replan: bool = Field(
+        True, description="Revise the unfinished steps after a failed step"
+    )
+    max_replans: int = Field(3, description="Plan revisions per run")
+
+    # Entry of plan_cache the plan was taken from
+    _cache_entry_id: Optional[int] = PrivateAttr(default=None)
+    # Step statuses of the running plan, kept current by _mark_step
+    _step_index: Optional[_StepIndex] = PrivateAttr(default=None)
 
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
@@ -62,9 +231,11 @@ class PlanningFlow(BaseFlow):
         if "plan_id" in data:
             data["active_plan_id"] = data.pop("plan_id")
 
-        # Initialize the planning tool if not provided
+        # Initialize the planning tool if not provided, plans of a session are
+        # kept in their own namespace of the plan store
+        session_id = data.pop("session_id", None)
         if "planning_tool" not in data:
-            planning_tool = PlanningTool()
+            planning_tool = PlanningTool(namespace=session_id or "default")
             data["planning_tool"] = planning_tool
 
         # Call parent's init with the processed data
@@ -91,44 +262,41 @@ class PlanningFlow(BaseFlow):
         # Fallback to primary agent
         return self.primary_agent
 
-    async def execute(self, input_text: str) -> str:
+    async def _execute(self, input_text: str) -> str:
         """Execute the planning flow with agents."""
+        name = type(self).__name__
+        with run_scope(name, self.budget, self.planning_tool):
+            return await self._execute_plan(input_text)
+
+    async def _execute_plan(self, input_text: str) -> str:
         try:
             if not self.primary_agent:
                 raise ValueError("No primary agent available")
 
+            plan = self.planning_tool.get_plan_data(self.active_plan_id)
+            if plan is not None:
+                completed = plan["step_statuses"].count(PlanStepStatus.COMPLETED.value)
+                logger.info(
+                    f"Resuming plan {self.active_plan_id}, "
+                    f"{completed}/{len(plan['steps'])} steps already completed"
+                )
             # Create initial plan if input provided
-            if input_text:
+            elif input_text:
                 await self._create_initial_plan(input_text)
 
                 # Verify plan was created successfully
-                if self.active_plan_id not in self.planning_tool.plans:
+                if self.planning_tool.get_plan_data(self.active_plan_id) is None:
                     logger.error(
                         f"Plan creation failed. Plan ID {self.active_plan_id} not found in planning tool."
                     )
                     return f"Failed to create plan for: {input_text}"
 
-            result = ""
-            while True:
-                # Get current step to execute
-                self.current_step_index, step_info = await self._get_current_step_info()
-
-                # Exit if no more steps or plan completed
-                if self.current_step_index is None:
-                    result += await self._finalize_plan()
-                    break
-
-                # Execute current step with appropriate agent
-                step_type = step_info.get("type") if step_info else None
-                executor = self.get_executor(step_type)
-                step_result = await self._execute_step(executor, step_info)
-                result += step_result + "\n"
-
-                # Check if agent wants to terminate
-                if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
-                    break
-
+            result = await self._run_steps()
+            self._check_cached_plan()
             return result
+        except BudgetExceeded as e:
+            logger.warning(f"PlanningFlow stopped: {e}")
+            return f"Execution stopped: {e}"
         except Exception as e:
             logger.error(f"Error in PlanningFlow: {str(e)}")
             return f"Execution failed: {str(e)}"
@@ -137,11 +305,24 @@ class PlanningFlow(BaseFlow):
         """Create an initial plan based on the request using the flow's LLM and PlanningTool."""
         logger.info(f"Creating initial plan with ID: {self.active_plan_id}")
 
+        if self.plan_cache is not None:
+            cached = await self.plan_cache.lookup(request)
+            if cached is not None:
+                self._cache_entry_id, plan = cached
+                result = await self.planning_tool.execute(
+                    command="create", plan_id=self.active_plan_id, **plan
+                )
+                log_payload("INFO", "Plan creation result: ", result)
+                return
+
         # Create a system message for plan creation
         system_message = Message.system_message(
             "You are a planning assistant. Create a concise, actionable plan with clear steps. "
             "Focus on key milestones rather than detailed sub-steps. "
-            "Optimize for clarity and efficiency."
+            "Optimize for clarity and efficiency. "
+            "Steps run one after another by default; when some steps do not "
+            "depend on each other, set step_dependencies so they can run in "
+            "parallel (each entry lists the indices of earlier steps it needs)."
         )
 
         # Create a user message with the request
@@ -155,6 +336,7 @@ class PlanningFlow(BaseFlow):
             system_msgs=[system_message],
             tools=[self.planning_tool.to_param()],
             tool_choice=ToolChoice.AUTO,
+            request_type="plan",
         )
 
         # Process tool calls if present
@@ -176,7 +358,8 @@ class PlanningFlow(BaseFlow):
                     # Execute the tool via ToolCollection instead of directly
                     result = await self.planning_tool.execute(**args)
 
-                    logger.info(f"Plan creation result: {str(result)}")
+                    log_payload("INFO", "Plan creation result: ", result)
+                    self._cache_plan(request)
                     return
 
         # If execution reached here, create a default plan
@@ -192,75 +375,232 @@ class PlanningFlow(BaseFlow):
             }
         )
 
-    async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
-        """
-        Parse the current plan to identify the first non-completed step's index and info.
-        Returns (None, None) if no active step is found.
-        """
-        if (
-            not self.active_plan_id
-            or self.active_plan_id not in self.planning_tool.plans
-        ):
-            logger.error(f"Plan with ID {self.active_plan_id} not found")
-            return None, None
-
+    def _cache_plan(self, request: str) -> None:
+        """Keep the plan just made with the LLM for similar later requests."""
+        plan = self.planning_tool.get_plan_data(self.active_plan_id)
+        if self.plan_cache is None or plan is None:
+            return
         try:
-            # Direct access to plan data from planning tool storage
-            plan_data = self.planning_tool.plans[self.active_plan_id]
-            steps = plan_data.get("steps", [])
-            step_statuses = plan_data.get("step_statuses", [])
+            self.plan_cache.store(request, plan)
+        except Exception as e:
+            logger.warning(f"Failed to cache plan {self.active_plan_id}: {e}")
 
-            # Find first non-completed step
-            for i, step in enumerate(steps):
-                if i >= len(step_statuses):
-                    status = PlanStepStatus.NOT_STARTED.value
-                else:
-                    status = step_statuses[i]
-
-                if status in PlanStepStatus.get_active_statuses():
-                    # Extract step type/category if available
-                    step_info = {"text": step}
-
-                    # Try to extract step type from the text (e.g., [SEARCH] or [CODE])
-                    import re
-
-                    type_match = re.search(r"\[([A-Z_]+)\]", step)
-                    if type_match:
-                        step_info["type"] = type_match.group(1).lower()
-
-                    # Mark current step as in_progress
-                    try:
-                        await self.planning_tool.execute(
-                            command="mark_step",
-                            plan_id=self.active_plan_id,
-                            step_index=i,
-                            step_status=PlanStepStatus.IN_PROGRESS.value,
+    def _check_cached_plan(self) -> None:
+        """Drop a reused plan from the cache when it ended with blocked steps."""
+        if self.plan_cache is None or self._cache_entry_id is None:
+            return
+        plan = self.planning_tool.get_plan_data(self.active_plan_id)
+        if plan and PlanStepStatus.BLOCKED.value in plan["step_statuses"]:
+            logger.info(f"Dropping cached plan {self._cache_entry_id}, steps blocked")
+            self.plan_cache.invalidate(self._cache_entry_id)
+
+    async def _run_steps(self) -> str:
+        """Run the plan's steps as their dependencies complete.
+
+        Ready steps are started up to ``max_parallel_steps`` at a time, each on
+        its own executor. Plan updates are synchronous read-modify-write calls
+        on the plan store, so concurrently finishing steps cannot interleave
+        them. A requested revision waits until no step runs, then replaces the
+        unfinished steps and the run carries on with the revised plan.
+        """
+        result = ""
+        budget = current_budget()
+        pool = _ExecutorPool()
+        running: Dict[asyncio.Task, Tuple[int, BaseAgent]] = {}
+        stopped = False
+        replans = 0
+        replan_reason: Optional[str] = None
+        self._step_index = self._build_step_index()
+        try:
+            while True:
+                # Stop starting steps once the budget is spent, running ones finish
+                if not stopped and budget is not None and budget.exhausted:
+                    reason = budget.exceeded_reason()
+                    logger.warning(f"Stopping plan {self.active_plan_id}: {reason}")
+                    result += f"Stopped: {reason}\n"
+                    stopped = True
+
+                if not stopped and replan_reason is None:
+                    while len(running) < max(self.max_parallel_steps, 1):
+                        index = self._step_index.pop_ready()
+                        if index is None:
+                            break
+                        step_info = await self._start_step(index)
+                        executor = pool.acquire(
+                            self.get_executor(step_info.get("type"))
                         )
-                    except Exception as e:
-                        logger.warning(f"Error marking step as in_progress: {e}")
-                        # Update step status directly if needed
-                        if i < len(step_statuses):
-                            step_statuses[i] = PlanStepStatus.IN_PROGRESS.value
-                        else:
-                            while len(step_statuses) < i:
-                                step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-                            step_statuses.append(PlanStepStatus.IN_PROGRESS.value)
-
-                        plan_data["step_statuses"] = step_statuses
-
-                    return i, step_info
+                        task = asyncio.create_task(
+                            self._execute_step(executor, index, step_info)
+                        )
+                        running[task] = (index, executor)
+
+                if not running:
+                    if replan_reason is not None and not stopped:
+                        replans += 1
+                        await self._replan(replan_reason)
+                        replan_reason = None
+                        continue
+                    # Nothing runs and nothing more can start
+                    break
 
-            return None, None  # No active step found
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    index, executor = running.pop(task)
+                    pool.release(executor)
+                    step_result = task.result()
+                    result += step_result + "\n"
+
+                    # Check if agent wants to terminate
+                    if executor.state == AgentState.FINISHED:
+                        stopped = True
+                    elif (
+                        self.replan
+                        and replans < self.max_replans
+                        and replan_reason is None
+                    ):
+                        replan_reason = self._replan_reason(index, step_result)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        if not stopped:
+            result += await self._finalize_plan()
+        return result
+
+    def _build_step_index(self) -> _StepIndex:
+        plan = self.planning_tool.get_plan_data(self.active_plan_id)
+        if plan is None:
+            logger.error(f"Plan with ID {self.active_plan_id} not found")
+            return _StepIndex([], [])
+        return _StepIndex(
+            plan["step_statuses"], PlanningTool.get_step_dependencies(plan)
+        )
 
-        except Exception as e:
-            logger.warning(f"Error finding current step index: {e}")
-            return None, None
+    def _replan_reason(self, step_index: int, step_result: str) -> Optional[str]:
+        """Why the plan needs revising after a step, None if it does not."""
+        if self._step_index.statuses[step_index] == PlanStepStatus.BLOCKED.value:
+            return f"Step {step_index} failed: {step_result}"
+        match = _REPLAN_PATTERN.search(step_result)
+        if match:
+            return f"Step {step_index} found: {match.group(1).strip()}"
+        return None
+
+    async def _replan(self, reason: str) -> None:
+        """Have the LLM replace the steps that are not completed.
+
+        Completed steps are kept, moved to the front of the plan, together
+        with their notes and outputs. The revised steps are patched in with
+        the planning tool's update command and start from not started.
+        """
+        logger.info(f"Revising plan {self.active_plan_id}: {reason}")
+        plan = self.planning_tool.get_plan_data(self.active_plan_id)
+        completed = [
+            step
+            for step, status in zip(plan["steps"], plan["step_statuses"])
+            if status == PlanStepStatus.COMPLETED.value
+        ]
+        try:
+            response = await self.llm.ask_tool(
+                messages=[
+                    Message.user_message(
+                        f"{await self._get_plan_text()}\n\nWHY THE PLAN NEEDS "
+                        f"REVISING:\n{truncate_payload(reason, STEP_RESULT_NOTE_CHARS)}"
+                        "\n\nCall revise_plan with the steps still needed to "
+                        "accomplish the task. They replace every step that is not "
+                        "completed: keep steps that are still right word for word, "
+                        "rework failed ones and leave out what is no longer needed."
+                    )
+                ],
+                system_msgs=[
+                    Message.system_message(
+                        "You revise plans while they run, based on the outcome "
+                        "of the steps done so far."
+                    )
+                ],
+                tools=[_REVISE_TOOL],
+                tool_choice=ToolChoice.REQUIRED,
+                request_type="replan",
+            )
+            calls = (response.tool_calls if response else None) or []
+            call = next(c for c in calls if c.function.name == "revise_plan")
+            args = json.loads(call.function.arguments)
+            remaining = [step for step in args["steps"] if step.strip()]
+        except (StopIteration, json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to revise plan {self.active_plan_id}: {e}")
+            return
+        if not completed and not remaining:
+            logger.warning(f"Revised plan {self.active_plan_id} has no steps left")
+            return
 
-    async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
-        """Execute the current step with the specified agent using agent.run()."""
+        # Dependencies of the revised steps index into the revised steps
+        offset = len(completed)
+        dependencies = args.get("step_dependencies")
+        if not (
+            isinstance(dependencies, list)
+            and len(dependencies) == len(remaining)
+            and all(
+                isinstance(deps, list)
+                and all(isinstance(dep, int) and 0 <= dep < index for dep in deps)
+                for index, deps in enumerate(dependencies)
+            )
+        ):
+            dependencies = [
+                [index - 1] if index else [] for index in range(len(remaining))
+            ]
+        step_dependencies = [[] for _ in completed] + [
+            [offset + dep for dep in deps] for deps in dependencies
+        ]
+
+        self._step_index = None
+        try:
+            await self.planning_tool.execute(
+                command="update",
+                plan_id=self.active_plan_id,
+                steps=completed + remaining,
+                step_dependencies=step_dependencies,
+            )
+        except ToolError as e:
+            logger.warning(f"Failed to update plan {self.active_plan_id}: {e}")
+        else:
+            # Steps kept word for word keep their status, a failed one is retried
+            plan = self.planning_tool.get_plan_data(self.active_plan_id)
+            for index in range(offset, len(plan["steps"])):
+                if plan["step_statuses"][index] != PlanStepStatus.NOT_STARTED.value:
+                    await self._mark_step(index, PlanStepStatus.NOT_STARTED, "")
+            logger.info(
+                f"Revised plan {self.active_plan_id}: {offset} steps completed, "
+                f"{len(remaining)} to go"
+            )
+        finally:
+            self._step_index = self._build_step_index()
+
+    async def _start_step(self, step_index: int) -> dict:
+        """Mark a step as in progress and return its info for the executor."""
+        plan_data = self.planning_tool.get_plan_data(self.active_plan_id)
+        step = plan_data["steps"][step_index]
+        step_info = {"text": step}
+
+        # Try to extract step type from the text (e.g., [SEARCH] or [CODE])
+        type_match = _STEP_TYPE_PATTERN.search(step)
+        if type_match:
+            step_info["type"] = type_match.group(1).lower()
+
+        self.current_step_index = step_index
+        self._emit_step_status(step_index, PlanStepStatus.IN_PROGRESS, step)
+        await self._mark_step(step_index, PlanStepStatus.IN_PROGRESS)
+        return step_info
+
+    async def _execute_step(
+        self, executor: BaseAgent, step_index: int, step_info: dict
+    ) -> str:
+        """Execute a step with the specified agent using agent.run()."""
         # Prepare context for the agent with current plan status
         plan_status = await self._get_plan_text()
-        step_text = step_info.get("text", f"Step {self.current_step_index}")
+        step_text = step_info.get("text", f"Step {step_index}")
 
         # Create a prompt for the agent to execute the current step
         step_prompt = f"""
@@ -268,53 +608,166 @@ class PlanningFlow(BaseFlow):
         {plan_status}
 
         YOUR CURRENT TASK:
-        You are now working on step {self.current_step_index}: "{step_text}"
+        You are now working on step {step_index}: "{step_text}"
 
         Please execute this step using the appropriate tools. When you're done, provide a summary of what you accomplished.
         """
+        if self.replan:
+            step_prompt += (
+                "If what you found means the remaining steps of the plan must "
+                "change, add a line 'REPLAN: <what changed>' to your summary.\n"
+            )
 
-        # Use agent.run() to execute the step
+        # Use agent.run() to execute the step, in a sandbox of its own: a run
+        # cleans up its sandbox when it ends, which must not hit steps that
+        # still run
         try:
-            step_result = await executor.run(step_prompt)
+            async with isolated_sandbox():
+                with use_llm_tier(tagged_tier(step_text)):
+                    if self.step_context == "isolated":
+                        step_result = await self._run_isolated(
+                            executor, step_prompt
+                        )
+                    else:
+                        step_result = await executor.run(step_prompt)
+
+            # A run cut short by the budget or the step limit did not finish
+            # the step, its partial output must not be stored as the result
+            budget = executor.budget or current_budget()
+            exceeded = budget.exceeded_reason() if budget is not None else None
+            if exceeded:
+                # Not started, so a resumed plan runs the step again
+                logger.warning(f"Step {step_index} stopped: {exceeded}")
+                self._emit_step_status(step_index, PlanStepStatus.NOT_STARTED)
+                await self._mark_step(
+                    step_index, PlanStepStatus.NOT_STARTED, f"Stopped: {exceeded}"
+                )
+                return step_result
+            if executor.stop_reason:
+                logger.warning(f"Step {step_index} stopped: {executor.stop_reason}")
+                self._emit_step_status(step_index, PlanStepStatus.BLOCKED)
+                await self._mark_step(
+                    step_index,
+                    PlanStepStatus.BLOCKED,
+                    f"Unfinished: {executor.stop_reason}",
+                )
+                return step_result
 
             # Mark the step as completed after successful execution
-            await self._mark_step_completed()
+            await self._mark_step_completed(step_index, step_result)
 
             return step_result
         except Exception as e:
-            logger.error(f"Error executing step {self.current_step_index}: {e}")
-            return f"Error executing step {self.current_step_index}: {str(e)}"
+            logger.error(f"Error executing step {step_index}: {e}")
+            # A failed run leaves its step counter behind, reset it so the
+            # executor can take the next step
+            executor.current_step = 0
+            # Blocked keeps the steps that depend on it from starting
+            self._emit_step_status(step_index, PlanStepStatus.BLOCKED)
+            await self._mark_step(step_index, PlanStepStatus.BLOCKED, f"Error: {e}")
+            return f"Error executing step {step_index}: {str(e)}"
+
+    @staticmethod
+    async def _run_isolated(executor: BaseAgent, step_prompt: str) -> str:
+        """Run a step on an empty memory, the executor's own memory is restored."""
+        memory = executor.memory
+        executor.memory = Memory(max_messages=memory.max_messages)
+        try:
+            return await executor.run(step_prompt)
+        finally:
+            executor.memory = memory
 
-    async def _mark_step_completed(self) -> None:
-        """Mark the current step as completed."""
-        if self.current_step_index is None:
-            return
+    async def _summarize_step(self, step_index: int, step_result: str) -> str:
+        """Condense a step result into the note later steps see.
+
+        Called once per step, the summary is kept in the step notes of the
+        stored plan, so it is reused by every later step and by resumed flows.
+        """
+        if len(step_result) <= STEP_RESULT_NOTE_CHARS:
+            return step_result
+        try:
+            with use_llm_tier(ROUTINE):
+                summary = await self.llm.ask(
+                    messages=[
+                        Message.user_message(
+                            f"Summarize the result of step {step_index} for the "
+                            f"steps that build on it:\n\n{step_result}"
+                        )
+                    ],
+                    system_msgs=[
+                        Message.system_message(
+                            "You write compact hand-off notes. Keep facts, "
+                            "numbers, file paths and URLs that later steps need, "
+                            f"in at most {STEP_RESULT_NOTE_CHARS} characters."
+                        )
+                    ],
+                    stream=False,
+                    request_type="step_summary",
+                )
+            return truncate_payload(summary, STEP_RESULT_NOTE_CHARS)
+        except Exception as e:
+            logger.warning(f"Failed to summarize step {step_index}: {e}")
+            return truncate_payload(step_result, STEP_RESULT_NOTE_CHARS)
+
+    async def _mark_step_completed(self, step_index: int, step_result: str) -> None:
+        """Mark a step as completed, keeping its result for dependent steps."""
+        self._emit_step_status(step_index, PlanStepStatus.COMPLETED)
+        try:
+            self.planning_tool.set_step_output(
+                self.active_plan_id, step_index, step_result
+            )
+        except ToolError as e:
+            logger.warning(f"Failed to store output of step {step_index}: {e}")
+        if self.step_context == "isolated":
+            notes = await self._summarize_step(step_index, step_result)
+        else:
+            notes = truncate_payload(step_result, STEP_RESULT_NOTE_CHARS)
+        await self._mark_step(step_index, PlanStepStatus.COMPLETED, notes)
+        logger.info(
+            f"Marked step {step_index} as completed in plan {self.active_plan_id}"
+        )
 
+    async def _mark_step(
+        self, step_index: int, status: PlanStepStatus, notes: Optional[str] = None
+    ) -> None:
+        """Set a step's status and notes in the planning tool."""
+        if self._step_index is not None:
+            self._step_index.set_status(step_index, status)
         try:
-            # Mark the step as completed
             await self.planning_tool.execute(
                 command="mark_step",
                 plan_id=self.active_plan_id,
-                step_index=self.current_step_index,
-                step_status=PlanStepStatus.COMPLETED.value,
-            )
-            logger.info(
-                f"Marked step {self.current_step_index} as completed in plan {self.active_plan_id}"
+                step_index=step_index,
+                step_status=status.value,
+                step_notes=notes,
             )
         except Exception as e:
             logger.warning(f"Failed to update plan status: {e}")
-            # Update step status directly in planning tool storage
-            if self.active_plan_id in self.planning_tool.plans:
-                plan_data = self.planning_tool.plans[self.active_plan_id]
+            # Update step status directly in the plan store
+            plan_data = self.planning_tool.get_plan_data(self.active_plan_id)
+            if plan_data is not None:
                 step_statuses = plan_data.get("step_statuses", [])
 
                 # Ensure the step_statuses list is long enough
-                while len(step_statuses) <= self.current_step_index:
+                while len(step_statuses) <= step_index:
                     step_statuses.append(PlanStepStatus.NOT_STARTED.value)
 
                 # Update the status
-                step_statuses[self.current_step_index] = PlanStepStatus.COMPLETED.value
+                step_statuses[step_index] = status.value
                 plan_data["step_statuses"] = step_statuses
+                self.planning_tool.store.save(plan_data)
+
+    def _emit_step_status(
+        self, index: int, status: PlanStepStatus, step: Optional[str] = None
+    ) -> None:
+        emit(
+            PlanStepStatusChanged(
+                plan_id=self.active_plan_id,
+                step_index=index,
+                step=step,
+                status=status.value,
+            )
+        )
 
     async def _get_plan_text(self) -> str:
         """Get the current plan as formatted text."""
@@ -330,10 +783,10 @@ class PlanningFlow(BaseFlow):
     def _generate_plan_text_from_storage(self) -> str:
         """Generate plan text directly from storage if the planning tool fails."""
         try:
-            if self.active_plan_id not in self.planning_tool.plans:
+            plan_data = self.planning_tool.get_plan_data(self.active_plan_id)
+            if plan_data is None:
                 return f"Error: Plan with ID {self.active_plan_id} not found"
 
-            plan_data = self.planning_tool.plans[self.active_plan_id]
             title = plan_data.get("title", "Untitled Plan")
             steps = plan_data.get("steps", [])
             step_statuses = plan_data.get("step_statuses", [])
@@ -399,9 +852,10 @@ class PlanningFlow(BaseFlow):
                 f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
             )
 
-            response = await self.llm.ask(
-                messages=[user_message], system_msgs=[system_message]
-            )
+            with use_llm_tier(ROUTINE):
+                response = await self.llm.ask(
+                    messages=[user_message], system_msgs=[system_message]
+                )
 
             return f"Plan completed:\n\n{response}"
         except Exception as e:
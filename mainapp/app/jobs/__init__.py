@@ -0,0 +1,8 @@
+"""Durable job queue with multi-process workers.
+
+``JobQueue`` keeps jobs in a SQLite database, so submitted, running and
+finished jobs survive restarts. Worker processes started by ``run_workers``
+each run their own event loop and agents, and claim jobs by priority under
+a lease they keep renewing; a job whose worker dies is taken over once its
+lease expires. Submit jobs and start workers with ``run_jobs.py``.
+"""
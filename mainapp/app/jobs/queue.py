@@ -0,0 +1,293 @@
+"""SQLite-backed queue of agent jobs.
+
+A job moves through these states::
+
+    queued -> running -> succeeded
+                      -> queued (retry) ... -> failed
+    queued / running -> cancelled
+
+Workers claim the queued job with the highest priority, oldest first, and
+hold it under a lease they renew while it runs. A job whose lease expires,
+because its worker crashed or hung, is claimed again by the next worker as a
+new attempt. Failed attempts are retried after ``retry_delay`` seconds,
+doubled for every further attempt, until ``max_attempts`` is reached.
+
+The database runs in WAL mode and claims take a write lock, so any number of
+worker processes, on one or several hosts sharing the file, can use the same
+queue without claiming a job twice.
+"""
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from app.config import PROJECT_ROOT, JobQueueSettings, config
+from app.exceptions import JobNotFound
+from app.logger import logger
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueue:
+    """Jobs stored in a SQLite database, shared by submitters and workers."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            prompt TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            available_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            result TEXT,
+            error TEXT,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_priority
+            ON jobs (status, priority DESC, created_at);
+    """
+
+    def __init__(self, settings: Optional[JobQueueSettings] = None):
+        import sqlite3
+
+        self.settings = settings or config.job_queue or JobQueueSettings()
+        db_path = PROJECT_ROOT / self.settings.path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, timeout=30.0, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, *params) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def _update(self, sql: str, *params) -> int:
+        """Run an UPDATE, returning the number of changed rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    # Submitting and inspecting jobs
+
+    def submit(
+        self,
+        prompt: str,
+        mode: str = "agent",
+        priority: int = 0,
+        max_attempts: Optional[int] = None,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """Queue a prompt and return the job id.
+
+        Jobs with a higher priority run first. Submitting an id that already
+        exists leaves that job untouched, so a producer can safely resubmit
+        after a crash.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        self._update(
+            "INSERT OR IGNORE INTO jobs (id, prompt, mode, priority, status, "
+            "max_attempts, available_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            job_id,
+            prompt,
+            mode,
+            priority,
+            QUEUED,
+            max(max_attempts or self.settings.max_attempts, 1),
+            now,
+            now,
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Dict:
+        """Return the job as a dict"""
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", job_id)
+        if not rows:
+            raise JobNotFound(f"No job with id {job_id}")
+        return rows[0]
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Jobs without their prompt and result, newest first"""
+        columns = (
+            "id, mode, priority, status, attempts, max_attempts, error, "
+            "input_tokens, output_tokens, cost, created_at, started_at, finished_at"
+        )
+        if status is None:
+            return self._query(
+                f"SELECT {columns} FROM jobs ORDER BY created_at DESC LIMIT ?", limit
+            )
+        return self._query(
+            f"SELECT {columns} FROM jobs WHERE status = ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            status,
+            limit,
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        rows = self._query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job, False if it already finished.
+
+        A running job is stopped by its worker at the next heartbeat.
+        """
+        self.get(job_id)
+        changed = self._update(
+            "UPDATE jobs SET status = ?, finished_at = ? "
+            "WHERE id = ? AND status IN (?, ?)",
+            CANCELLED,
+            time.time(),
+            job_id,
+            QUEUED,
+            RUNNING,
+        )
+        return changed > 0
+
+    # Worker side, every call after claim is a no-op once the worker lost
+    # the job to cancellation or to another worker
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the next job for a worker, None if there is nothing to run"""
+        now = time.time()
+        with self._lock:
+            # Takes the write lock up front, so two workers never pick the
+            # same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker vanished during their last attempt
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, "
+                    "lease_owner = NULL WHERE status = ? AND lease_expires_at < ? "
+                    "AND attempts >= max_attempts",
+                    (FAILED, "Lease expired on the last attempt", now, RUNNING, now),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE (status = ? AND available_at <= ?) "
+                    "OR (status = ? AND lease_expires_at < ?) "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, "
+                        "lease_owner = ?, lease_expires_at = ?, started_at = ? "
+                        "WHERE id = ?",
+                        (
+                            RUNNING,
+                            worker_id,
+                            now + self.settings.lease_seconds,
+                            now,
+                            row["id"],
+                        ),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renew the lease, False if the job was cancelled or taken over"""
+        changed = self._update(
+            "UPDATE jobs SET lease_expires_at = ? "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            time.time() + self.settings.lease_seconds,
+            job_id,
+            RUNNING,
+            worker_id,
+        )
+        return changed > 0
+
+    def complete(self, job_id: str, worker_id: str, result: str, usage: Dict) -> bool:
+        """Store the result of a job, False if the worker no longer holds it"""
+        changed = self._update(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, "
+            "lease_owner = NULL, finished_at = ?, input_tokens = input_tokens + ?, "
+            "output_tokens = output_tokens + ?, cost = cost + ? "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            SUCCEEDED,
+            result,
+            time.time(),
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            usage.get("cost", 0.0),
+            job_id,
+            RUNNING,
+            worker_id,
+        )
+        return changed > 0
+
+    def fail(self, job_id: str, worker_id: str, error: str, usage: Dict) -> str:
+        """Record a failed attempt and return the new status of the job.
+
+        The job is queued again with a growing delay while it has attempts
+        left, and fails for good otherwise.
+        """
+        now = time.time()
+        changed = self._update(
+            "UPDATE jobs SET error = ?, lease_owner = NULL, "
+            "input_tokens = input_tokens + ?, output_tokens = output_tokens + ?, "
+            "cost = cost + ?, "
+            "status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+            "available_at = ? + ? * (1 << (attempts - 1)), "
+            "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            error,
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            usage.get("cost", 0.0),
+            QUEUED,
+            FAILED,
+            now,
+            self.settings.retry_delay,
+            now,
+            job_id,
+            RUNNING,
+            worker_id,
+        )
+        if not changed:
+            logger.warning(f"Job {job_id} is no longer held by {worker_id}")
+        return self.get(job_id)["status"]
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """Put a job back in the queue without counting the attempt.
+
+        Used by workers shutting down, so their jobs run again right away
+        instead of after the lease expires.
+        """
+        changed = self._update(
+            "UPDATE jobs SET status = ?, attempts = attempts - 1, "
+            "lease_owner = NULL, available_at = ? "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            QUEUED,
+            time.time(),
+            job_id,
+            RUNNING,
+            worker_id,
+        )
+        return changed > 0
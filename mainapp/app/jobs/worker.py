@@ -0,0 +1,254 @@
+"""Worker processes that run the jobs of a JobQueue.
+
+Each worker process runs its own event loop with up to ``jobs_per_worker``
+jobs at a time, every job on a fresh agent or flow with its own budget and
+sandbox. CPU-bound work of one process (prompt building, parsing, tool
+results) no longer holds up the jobs of the others.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.budget import RunBudget
+from app.config import JobQueueSettings, config
+from app.jobs.queue import QUEUED, RUNNING, JobQueue
+from app.logger import logger
+from app.runner import create_budget, run_prompt
+
+
+Runner = Callable[[str, str, RunBudget], Awaitable[str]]
+
+# Seconds a stopped pool waits for its workers to release their jobs
+SHUTDOWN_TIMEOUT = 30
+
+# A worker process up this long before it crashed counts as healthy, its
+# restart delay starts over
+HEALTHY_SECONDS = 600
+
+
+class Worker:
+    """Claims jobs from a queue and runs them on this process' event loop."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        concurrency: int,
+        runner: Runner = run_prompt,
+        worker_id: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.concurrency = max(concurrency, 1)
+        self.runner = runner
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+        self._running: Set[asyncio.Task] = set()
+
+    def stop(self) -> None:
+        """Stop claiming jobs and hand the running ones back to the queue"""
+        self._stopping.set()
+        for task in self._running:
+            task.cancel()
+
+    async def run(self, exit_when_idle: bool = False) -> None:
+        """Run jobs until stopped, or until no job is queued or running.
+
+        With ``exit_when_idle`` the worker keeps polling while jobs wait for a
+        retry or run on other workers, as those may still come back queued.
+        """
+        poll_interval = self.queue.settings.poll_interval
+        logger.info(f"Worker {self.worker_id} running {self.concurrency} jobs at once")
+        while not self._stopping.is_set():
+            if len(self._running) >= self.concurrency:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            if job is None:
+                if exit_when_idle and not self._running and not await self._pending():
+                    break
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._run_job(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _pending(self) -> bool:
+        """Whether any job is still queued or running"""
+        counts = await asyncio.to_thread(self.queue.counts)
+        return bool(counts.get(QUEUED) or counts.get(RUNNING))
+
+    async def _run_job(self, job: Dict) -> None:
+        job_id = job["id"]
+        logger.info(
+            f"Job {job_id} started, attempt {job['attempts']}/{job['max_attempts']}"
+        )
+        budget = create_budget()
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(
+            self._heartbeat(job_id, asyncio.current_task(), lost)
+        )
+        started_at = time.monotonic()
+        try:
+            result = await self.runner(job["prompt"], job["mode"], budget)
+        except asyncio.CancelledError:
+            if lost.is_set():
+                logger.warning(f"Job {job_id} stopped, cancelled or taken over")
+            else:
+                await asyncio.to_thread(self.queue.release, job_id, self.worker_id)
+                logger.info(f"Job {job_id} handed back to the queue")
+            return
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            status = await asyncio.to_thread(
+                self.queue.fail, job_id, self.worker_id, error, _usage(budget)
+            )
+            logger.error(f"Job {job_id} failed ({status}): {error}")
+            return
+        finally:
+            heartbeat.cancel()
+        await asyncio.to_thread(
+            self.queue.complete, job_id, self.worker_id, result, _usage(budget)
+        )
+        logger.info(
+            f"Job {job_id} succeeded in {time.monotonic() - started_at:.1f}s "
+            f"({budget.summary()})"
+        )
+
+    async def _heartbeat(
+        self, job_id: str, task: asyncio.Task, lost: asyncio.Event
+    ) -> None:
+        """Renew the lease of a job, cancelling it once the lease is lost"""
+        while True:
+            await asyncio.sleep(self.queue.settings.lease_seconds / 3)
+            try:
+                held = await asyncio.to_thread(
+                    self.queue.heartbeat, job_id, self.worker_id
+                )
+            except Exception as e:
+                # The lease outlasts a few missed heartbeats
+                logger.warning(f"Heartbeat of job {job_id} failed: {e}")
+                continue
+            if not held:
+                lost.set()
+                task.cancel()
+                return
+
+
+def _usage(budget: RunBudget) -> Dict:
+    return {
+        "input_tokens": budget.input_tokens,
+        "output_tokens": budget.output_tokens,
+        "cost": round(budget.cost, 6),
+        "models": budget.usage_by_model,
+    }
+
+
+def run_worker(index: int, concurrency: int, exit_when_idle: bool = False) -> None:
+    """Entry point of a worker process"""
+    # Ctrl+C reaches the whole process group, the pool stops workers with
+    # SIGTERM instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def main() -> None:
+        worker = Worker(
+            JobQueue(),
+            concurrency,
+            worker_id=f"{socket.gethostname()}:{os.getpid()}:{index}",
+        )
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.stop)
+        try:
+            await worker.run(exit_when_idle=exit_when_idle)
+        finally:
+            worker.queue.close()
+
+    asyncio.run(main())
+
+
+def run_workers(
+    processes: Optional[int] = None,
+    jobs_per_worker: Optional[int] = None,
+    exit_when_idle: bool = False,
+) -> None:
+    """Run a pool of worker processes until interrupted.
+
+    Worker processes that die are replaced after ``restart_delay`` seconds,
+    doubled for each crash in a row, until one crashed ``max_restarts`` times
+    in a row. Their jobs are taken over once the lease expires. With
+    ``exit_when_idle`` the pool returns when all workers found no job queued
+    or running.
+    """
+    settings = config.job_queue or JobQueueSettings()
+    processes = max(processes or settings.workers, 1)
+    jobs_per_worker = jobs_per_worker or settings.jobs_per_worker
+    # Fresh interpreters, nothing of the parent's event loop or connections
+    # is inherited
+    context = multiprocessing.get_context("spawn")
+
+    started_at: Dict[int, float] = {}
+    # Crashes in a row per worker, and when a crashed worker is due to restart
+    crashes = [0] * processes
+    restart_at: Dict[int, float] = {}
+    given_up: Set[int] = set()
+
+    def start(index: int) -> multiprocessing.Process:
+        process = context.Process(
+            target=run_worker,
+            args=(index, jobs_per_worker, exit_when_idle),
+            name=f"job-worker-{index}",
+        )
+        process.start()
+        started_at[index] = time.monotonic()
+        return process
+
+    logger.info(f"Starting {processes} workers, {jobs_per_worker} jobs each")
+    workers: List[multiprocessing.Process] = [start(i) for i in range(processes)]
+    try:
+        while restart_at or any(process.is_alive() for process in workers):
+            for index, process in enumerate(workers):
+                if index in given_up:
+                    continue
+                if index in restart_at:
+                    if time.monotonic() < restart_at[index]:
+                        time.sleep(1 / processes)
+                        continue
+                    del restart_at[index]
+                    workers[index] = start(index)
+                    continue
+                process.join(timeout=1 / processes)
+                if process.exitcode in (None, 0) or exit_when_idle:
+                    continue
+                if time.monotonic() - started_at[index] >= HEALTHY_SECONDS:
+                    crashes[index] = 0
+                if crashes[index] >= settings.max_restarts:
+                    given_up.add(index)
+                    logger.error(
+                        f"Worker {index} exited with code {process.exitcode} "
+                        f"after {crashes[index]} restarts, not restarting it"
+                    )
+                    continue
+                delay = settings.restart_delay * 2 ** crashes[index]
+                crashes[index] += 1
+                logger.warning(
+                    f"Worker {index} exited with code {process.exitcode}, "
+                    f"restarting it in {delay:.0f}s"
+                )
+                restart_at[index] = time.monotonic() + delay
+    except KeyboardInterrupt:
+        logger.info("Stopping workers, running jobs go back to the queue")
+    finally:
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        for process in workers:
+            process.join(timeout=SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.kill()
@@ -0,0 +1,29 @@
+"""Lazily imported package exports.
+
+Packages whose exports pull in optional backends (browser_use, docker,
+search libraries) list them by module instead of importing them, so that
+importing one export does not import all the others.
+"""
+import sys
+from importlib import import_module
+from typing import Any, Callable, Dict
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Callable[[str], Any]:
+    """Build a package ``__getattr__`` importing each export on first access.
+
+    Args:
+        package: ``__name__`` of the package
+        exports: Export names mapped to the module defining them
+    """
+    namespace = sys.modules[package].__dict__
+
+    def __getattr__(name: str) -> Any:
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(import_module(exports[name]), name)
+        # Later lookups find the export without calling __getattr__
+        namespace[name] = value
+        return value
+
+    return __getattr__
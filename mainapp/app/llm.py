@@ -1,5 +1,11 @@
+import asyncio
+import contextlib
+import functools
 import math
-from typing import Dict, List, Optional, Union
+import re
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Union
 
 import tiktoken
 from openai import (
@@ -12,22 +18,31 @@ from openai import (
 )
 from openai.types.chat import ChatCompletion, ChatCompletionMessage
 from tenacity import (
+    RetryCallState,
     retry,
     retry_if_exception_type,
+    retry_if_not_exception_type,
     stop_after_attempt,
     wait_random_exponential,
 )
 
-from app.bedrock import BedrockClient
+from app import metrics
+from app.budget import current_budget
 from app.config import LLMSettings, config
-from app.exceptions import TokenLimitExceeded
+from app.events import LLMDelta, emit, is_streaming
+from app.exceptions import BudgetExceeded, TokenLimitExceeded
 from app.logger import logger  # Assuming a logger is set up in your app
+from app.output_limits import OutputLimits
+from app.profiling.cpu import profile_phase
+from app.profiling.startup import startup_phase
 from app.schema import (
     ROLE_VALUES,
     TOOL_CHOICE_TYPE,
     TOOL_CHOICE_VALUES,
     Message,
     ToolChoice,
+    ToolParams,
+    format_message_dict,
 )
 
 
@@ -171,6 +186,94 @@ class TokenCounter:
         return total_tokens
 
 
+def _count_retry(retry_state: RetryCallState) -> None:
+    """tenacity before_sleep hook counting retried requests"""
+    llm = retry_state.args[0]
+    metrics.LLM_RETRIES.inc(model=llm.model, method=retry_state.fn.__name__)
+
+
+def _instrumented(method: str) -> Callable:
+    """Count and time every request attempt and profile it as a phase.
+
+    Attempts also wait for a request slot when the model has a concurrency
+    limit, retries give their slot up while backing off.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(self: "LLM", *args, **kwargs):
+            started_at = time.perf_counter()
+            status = "error"
+            try:
+                async with self._request_slot():
+                    with profile_phase(f"llm.{method}"):
+                        result = await func(self, *args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                metrics.LLM_REQUESTS.inc(model=self.model, method=method, status=status)
+                metrics.LLM_LATENCY.observe(
+                    time.perf_counter() - started_at, model=self.model, method=method
+                )
+
+        return wrapper
+
+    return decorator
+
+
+# Tiers of the model cascade, requests of the routine tier go to the fast model
+ROUTINE = "routine"
+STRONG = "strong"
+
+# Prompts and plan steps starting with this tag, possibly after other tags
+# such as a step type, always run on the strong model
+_STRONG_TAG = re.compile(r"^\s*(?:\[\w+\]\s*)*\[STRONG\]", re.IGNORECASE)
+
+_llm_tier: ContextVar[Optional[str]] = ContextVar("llm_tier", default=None)
+
+
+def current_llm_tier() -> Optional[str]:
+    """Get the cascade tier of the running task's requests, if any"""
+    return _llm_tier.get()
+
+
+@contextlib.contextmanager
+def use_llm_tier(tier: Optional[str]) -> Iterator[Optional[str]]:
+    """Route the LLM requests of the block by cascade tier.
+
+    Requests of the routine tier go to the model named by the LLM's
+    ``cascade_llm`` setting, strong and untagged requests stay on the LLM
+    they were made on. Passing None keeps the enclosing tier.
+    """
+    if tier is None:
+        yield current_llm_tier()
+        return
+    token = _llm_tier.set(tier)
+    try:
+        yield tier
+    finally:
+        _llm_tier.reset(token)
+
+
+def tagged_tier(text: Optional[str]) -> Optional[str]:
+    """The strong tier for text starting with a [STRONG] tag, otherwise None"""
+    return STRONG if text and _STRONG_TAG.search(text) else None
+
+
+def _cascaded(func: Callable) -> Callable:
+    """Send the request to the cascade's fast model when it is routine.
+
+    Applied outside the retries, so the fast model's attempts are counted,
+    limited and charged as its own.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(self: "LLM", *args, **kwargs):
+        return await func(self.cascade_target(), *args, **kwargs)
+
+    return wrapper
+
+
 class LLM:
     _instances: Dict[str, "LLM"] = {}
 
@@ -196,6 +299,15 @@ class LLM:
             self.api_key = llm_config.api_key
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
+            self.input_cost_per_million = llm_config.input_cost_per_million
+            self.output_cost_per_million = llm_config.output_cost_per_million
+            self.max_concurrent_requests = llm_config.max_concurrent_requests
+            self.cascade_llm = llm_config.cascade_llm
+            self.cascade_agent_steps = llm_config.cascade_agent_steps
+            self.escalate_after_failures = llm_config.escalate_after_failures
+            self.escalation_steps = llm_config.escalation_steps
+            self.output_limits = OutputLimits(self.max_tokens)
+            self._request_semaphore: Optional[asyncio.Semaphore] = None
 
             # Add token counting related attributes
             self.total_input_tokens = 0
@@ -207,11 +319,12 @@ class LLM:
             )
 
             # Initialize tokenizer
-            try:
-                self.tokenizer = tiktoken.encoding_for_model(self.model)
-            except KeyError:
-                # If the model is not in tiktoken's presets, use cl100k_base as default
-                self.tokenizer = tiktoken.get_encoding("cl100k_base")
+            with startup_phase(f"tokenizer for {self.model}"):
+                try:
+                    self.tokenizer = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    # If the model is not in tiktoken's presets, use cl100k_base as default
+                    self.tokenizer = tiktoken.get_encoding("cl100k_base")
 
             if self.api_type == "azure":
                 self.client = AsyncAzureOpenAI(
@@ -220,12 +333,77 @@ class LLM:
                     api_version=self.api_version,
                 )
             elif self.api_type == "aws":
+                # boto3 is only needed, and only imported, for Bedrock
+                from app.bedrock import BedrockClient
+
                 self.client = BedrockClient()
             else:
                 self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
 
             self.token_counter = TokenCounter(self.tokenizer)
 
+    def _request_slot(self):
+        """Context manager holding one of the model's concurrent request slots"""
+        if not self.max_concurrent_requests:
+            return contextlib.nullcontext()
+        # The LLM is shared by every agent of the process, and so is the limit
+        if self._request_semaphore is None:
+            self._request_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._request_semaphore
+
+    def cascade_target(self) -> "LLM":
+        """The LLM a request made now goes to under the model cascade"""
+        if self.cascade_llm and current_llm_tier() == ROUTINE:
+            # One hop only, the fast model never passes requests on
+            return LLM(config_name=self.cascade_llm)
+        return self
+
+    async def _complete(
+        self, params: dict, request_type: Optional[str] = None
+    ) -> ChatCompletion:
+        """Send a non-streaming request with the request type's max_tokens.
+
+        A response cut off at that limit is charged and requested again with
+        twice the limit, up to the configured max_tokens.
+        """
+        if "max_completion_tokens" in params:
+            # Reasoning tokens count against the limit too, keep the full one
+            return await self.client.chat.completions.create(**params)
+
+        max_tokens = self.output_limits.limit(request_type)
+        while True:
+            response = await self.client.chat.completions.create(
+                **{**params, "max_tokens": max_tokens}
+            )
+            if not response.choices or not response.usage:
+                return response
+            # "max_tokens" is the stop reason reported by Bedrock
+            truncated = response.choices[0].finish_reason in ("length", "max_tokens")
+            if not truncated:
+                self.output_limits.observe(
+                    request_type, response.usage.completion_tokens
+                )
+                return response
+            # Cut off outputs are left out, their length is only a bound
+            next_limit = self.output_limits.next_limit(max_tokens)
+            if next_limit is None:
+                return response
+
+            metrics.LLM_TRUNCATIONS.inc(model=self.model, request_type=request_type)
+            logger.warning(
+                f"Response to a {request_type} request cut off at {max_tokens} "
+                f"tokens, retrying with {next_limit}"
+            )
+            self.update_token_count(
+                response.usage.prompt_tokens, response.usage.completion_tokens
+            )
+            timeout = self._check_budget(
+                response.usage.prompt_tokens, params.get("timeout")
+            )
+            if timeout is not None:
+                params = {**params, "timeout": timeout}
+            max_tokens = next_limit
+
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
         if not text:
@@ -235,11 +413,50 @@ class LLM:
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
+    def count_tools_tokens(self, tools: Optional[List[dict]]) -> int:
+        """Calculate the number of tokens in tool schemas"""
+        if not tools:
+            return 0
+        if isinstance(tools, ToolParams):
+            return tools.count_tokens(self.tokenizer)
+        return sum(self.count_tokens(str(tool)) for tool in tools)
+
+    def estimate_cost(self, input_tokens: int, completion_tokens: int = 0) -> float:
+        """Estimate the price of a call from the configured per-million rates"""
+        return (
+            input_tokens * self.input_cost_per_million
+            + completion_tokens * self.output_cost_per_million
+        ) / 1_000_000
+
+    def _check_budget(
+        self, input_tokens: int, timeout: Optional[float] = None
+    ) -> Optional[float]:
+        """Fail fast if the run budget is exhausted, return the timeout clamped to it"""
+        budget = current_budget()
+        if budget is None:
+            return timeout
+        budget.check(input_tokens)
+        return budget.clamp_timeout(timeout)
+
+    def _charge_budget(self, input_tokens: int, completion_tokens: int = 0) -> None:
+        """Charge token usage and its estimated cost to the run budget"""
+        budget = current_budget()
+        if budget is not None:
+            budget.record(
+                input_tokens,
+                completion_tokens,
+                self.estimate_cost(input_tokens, completion_tokens),
+                model=self.model,
+            )
+
     def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
         """Update token counts"""
         # Only track tokens if max_input_tokens is set
         self.total_input_tokens += input_tokens
         self.total_completion_tokens += completion_tokens
+        self._charge_budget(input_tokens, completion_tokens)
+        metrics.LLM_TOKENS.inc(input_tokens, model=self.model, kind="input")
+        metrics.LLM_TOKENS.inc(completion_tokens, model=self.model, kind="completion")
         logger.info(
             f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
             f"Cumulative Input={self.total_input_tokens}, Cumulative Completion={self.total_completion_tokens}, "
@@ -270,6 +487,9 @@ class LLM:
         """
         Format messages for LLM by converting them to OpenAI message format.
 
+        Message objects contribute their cached payloads, so the returned dicts
+        may be shared with the message cache and must be treated as read-only.
+
         Args:
             messages: List of messages that can be either dict or Message objects
             supports_images: Flag indicating if the target model supports image inputs
@@ -292,78 +512,38 @@ class LLM:
         formatted_messages = []
 
         for message in messages:
-            # Convert Message objects to dictionaries
             if isinstance(message, Message):
-                message = message.to_dict()
-
-            if isinstance(message, dict):
-                # If message is a dict, ensure it has required fields
-                if "role" not in message:
-                    raise ValueError("Message dict must contain 'role' field")
-
-                # Process base64 images if present and model supports images
-                if supports_images and message.get("base64_image"):
-                    # Initialize or convert content to appropriate format
-                    if not message.get("content"):
-                        message["content"] = []
-                    elif isinstance(message["content"], str):
-                        message["content"] = [
-                            {"type": "text", "text": message["content"]}
-                        ]
-                    elif isinstance(message["content"], list):
-                        # Convert string items to proper text objects
-                        message["content"] = [
-                            (
-                                {"type": "text", "text": item}
-                                if isinstance(item, str)
-                                else item
-                            )
-                            for item in message["content"]
-                        ]
-
-                    # Add the image to content
-                    message["content"].append(
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{message['base64_image']}"
-                            },
-                        }
-                    )
-
-                    # Remove the base64_image field
-                    del message["base64_image"]
-                # If model doesn't support images but message has base64_image, handle gracefully
-                elif not supports_images and message.get("base64_image"):
-                    # Just remove the base64_image field and keep the text content
-                    del message["base64_image"]
-
-                if "content" in message or "tool_calls" in message:
-                    formatted_messages.append(message)
-                # else: do not include the message
+                # Message roles are validated on construction; reuse the cached payload
+                formatted = message.to_payload(supports_images)
+            elif isinstance(message, dict):
+                formatted = format_message_dict(message, supports_images)
+                if formatted is not None and formatted["role"] not in ROLE_VALUES:
+                    raise ValueError(f"Invalid role: {formatted['role']}")
             else:
                 raise TypeError(f"Unsupported message type: {type(message)}")
 
-        # Validate all messages have required fields
-        for msg in formatted_messages:
-            if msg["role"] not in ROLE_VALUES:
-                raise ValueError(f"Invalid role: {msg['role']}")
+            if formatted is not None:
+                formatted_messages.append(formatted)
 
         return formatted_messages
 
+    @_cascaded
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        # Don't retry once the run budget is exhausted
+        retry=retry_if_exception_type((OpenAIError, Exception, ValueError))
+        & retry_if_not_exception_type(BudgetExceeded),
+        before_sleep=_count_retry,
     )
+    @_instrumented("ask")
     async def ask(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        request_type: Optional[str] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -373,6 +553,9 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            request_type: Kind of request, e.g. "judge", whose max_tokens is
+                learned from its earlier outputs; streamed responses keep the
+                configured max_tokens
 
         Returns:
             str: The generated response
@@ -403,10 +586,14 @@ class LLM:
                 # Raise a special exception that won't be retried
                 raise TokenLimitExceeded(error_message)
 
+            timeout = self._check_budget(input_tokens)
+
             params = {
                 "model": self.model,
                 "messages": messages,
             }
+            if timeout is not None:
+                params["timeout"] = timeout
 
             if self.model in REASONING_MODELS:
                 params["max_completion_tokens"] = self.max_tokens
@@ -418,8 +605,8 @@ class LLM:
 
             if not stream:
                 # Non-streaming request
-                response = await self.client.chat.completions.create(
-                    **params, stream=False
+                response = await self._complete(
+                    {**params, "stream": False}, request_type
                 )
 
                 if not response.choices or not response.choices[0].message.content:
@@ -430,6 +617,7 @@ class LLM:
                     response.usage.prompt_tokens, response.usage.completion_tokens
                 )
 
+                emit(LLMDelta(content=response.choices[0].message.content))
                 return response.choices[0].message.content
 
             # Streaming request, For streaming, update estimated token count before making the request
@@ -439,10 +627,13 @@ class LLM:
 
             collected_messages = []
             completion_text = ""
+            streaming = is_streaming()
             async for chunk in response:
                 chunk_message = chunk.choices[0].delta.content or ""
                 collected_messages.append(chunk_message)
                 completion_text += chunk_message
+                if chunk_message and streaming:
+                    emit(LLMDelta(content=chunk_message))
                 print(chunk_message, end="", flush=True)
 
             print()  # Newline after streaming
@@ -456,10 +647,11 @@ class LLM:
                 f"Estimated completion tokens for streaming response: {completion_tokens}"
             )
             self.total_completion_tokens += completion_tokens
+            self._charge_budget(0, completion_tokens)
 
             return full_response
 
-        except TokenLimitExceeded:
+        except (TokenLimitExceeded, BudgetExceeded):
             # Re-raise token limit errors without logging
             raise
         except ValueError:
@@ -478,13 +670,16 @@ class LLM:
             logger.exception(f"Unexpected error in ask")
             raise
 
+    @_cascaded
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        # Don't retry once the run budget is exhausted
+        retry=retry_if_exception_type((OpenAIError, Exception, ValueError))
+        & retry_if_not_exception_type(BudgetExceeded),
+        before_sleep=_count_retry,
     )
+    @_instrumented("ask_with_images")
     async def ask_with_images(
         self,
         messages: List[Union[dict, Message]],
@@ -529,15 +724,17 @@ class LLM:
                     "The last message must be from the user to attach images"
                 )
 
-            # Process the last user message to include images
-            last_message = formatted_messages[-1]
+            # Process a copy of the last user message to include images, the
+            # formatted dict may be a cached payload shared with the Message
+            last_message = dict(formatted_messages[-1])
+            formatted_messages[-1] = last_message
 
             # Convert content to multimodal format if needed
             content = last_message["content"]
             multimodal_content = (
                 [{"type": "text", "text": content}]
                 if isinstance(content, str)
-                else content
+                else list(content)
                 if isinstance(content, list)
                 else []
             )
@@ -572,12 +769,16 @@ class LLM:
             if not self.check_token_limit(input_tokens):
                 raise TokenLimitExceeded(self.get_limit_error_message(input_tokens))
 
+            timeout = self._check_budget(input_tokens)
+
             # Set up API parameters
             params = {
                 "model": self.model,
                 "messages": all_messages,
                 "stream": stream,
             }
+            if timeout is not None:
+                params["timeout"] = timeout
 
             # Add model-specific parameters
             if self.model in REASONING_MODELS:
@@ -596,6 +797,7 @@ class LLM:
                     raise ValueError("Empty or invalid response from LLM")
 
                 self.update_token_count(response.usage.prompt_tokens)
+                emit(LLMDelta(content=response.choices[0].message.content))
                 return response.choices[0].message.content
 
             # Handle streaming request
@@ -603,9 +805,12 @@ class LLM:
             response = await self.client.chat.completions.create(**params)
 
             collected_messages = []
+            streaming = is_streaming()
             async for chunk in response:
                 chunk_message = chunk.choices[0].delta.content or ""
                 collected_messages.append(chunk_message)
+                if chunk_message and streaming:
+                    emit(LLMDelta(content=chunk_message))
                 print(chunk_message, end="", flush=True)
 
             print()  # Newline after streaming
@@ -616,7 +821,7 @@ class LLM:
 
             return full_response
 
-        except TokenLimitExceeded:
+        except (TokenLimitExceeded, BudgetExceeded):
             raise
         except ValueError as ve:
             logger.error(f"Validation error in ask_with_images: {ve}")
@@ -634,21 +839,25 @@ class LLM:
             logger.error(f"Unexpected error in ask_with_images: {e}")
             raise
 
+    @_cascaded
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        # Don't retry once the run budget is exhausted
+        retry=retry_if_exception_type((OpenAIError, Exception, ValueError))
+        & retry_if_not_exception_type(BudgetExceeded),
+        before_sleep=_count_retry,
     )
+    @_instrumented("ask_tool")
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
-        timeout: int = 300,
+        timeout: float = 300,
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        request_type: Optional[str] = None,
         **kwargs,
     ) -> ChatCompletionMessage | None:
         """
@@ -657,10 +866,12 @@ class LLM:
         Args:
             messages: List of conversation messages
             system_msgs: Optional system messages to prepend
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds, shortened to the run budget's remaining time
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            request_type: Kind of request, e.g. "plan", whose max_tokens is
+                learned from its earlier outputs
             **kwargs: Additional completion arguments
 
         Returns:
@@ -691,12 +902,7 @@ class LLM:
             input_tokens = self.count_message_tokens(messages)
 
             # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
-
-            input_tokens += tools_tokens
+            input_tokens += self.count_tools_tokens(tools)
 
             # Check if token limits are exceeded
             if not self.check_token_limit(input_tokens):
@@ -704,8 +910,11 @@ class LLM:
                 # Raise a special exception that won't be retried
                 raise TokenLimitExceeded(error_message)
 
-            # Validate tools if provided
-            if tools:
+            # Shrink the request timeout to what is left of the run budget
+            timeout = self._check_budget(input_tokens, timeout)
+
+            # Validate tools if provided, ToolParams are validated on construction
+            if tools and not isinstance(tools, ToolParams):
                 for tool in tools:
                     if not isinstance(tool, dict) or "type" not in tool:
                         raise ValueError("Each tool must be a dict with 'type' field")
@@ -729,9 +938,7 @@ class LLM:
                 )
 
             params["stream"] = False  # Always use non-streaming for tool requests
-            response: ChatCompletion = await self.client.chat.completions.create(
-                **params
-            )
+            response = await self._complete(params, request_type)
 
             # Check if response is valid
             if not response.choices or not response.choices[0].message:
@@ -744,9 +951,11 @@ class LLM:
                 response.usage.prompt_tokens, response.usage.completion_tokens
             )
 
+            if response.choices[0].message.content:
+                emit(LLMDelta(content=response.choices[0].message.content))
             return response.choices[0].message
 
-        except TokenLimitExceeded:
+        except (TokenLimitExceeded, BudgetExceeded):
             # Re-raise token limit errors without logging
             raise
         except ValueError as ve:
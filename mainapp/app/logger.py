@@ -1,31 +1,141 @@
+import json
+import random
 import sys
-from datetime import datetime
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
 
 from loguru import logger as _logger
 
-from app.config import PROJECT_ROOT
+from app.config import PROJECT_ROOT, LoggingSettings, config
+from app.profiling.startup import startup_phase
 
 
 _print_level = "INFO"
 
+# Context fields bound by run_context and the agents, in output order
+CONTEXT_FIELDS = ("run_id", "agent", "step", "tool", "tool_call_id")
+
+_run_id: ContextVar[Optional[str]] = ContextVar("log_run_id", default=None)
+
+
+def _settings() -> LoggingSettings:
+    return config.logging or LoggingSettings()
+
+
+def _text_format(record: dict) -> str:
+    context = " ".join(
+        f"{key}={record['extra'][key]}"
+        for key in CONTEXT_FIELDS
+        if key in record["extra"]
+    )
+    record["extra"]["_context"] = f"[{context}] " if context else ""
+    return (
+        "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | "
+        "{name}:{function}:{line} - {extra[_context]}{message}\n{exception}"
+    )
+
+
+def _json_format(record: dict) -> str:
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    entry.update(
+        (key, value) for key, value in record["extra"].items() if key[0] != "_"
+    )
+    if record["exception"] is not None:
+        exc_type, exc_value, _ = record["exception"]
+        entry["exception"] = f"{getattr(exc_type, '__name__', exc_type)}: {exc_value}"
+    record["extra"]["_json"] = json.dumps(entry, default=str, ensure_ascii=False)
+    return "{extra[_json]}\n"
+
 
 def define_log_level(print_level="INFO", logfile_level="DEBUG", name: str = None):
-    """Adjust the log level to above level"""
+    """Adjust the log level to above level.
+
+    The console sink writes synchronously. The file sink is enqueued, so
+    records are written by a background thread, and is created lazily on
+    the first record. Rotation, retention and the text or JSON file format
+    come from the ``[logging]`` config section.
+    """
     global _print_level
     _print_level = print_level
+    settings = _settings()
 
-    current_date = datetime.now()
-    formatted_date = current_date.strftime("%Y%m%d%H%M%S")
-    log_name = (
-        f"{name}_{formatted_date}" if name else formatted_date
-    )  # name a log with prefix name
+    # loguru fills in {time} when the file is opened and again on rotation
+    prefix = f"{name}_" if name else ""
+    suffix = "jsonl" if settings.json_format else "log"
+    log_path = PROJECT_ROOT / f"logs/{prefix}{{time:YYYYMMDDHHmmss}}.{suffix}"
 
     _logger.remove()
     _logger.add(sys.stderr, level=print_level)
-    _logger.add(PROJECT_ROOT / f"logs/{log_name}.log", level=logfile_level)
+    with startup_phase("logger file sink"):
+        _logger.add(
+            log_path,
+            level=logfile_level,
+            format=_json_format if settings.json_format else _text_format,
+            enqueue=settings.enqueue,
+            delay=True,
+            rotation=settings.rotation,
+            retention=settings.retention,
+            compression=settings.compression,
+        )
     return _logger
 
 
+@contextmanager
+def run_context(name: str) -> Iterator[str]:
+    """Tag all records of an agent or flow run with a run id and its name.
+
+    Nested runs (agents inside a flow) keep the run id of the outermost run.
+    """
+    run_id = _run_id.get() or uuid.uuid4().hex[:12]
+    token = _run_id.set(run_id)
+    try:
+        with _logger.contextualize(run_id=run_id, agent=name):
+            yield run_id
+    finally:
+        _run_id.reset(token)
+
+
+def current_run_id() -> Optional[str]:
+    """Get the id of the run the current task belongs to, if any"""
+    return _run_id.get()
+
+
+def truncate_payload(text: Any, limit: Optional[int] = None) -> str:
+    """Cap a payload for logging, keeping its head and tail"""
+    text = str(text)
+    limit = _settings().max_payload_chars if limit is None else limit
+    if not limit or len(text) <= limit:
+        return text
+    head = limit * 3 // 4
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]} ... [{omitted} chars omitted] ... {text[-tail:]}"
+
+
+def log_payload(level: str, message: str, payload: Any) -> None:
+    """Log a message followed by a size-capped payload.
+
+    Oversized payloads are logged truncated; a sample of them, set by
+    ``payload_sample_rate``, is also written in full at DEBUG level so the
+    file sink keeps some complete examples.
+    """
+    text = str(payload)
+    capped = truncate_payload(text)
+    log = _logger.opt(depth=1).bind(payload_chars=len(text))
+    log.log(level, message + capped)
+    if len(capped) != len(text) and random.random() < _settings().payload_sample_rate:
+        log.bind(payload_sampled=True).debug(message + text)
+
+
 logger = define_log_level()
 
 
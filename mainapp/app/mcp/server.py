@@ -13,12 +13,9 @@ from typing import Any, Dict, Optional
 
 from mcp.server.fastmcp import FastMCP
 
-from app.logger import logger
+from app.logger import log_payload, logger
 from app.tool.base import BaseTool
-from app.tool.bash import Bash
-from app.tool.browser_use_tool import BrowserUseTool
-from app.tool.str_replace_editor import StrReplaceEditor
-from app.tool.terminate import Terminate
+from app.tool.registry import create_tool
 
 
 class MCPServer:
@@ -28,11 +25,11 @@ class MCPServer:
         self.server = FastMCP(name)
         self.tools: Dict[str, BaseTool] = {}
 
-        # Initialize standard tools
-        self.tools["bash"] = Bash()
-        self.tools["browser"] = BrowserUseTool()
-        self.tools["editor"] = StrReplaceEditor()
-        self.tools["terminate"] = Terminate()
+        # Initialize standard tools, keyed by the name they are served under
+        self.tools["bash"] = create_tool("bash")
+        self.tools["browser"] = create_tool("browser_use")
+        self.tools["editor"] = create_tool("str_replace_editor")
+        self.tools["terminate"] = create_tool("terminate")
 
     def register_tool(self, tool: BaseTool, method_name: Optional[str] = None) -> None:
         """Register a tool with parameter validation and documentation."""
@@ -42,10 +39,10 @@ class MCPServer:
 
         # Define the async function to be registered
         async def tool_method(**kwargs):
-            logger.info(f"Executing {tool_name}: {kwargs}")
+            log_payload("INFO", f"Executing {tool_name}: ", kwargs)
             result = await tool.execute(**kwargs)
 
-            logger.info(f"Result of {tool_name}: {result}")
+            log_payload("INFO", f"Result of {tool_name}: ", result)
 
             # Handle different types of results (match original logic)
             if hasattr(result, "model_dump"):
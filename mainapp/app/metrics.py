@@ -0,0 +1,437 @@
+"""Process-wide telemetry counters for agents, LLM calls, tools and sandboxes.
+
+Instrumented code updates the metrics defined at the bottom of this module;
+updates are cheap and always on. Two optional outputs read them:
+
+- A local HTTP endpoint serving ``/metrics`` in the Prometheus text format
+  and ``/metrics.json``, started when ``[metrics] port`` is set.
+- A JSON file per outermost agent or flow run with the counter and histogram
+  updates made by that run, written when ``[metrics] json_dir`` is set, so
+  runs can be aggregated offline. Updates are attributed to the run of the task that
+  made them, so runs that overlap in time each get their own numbers.
+"""
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import PROJECT_ROOT, MetricsSettings, config
+from app.logger import current_run_id, logger
+
+
+# http.server pulls in the email and http.client packages, it is only
+# imported once the endpoint is actually started
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Run:
+    """Counter and histogram updates made by the tasks of one outermost run."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.id = current_run_id() or uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.values: Dict[str, Dict[LabelValues, Any]] = {}
+        self.lock = threading.Lock()
+
+
+# The run the current task belongs to; tasks and threads started inside a
+# run inherit it, runs started side by side get their own
+_current_run: ContextVar[Optional[_Run]] = ContextVar("metrics_run", default=None)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{self._format_labels(key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or tokens."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        run = _current_run.get()
+        if run is not None:
+            with run.lock:
+                values = run.values.setdefault(self.name, {})
+                values[key] = values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. active sandboxes."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. latencies in seconds."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._add(self._values, key, index, value)
+        run = _current_run.get()
+        if run is not None:
+            with run.lock:
+                self._add(run.values.setdefault(self.name, {}), key, index, value)
+
+    def _add(
+        self, values: Dict[LabelValues, Any], key: LabelValues, index: int, value: float
+    ) -> None:
+        state = values.get(key)
+        if state is None:
+            state = values[key] = {
+                "buckets": [0] * (len(self.buckets) + 1),
+                "sum": 0.0,
+                "count": 0,
+            }
+        state["buckets"][index] += 1
+        state["sum"] += value
+        state["count"] += 1
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return {**value, "buckets": list(value["buckets"])}
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for key, state in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state["buckets"]):
+                cumulative += count
+                labels = self._format_labels(key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = self._format_labels(key)
+            lines.append(f"{self.name}_sum{labels} {_number(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and not math.isfinite(value):
+        return "+Inf" if value > 0 else "-Inf" if value < 0 else "NaN"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Holds all metrics of the process and renders or snapshots them."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(
+        self, run_values: Optional[Dict[str, Dict[LabelValues, Any]]] = None
+    ) -> Dict[str, Any]:
+        """JSON-friendly view, with counters and histograms of one run if given.
+
+        Gauges describe the process, they are always the current values.
+        """
+        result = {}
+        for name, metric in self._metrics.items():
+            if run_values is None or metric.type == "gauge":
+                values = metric.samples()
+            else:
+                with_run = run_values.get(name, {})
+                values = {key: metric._copy(value) for key, value in with_run.items()}
+            samples = []
+            for key, value in sorted(values.items()):
+                if metric.type == "histogram":
+                    if not value["count"]:
+                        continue
+                    value = {**value, "le": [*metric.buckets, "+Inf"]}
+                elif metric.type == "counter" and not value:
+                    continue
+                labels = dict(zip(metric.labelnames, key))
+                samples.append({"labels": labels, "value": value})
+            if samples:
+                result[name] = {
+                    "type": metric.type,
+                    "help": metric.help,
+                    "samples": samples,
+                }
+        return result
+
+
+REGISTRY = MetricsRegistry()
+
+
+_server: Optional["ThreadingHTTPServer"] = None
+_server_lock = threading.Lock()
+
+
+def _settings() -> MetricsSettings:
+    return config.metrics or MetricsSettings()
+
+
+def _handler_class() -> type:
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = REGISTRY.render_prometheus().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(REGISTRY.to_dict()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # Scrapes every few seconds would flood stderr
+            pass
+
+    return MetricsHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 9464) -> "ThreadingHTTPServer":
+    """Serve the registry over HTTP from a daemon thread, once per process"""
+    from http.server import ThreadingHTTPServer
+
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _handler_class())
+            threading.Thread(
+                target=_server.serve_forever, name="metrics-server", daemon=True
+            ).start()
+            address = f"http://{host}:{_server.server_port}/metrics"
+            logger.info(f"Serving metrics on {address}")
+    return _server
+
+
+def serve_from_config() -> None:
+    """Start the endpoint if a port is configured, safe to call repeatedly"""
+    settings = _settings()
+    if _server is not None or settings.port is None:
+        return
+    try:
+        serve(settings.host, settings.port)
+    except OSError as e:
+        logger.warning(f"Could not start metrics endpoint on port {settings.port}: {e}")
+        # Do not retry on every run
+        settings.port = None
+
+
+@contextmanager
+def run_scope(name: str) -> Iterator[None]:
+    """Track an agent or flow run and dump its metrics when the outermost ends.
+
+    A run is nested when the task starting it already belongs to a run, e.g.
+    an agent inside a flow or a flow's sub-task; its updates count towards
+    the enclosing run. Runs of separate tasks are each dumped on their own.
+    """
+    serve_from_config()
+    # Per-run values are only kept for the dump
+    if _current_run.get() is not None or not _settings().json_dir:
+        yield
+        return
+
+    run = _Run(name)
+    token = _current_run.set(run)
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+        try:
+            dump_run(run)
+        except Exception as e:
+            logger.warning(f"Failed to write run metrics: {e}")
+
+
+def dump_run(run: _Run) -> None:
+    json_dir = _settings().json_dir
+    if not json_dir:
+        return
+    timestamp = datetime.fromtimestamp(run.started_at).strftime("%Y%m%d%H%M%S")
+    safe_name = re.sub(r"[^\w.-]+", "_", run.name)
+    metrics_dir = PROJECT_ROOT / json_dir
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    # The run id keeps runs of the same name started in the same second apart
+    path = metrics_dir / f"{safe_name}_{timestamp}_{run.id}.json"
+    with run.lock:
+        values = {name: dict(samples) for name, samples in run.values.items()}
+    payload = {
+        "run": run.name,
+        "run_id": run.id,
+        "started_at": run.started_at,
+        "duration": time.time() - run.started_at,
+        "metrics": REGISTRY.to_dict(values),
+    }
+    path.write_text(json.dumps(payload, indent=2))
+    logger.info(f"Run metrics written to {path}")
+
+
+LLM_REQUESTS = REGISTRY.counter(
+    "openmanus_llm_requests_total",
+    "LLM request attempts by outcome",
+    ("model", "method", "status"),
+)
+LLM_LATENCY = REGISTRY.histogram(
+    "openmanus_llm_request_seconds", "LLM request latency", ("model", "method")
+)
+LLM_RETRIES = REGISTRY.counter(
+    "openmanus_llm_retries_total", "LLM requests retried", ("model", "method")
+)
+LLM_TOKENS = REGISTRY.counter(
+    "openmanus_llm_tokens_total", "Tokens used by kind", ("model", "kind")
+)
+LLM_TRUNCATIONS = REGISTRY.counter(
+    "openmanus_llm_truncations_total",
+    "Responses cut off at their max_tokens limit",
+    ("model", "request_type"),
+)
+TOOL_CALLS = REGISTRY.counter(
+    "openmanus_tool_calls_total", "Tool calls by outcome", ("tool", "status")
+)
+TOOL_LATENCY = REGISTRY.histogram(
+    "openmanus_tool_call_seconds", "Tool call latency", ("tool",)
+)
+SEARCH_ATTEMPTS = REGISTRY.counter(
+    "openmanus_search_engine_attempts_total",
+    "Web search attempts per engine by outcome",
+    ("engine", "status"),
+)
+MCP_CALLS = REGISTRY.counter(
+    "openmanus_mcp_calls_total",
+    "MCP tool calls by outcome",
+    ("server", "tool", "status"),
+)
+MCP_LATENCY = REGISTRY.histogram(
+    "openmanus_mcp_call_seconds", "MCP tool call latency", ("server",)
+)
+SANDBOXES_ACTIVE = REGISTRY.gauge(
+    "openmanus_sandboxes_active", "Sandboxes currently running"
+)
+SANDBOX_EVENTS = REGISTRY.counter(
+    "openmanus_sandbox_events_total",
+    "Sandbox creations, deletions and failures",
+    ("event",),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "openmanus_cache_lookups_total", "Cache lookups by result", ("cache", "result")
+)
@@ -0,0 +1,73 @@
+"""Per-request-type ``max_tokens`` limits learned from observed output lengths.
+
+Sending the configured ``max_tokens`` with every request makes providers
+that reserve capacity by it queue short requests behind a large reservation,
+and lets runaway generations run to the end. Call sites name the type of
+their request, e.g. "judge" or "extract"; ``OutputLimits`` keeps the recent
+output lengths of each type and limits the next request of that type to a
+high quantile of them, with headroom. Until enough outputs were seen, the
+type's configured default applies. Untyped requests keep ``max_tokens``.
+
+A response cut off at its limit is requested again with twice the limit, up
+to ``max_tokens``, so a too tight limit costs a retry but never an answer.
+"""
+import math
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.config import OutputLimitSettings, config
+
+
+class OutputLimits:
+    """The max_tokens of each request type for one model."""
+
+    def __init__(self, max_tokens: int, settings: Optional[OutputLimitSettings] = None):
+        self.max_tokens = max_tokens
+        self.settings = settings or config.output_limits or OutputLimitSettings()
+        self._lengths: Dict[str, Deque[int]] = {}
+        self._learned: Dict[str, int] = {}
+
+    def limit(self, request_type: Optional[str]) -> int:
+        """max_tokens for a request of the type, the model's own when untyped"""
+        if request_type is None or not self.settings.enabled:
+            return self.max_tokens
+        limit = self._learned.get(request_type)
+        if limit is None:
+            limit = self.settings.defaults.get(request_type, self.max_tokens)
+        return min(limit, self.max_tokens)
+
+    def next_limit(self, limit: int) -> Optional[int]:
+        """The limit to retry a truncated response with, None at max_tokens"""
+        if limit >= self.max_tokens:
+            return None
+        return min(limit * 2, self.max_tokens)
+
+    def observe(self, request_type: Optional[str], output_tokens: int) -> None:
+        """Record the output length of a response and relearn the type's limit"""
+        if request_type is None:
+            return
+        lengths = self._lengths.get(request_type)
+        if lengths is None:
+            lengths = self._lengths[request_type] = deque(
+                maxlen=max(self.settings.window, 1)
+            )
+        lengths.append(output_tokens)
+        if len(lengths) < max(self.settings.min_samples, 1):
+            return
+        ordered = sorted(lengths)
+        rank = min(math.ceil(self.settings.quantile * len(ordered)), len(ordered))
+        self._learned[request_type] = max(
+            math.ceil(ordered[max(rank - 1, 0)] * self.settings.headroom),
+            self.settings.min_tokens,
+        )
+
+    def stats(self) -> Dict[str, Dict]:
+        """Current limit and observed outputs of each request type"""
+        return {
+            request_type: {
+                "limit": self.limit(request_type),
+                "samples": len(lengths),
+                "max_observed": max(lengths),
+            }
+            for request_type, lengths in self._lengths.items()
+        }
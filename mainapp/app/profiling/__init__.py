@@ -0,0 +1,6 @@
+"""Profiling helpers.
+
+``startup`` only uses the standard library, so it can be imported before
+anything it is meant to measure. ``cpu`` profiles agent runs and reads its
+settings from the app config.
+"""
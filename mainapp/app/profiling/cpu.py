@@ -0,0 +1,395 @@
+"""Opt-in CPU profiling of agent steps, LLM calls and tool calls.
+
+Enable it with ``cpu = true`` in the ``[profiling]`` config section or with
+the OPENMANUS_CPU_PROFILE environment variable (``1``, ``sampling`` or
+``cprofile``). The outermost agent or flow run starts a session with
+``profile_run``; steps, LLM calls and tool calls are marked with
+``profile_phase``. At the end of the run a report directory is written with:
+
+- ``all.collapsed`` and one ``<phase>.collapsed`` file per phase, in the
+  collapsed stack format read by flamegraph.pl, speedscope and similar tools
+- ``summary.txt`` with the hottest functions per phase, also logged
+
+The sampling profiler samples the event loop thread from a background
+thread, so it sees framework CPU (token counting, pydantic validation, HTML
+parsing) with full stacks and low overhead. Samples where the loop is idle in
+its selector are dropped. The cProfile fallback records exact call counts,
+but its collapsed stacks only go one caller deep.
+
+Phases are attributed on the event loop thread, so work of concurrently
+running tasks lands in whichever phase is innermost at the time. Only one
+session runs at a time: a run started while another task's session is
+active (e.g. a second server session) is not profiled and a warning is
+logged. cProfile can only be switched per thread, so in that mode the phases
+of one task are profiled at a time and concurrent tasks of the same run
+(e.g. parallel flow steps) are not given phases of their own.
+"""
+import asyncio
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import PROJECT_ROOT, ProfilingSettings, config
+from app.logger import logger
+
+
+ENV_VAR = "OPENMANUS_CPU_PROFILE"
+
+_MAX_STACK_DEPTH = 128
+_PATH_PREFIXES = sorted(
+    {str(PROJECT_ROOT), *(p for p in sys.path if p and os.path.isdir(p))},
+    key=len,
+    reverse=True,
+)
+
+
+def _task_key() -> int:
+    """Identity of the running asyncio task, or of the thread outside one"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix) :].lstrip(os.sep)
+    return filename
+
+
+class _SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.idle_samples = 0
+        self._phases: Tuple[str, ...] = ()
+        self._thread_id = threading.get_ident()
+        self._labels: Dict[CodeType, str] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="cpu-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def enter(self, phase: str) -> None:
+        # Tuples are swapped atomically, the sampler thread never sees a
+        # half-updated phase stack
+        self._phases = self._phases + (phase,)
+
+    def exit(self, phase: str) -> None:
+        if phase in self._phases:
+            index = len(self._phases) - 1 - self._phases[::-1].index(phase)
+            self._phases = self._phases[:index]
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            phases = self._phases
+            if not phases:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            if frame.f_code.co_filename.endswith("selectors.py"):
+                self.idle_samples += 1
+                continue
+            self.samples[(phases, self._stack(frame))] += 1
+
+    def _stack(self, frame: Optional[FrameType]) -> Tuple[str, ...]:
+        stack = []
+        while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = f"{code.co_qualname} ({_short_path(code.co_filename)})"
+                self._labels[code] = label
+            stack.append(label)
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def collapsed(self) -> Dict[str, List[str]]:
+        """Collapsed stack lines grouped by innermost phase"""
+        lines = defaultdict(list)
+        for (phases, stack), count in self.samples.items():
+            frames = [f"[{phase}]" for phase in phases] + list(stack)
+            lines[phases[-1]].append(f"{';'.join(frames)} {count}")
+        return lines
+
+    def top_functions(self) -> Dict[str, List[Tuple[str, float, float]]]:
+        """Per phase: (function, self seconds, inclusive seconds), hottest first"""
+        self_counts: Dict[str, Counter] = defaultdict(Counter)
+        total_counts: Dict[str, Counter] = defaultdict(Counter)
+        for (phases, stack), count in self.samples.items():
+            phase = phases[-1]
+            if stack:
+                self_counts[phase][stack[-1]] += count
+            for label in set(stack):
+                total_counts[phase][label] += count
+        return {
+            phase: [
+                (
+                    label,
+                    count * self.interval,
+                    total_counts[phase][label] * self.interval,
+                )
+                for label, count in counts.most_common()
+            ]
+            for phase, counts in self_counts.items()
+        }
+
+
+class _CProfileProfiler:
+    """Deterministic fallback, one cProfile.Profile per phase.
+
+    Only the profile of the innermost phase is enabled, so each phase
+    accounts for its own time and nested phases are not double counted.
+    The phases of one task are tracked at a time: while that task is in a
+    phase, phases entered by other tasks are ignored instead of switching
+    the thread's profile under it.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self._phases: List[str] = []
+        self._owner: Optional[int] = None
+        self._warned = False
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        if self._phases:
+            self.profiles[self._phases[-1]].disable()
+        self._phases.clear()
+        self._owner = None
+
+    def enter(self, phase: str) -> None:
+        key = _task_key()
+        if self._phases and key != self._owner:
+            if not self._warned:
+                self._warned = True
+                logger.warning(
+                    "cProfile mode profiles the phases of one task at a time, "
+                    "concurrent phases are counted in the active one; use "
+                    "sampling mode for concurrent runs"
+                )
+            return
+        if self._phases:
+            self.profiles[self._phases[-1]].disable()
+        self._owner = key
+        self._phases.append(phase)
+        self.profiles.setdefault(phase, cProfile.Profile()).enable()
+
+    def exit(self, phase: str) -> None:
+        if _task_key() != self._owner:
+            return
+        if not self._phases or self._phases[-1] != phase:
+            return
+        self.profiles[self._phases.pop()].disable()
+        if self._phases:
+            self.profiles[self._phases[-1]].enable()
+        else:
+            self._owner = None
+
+    @staticmethod
+    def _label(func: Tuple[str, int, str]) -> str:
+        filename, _, name = func
+        if filename == "~":
+            return name
+        return f"{name} ({_short_path(filename)})"
+
+    def _stats(self) -> Dict[str, dict]:
+        return {
+            phase: pstats.Stats(profile).stats
+            for phase, profile in self.profiles.items()
+            if profile.getstats()
+        }
+
+    def collapsed(self) -> Dict[str, List[str]]:
+        lines = defaultdict(list)
+        for phase, stats in self._stats().items():
+            for func, (_, _, tottime, _, callers) in stats.items():
+                if not callers:
+                    frames = [f"[{phase}]", self._label(func)]
+                    weight = int(tottime * 1e6)
+                    lines[phase].append(f"{';'.join(frames)} {weight}")
+                for caller, caller_stats in callers.items():
+                    frames = [f"[{phase}]", self._label(caller), self._label(func)]
+                    weight = int(caller_stats[2] * 1e6)
+                    if weight:
+                        lines[phase].append(f"{';'.join(frames)} {weight}")
+        return lines
+
+    def top_functions(self) -> Dict[str, List[Tuple[str, float, float]]]:
+        return {
+            phase: sorted(
+                (
+                    (self._label(func), tottime, cumtime)
+                    for func, (_, _, tottime, cumtime, _) in stats.items()
+                ),
+                key=lambda row: row[1],
+                reverse=True,
+            )
+            for phase, stats in self._stats().items()
+        }
+
+
+class CPUProfileSession:
+    """Profiles one agent or flow run and writes the report when stopped."""
+
+    def __init__(self, name: str, mode: str, settings: ProfilingSettings):
+        self.name = name
+        self.settings = settings
+        if mode == "cprofile" or not hasattr(sys, "_current_frames"):
+            self.mode = "cprofile"
+            self._profiler = _CProfileProfiler()
+        else:
+            self.mode = "sampling"
+            self._profiler = _SamplingProfiler(settings.sample_interval_ms / 1000)
+        self._started_at = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        self._profiler.start()
+
+    def stop(self) -> None:
+        self._profiler.stop()
+        self.duration = time.perf_counter() - self._started_at
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self._profiler.enter(name)
+        try:
+            yield
+        finally:
+            self._profiler.exit(name)
+
+    def format_summary(self) -> str:
+        top_n = self.settings.top_n
+        lines = [
+            f"CPU profile of {self.name} ({self.mode}, {self.duration:.1f}s wall)",
+        ]
+        for phase, rows in sorted(self._profiler.top_functions().items()):
+            phase_total = sum(row[1] for row in rows)
+            lines.append(f"\n[{phase}] {phase_total * 1000:.1f} ms")
+            lines.append(f"{'self ms':>10} {'total ms':>10}  function")
+            for label, self_time, total_time in rows[:top_n]:
+                lines.append(
+                    f"{self_time * 1000:10.1f} {total_time * 1000:10.1f}  {label}"
+                )
+        return "\n".join(lines)
+
+    def write_report(self) -> Path:
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        safe_name = re.sub(r"[^\w.-]+", "_", self.name)
+        report_dir = (
+            PROJECT_ROOT / self.settings.output_dir / f"{safe_name}_{timestamp}"
+        )
+        report_dir.mkdir(parents=True, exist_ok=True)
+
+        all_lines = []
+        for phase, lines in self._profiler.collapsed().items():
+            safe_phase = re.sub(r"[^\w.-]+", "_", phase)
+            phase_file = report_dir / f"{safe_phase}.collapsed"
+            phase_file.write_text("\n".join(lines) + "\n")
+            all_lines.extend(lines)
+        (report_dir / "all.collapsed").write_text("\n".join(all_lines) + "\n")
+
+        summary = self.format_summary()
+        (report_dir / "summary.txt").write_text(summary + "\n")
+        logger.info(f"{summary}\nCPU profile written to {report_dir}")
+        return report_dir
+
+
+_session: Optional[CPUProfileSession] = None
+# The session of the current task's run, None outside a profiled run
+_current_session: ContextVar[Optional[CPUProfileSession]] = ContextVar(
+    "cpu_profile_session", default=None
+)
+
+
+def cpu_profiling_mode() -> Optional[str]:
+    """The configured profiler mode, or None when CPU profiling is off.
+
+    OPENMANUS_CPU_PROFILE takes precedence over the config file, so
+    profiling can be switched on or off without editing it.
+    """
+    settings = config.profiling or ProfilingSettings()
+    env_value = os.environ.get(ENV_VAR, "").strip().lower()
+    if env_value in ("0", "false", "off", "no"):
+        return None
+    if env_value in ("sampling", "cprofile"):
+        return env_value
+    if env_value or settings.cpu:
+        return settings.cpu_mode
+    return None
+
+
+@contextmanager
+def profile_run(name: str) -> Iterator[Optional[CPUProfileSession]]:
+    """Profile a run if enabled, nested runs are part of the outer session.
+
+    A run concurrent with the session of another task is not profiled.
+    """
+    global _session
+    current = _current_session.get()
+    if current is not None:
+        yield current
+        return
+    mode = cpu_profiling_mode()
+    if mode is None:
+        yield None
+        return
+    if _session is not None:
+        logger.warning(
+            f"CPU profile of {_session.name} is running, {name} is not profiled"
+        )
+        yield None
+        return
+
+    session = CPUProfileSession(name, mode, config.profiling or ProfilingSettings())
+    _session = session
+    token = _current_session.set(session)
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _current_session.reset(token)
+        _session = None
+        try:
+            session.write_report()
+        except Exception as e:
+            logger.warning(f"Failed to write CPU profile: {e}")
+
+
+@contextmanager
+def profile_phase(name: str) -> Iterator[None]:
+    """Attribute the CPU time of the block to a phase, a no-op when disabled"""
+    session = _current_session.get()
+    if session is None:
+        yield
+        return
+    with session.phase(name):
+        yield
@@ -0,0 +1,357 @@
+"""Opt-in memory growth instrumentation for agent runs.
+
+Enable it with ``memory = true`` in the ``[profiling]`` config section or
+with OPENMANUS_MEMORY_PROFILE=1. tracemalloc is started on the first run
+and kept running for the life of the process, so growth across runs of a
+long-lived agent (the desktop apps reuse one ``Manus``) stays visible.
+
+After every agent step a snapshot is taken and two views of memory are
+logged:
+
+- Subsystems: bytes held by the structures known to grow in long sessions,
+  measured directly: memory messages, base64 images, StrReplaceEditor
+  history, PlanningTool plans, and serialization and LLM caches.
+- Allocators: tracemalloc growth grouped by the innermost ``app`` module
+  that allocated it, which also catches growth outside those structures.
+
+When the outermost run ends, a report with the per-step table and the top
+allocators since the run and since the process baseline is written under
+``<output_dir>/memory``. tracemalloc slows allocation-heavy code down
+noticeably, so this mode is meant for sizing and leak hunting, not for
+production runs.
+"""
+import os
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import PROJECT_ROOT, ProfilingSettings, config
+from app.logger import logger
+from app.tool.registry import LazyTool
+
+
+ENV_VAR = "OPENMANUS_MEMORY_PROFILE"
+
+SUBSYSTEMS = ("messages", "images", "editor_history", "plans", "caches")
+
+_APP_DIR = str(PROJECT_ROOT / "app") + os.sep
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Size of plain containers and everything they hold"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
+
+def _container_size(obj: Any) -> int:
+    """Size of nested containers only, the strings they share are not counted"""
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_container_size(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(_container_size(v) for v in obj)
+    return 0
+
+
+def measure_subsystems(agent: Any, tools: Tuple[Any, ...] = ()) -> Dict[str, int]:
+    """Bytes held by the known growth points of an agent.
+
+    Args:
+        agent: The agent whose memory and tools are measured
+        tools: Extra tools to include, e.g. the planning tool of a flow
+    """
+    sizes = dict.fromkeys(SUBSYSTEMS, 0)
+    messages = getattr(getattr(agent, "memory", None), "messages", [])
+    for message in messages:
+        if message.content:
+            sizes["messages"] += sys.getsizeof(message.content)
+        for tool_call in message.tool_calls or ():
+            sizes["messages"] += sys.getsizeof(tool_call.function.arguments)
+        if message.base64_image:
+            sizes["images"] += sys.getsizeof(message.base64_image)
+        sizes["caches"] += _container_size(message._dict_cache)
+        sizes["caches"] += _container_size(message._payload_cache)
+
+    helper = getattr(agent, "browser_context_helper", None)
+    for holder in (agent, helper):
+        pending_image = getattr(holder, "_current_base64_image", None)
+        if pending_image:
+            sizes["images"] += sys.getsizeof(pending_image)
+
+    collection = getattr(agent, "available_tools", None)
+    all_tools = list(getattr(collection, "tools", ())) + list(tools)
+    seen_tools = set()
+    for tool in all_tools:
+        if isinstance(tool, LazyTool):
+            # Not created yet, it holds nothing
+            if tool._tool is None:
+                continue
+            tool = tool._tool
+        if id(tool) in seen_tools:
+            continue
+        seen_tools.add(id(tool))
+        history = getattr(tool, "_file_history", None)
+        if history:
+            sizes["editor_history"] += _deep_size(history)
+        # Only the memory plan store holds its plans in this process
+        plans = getattr(getattr(tool, "store", None), "plans", None)
+        if isinstance(plans, dict):
+            sizes["plans"] += _deep_size(plans)
+
+    llm = getattr(agent, "llm", None)
+    instances = getattr(type(llm), "_instances", None)
+    if isinstance(instances, dict):
+        sizes["caches"] += _container_size(instances)
+    return sizes
+
+
+def _app_module(traceback: tracemalloc.Traceback) -> str:
+    """Innermost app module of an allocation, or the top frame's file"""
+    for frame in reversed(traceback):
+        if frame.filename.startswith(_APP_DIR):
+            return frame.filename[len(_APP_DIR) :]
+    return os.path.basename(traceback[-1].filename) if len(traceback) else "?"
+
+
+def _peak_rss() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class StepRecord:
+    label: str
+    traced: int
+    growth: int
+    subsystems: Dict[str, int]
+    modules: List[Tuple[str, int]]
+
+
+@dataclass
+class _Run:
+    name: str
+    tools: Tuple[Any, ...]
+    start: tracemalloc.Snapshot
+    started_at: float = field(default_factory=time.perf_counter)
+    last: Optional[tracemalloc.Snapshot] = None
+    steps: List[StepRecord] = field(default_factory=list)
+    # The run this one is nested in, None for the run that writes the report
+    parent: Optional["_Run"] = None
+
+    @property
+    def outermost(self) -> "_Run":
+        run = self
+        while run.parent is not None:
+            run = run.parent
+        return run
+
+
+# Runs are tracked per task, so concurrent runs (e.g. parallel steps of a
+# flow) each end their own run instead of whichever was started last
+_current_run: ContextVar[Optional[_Run]] = ContextVar("memory_run", default=None)
+
+
+class MemoryProfiler:
+    """Takes tracemalloc snapshots per step and writes a report per run."""
+
+    def __init__(self, settings: ProfilingSettings):
+        self.settings = settings
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.memory_frames)
+        self.baseline = self._snapshot()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def begin_run(self, name: str, tools: Tuple[Any, ...] = ()) -> Token:
+        """Start a run nested in the current task's run, if any"""
+        run = _Run(
+            name=name, tools=tools, start=self._snapshot(), parent=_current_run.get()
+        )
+        return _current_run.set(run)
+
+    def end_run(self, token: Token) -> None:
+        """End the run begin_run returned the token for"""
+        run = _current_run.get()
+        _current_run.reset(token)
+        if run is not None and run.parent is None:
+            try:
+                self.write_report(run)
+            except Exception as e:
+                logger.warning(f"Failed to write memory report: {e}")
+
+    def record_step(self, agent: Any, step: int) -> None:
+        current = _current_run.get()
+        if current is None:
+            return
+        outer = current.outermost
+        snapshot = self._snapshot()
+        previous = outer.last or outer.start
+        outer.last = snapshot
+
+        growth = snapshot.compare_to(previous, "traceback")
+        by_module: Dict[str, int] = {}
+        for stat in growth:
+            module = _app_module(stat.traceback)
+            by_module[module] = by_module.get(module, 0) + stat.size_diff
+        modules = sorted(by_module.items(), key=lambda item: item[1], reverse=True)
+
+        tools: Tuple[Any, ...] = ()
+        run = current
+        while run is not None:
+            tools += run.tools
+            run = run.parent
+        record = StepRecord(
+            label=f"{getattr(agent, 'name', type(agent).__name__)} step {step}",
+            traced=tracemalloc.get_traced_memory()[0],
+            growth=sum(stat.size_diff for stat in growth),
+            subsystems=measure_subsystems(agent, tools),
+            modules=modules[: self.settings.top_n],
+        )
+        outer.steps.append(record)
+
+        parts = ", ".join(
+            f"{name} {_format_bytes(size)}"
+            for name, size in record.subsystems.items()
+            if size
+        )
+        hottest = ", ".join(
+            f"{module} {_format_bytes(size)}"
+            for module, size in modules[:3]
+            if size > 0
+        )
+        logger.info(
+            f"Memory after {record.label}: {_format_bytes(record.traced)} traced "
+            f"({record.growth:+,} B); {parts or 'no tracked data'}"
+            + (f"; growth from {hottest}" if hottest else "")
+        )
+
+    def format_report(self, run: _Run) -> str:
+        top_n = self.settings.top_n
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Memory profile of {run.name} "
+            f"({time.perf_counter() - run.started_at:.1f}s wall)",
+            f"Traced now {_format_bytes(current)}, traced peak {_format_bytes(peak)}",
+        ]
+        peak_rss = _peak_rss()
+        if peak_rss is not None:
+            lines.append(f"Process peak RSS {_format_bytes(peak_rss)}")
+
+        lines.append("\nPer step (traced, growth, subsystems)")
+        header = f"{'step':<28} {'traced':>10} {'growth':>10}"
+        lines.append(header + "".join(f" {name:>15}" for name in SUBSYSTEMS))
+        for record in run.steps:
+            lines.append(
+                f"{record.label:<28} {_format_bytes(record.traced):>10} "
+                f"{_format_bytes(record.growth):>10}"
+                + "".join(
+                    f" {_format_bytes(record.subsystems[name]):>15}"
+                    for name in SUBSYSTEMS
+                )
+            )
+
+        end = self._snapshot()
+        for title, since in (("this run", run.start), ("process start", self.baseline)):
+            stats = end.compare_to(since, "traceback")[:top_n]
+            lines.append(f"\nTop {top_n} allocators since {title}")
+            for stat in stats:
+                if stat.size_diff <= 0:
+                    break
+                lines.append(
+                    f"{_format_bytes(stat.size_diff):>10} {stat.count_diff:+8} blocks  "
+                    f"{_app_module(stat.traceback)}"
+                )
+                for line in stat.traceback.format(limit=3, most_recent_first=True):
+                    lines.append(f"{'':22}{line}")
+        return "\n".join(lines)
+
+    def write_report(self, run: _Run) -> Path:
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        safe_name = re.sub(r"[^\w.-]+", "_", run.name)
+        report_dir = PROJECT_ROOT / self.settings.output_dir / "memory"
+        report_dir.mkdir(parents=True, exist_ok=True)
+        report_path = report_dir / f"{safe_name}_{timestamp}.txt"
+
+        report = self.format_report(run)
+        report_path.write_text(report + "\n")
+        logger.info(f"Memory report written to {report_path}")
+        return report_path
+
+
+_profiler: Optional[MemoryProfiler] = None
+
+
+def memory_profiling_enabled() -> bool:
+    """Whether memory profiling is on, OPENMANUS_MEMORY_PROFILE wins over config"""
+    env_value = os.environ.get(ENV_VAR, "").strip().lower()
+    if env_value:
+        return env_value not in ("0", "false", "off", "no")
+    return bool(config.profiling and config.profiling.memory)
+
+
+@contextmanager
+def profile_memory(name: str, *tools: Any) -> Iterator[Optional[MemoryProfiler]]:
+    """Track memory over a run if enabled, a no-op otherwise.
+
+    Nested runs (agents inside a flow) record their steps into the outermost
+    run of their task, which writes the report. Concurrent runs are kept
+    apart per task, each measures only the tools of its own runs.
+
+    Args:
+        name: Name of the agent or flow, used for the report file
+        tools: Extra tools to measure, e.g. a flow's planning tool
+    """
+    global _profiler
+    if _profiler is None:
+        if not memory_profiling_enabled():
+            yield None
+            return
+        _profiler = MemoryProfiler(config.profiling or ProfilingSettings())
+
+    token = _profiler.begin_run(name, tools)
+    try:
+        yield _profiler
+    finally:
+        _profiler.end_run(token)
+
+
+def record_step(agent: Any, step: int) -> None:
+    """Snapshot memory after an agent step, a no-op unless profiling is on"""
+    if _profiler is not None:
+        _profiler.record_step(agent, step)
@@ -0,0 +1,226 @@
+"""Startup profiler: import times per module plus named startup phases.
+
+Entry scripts enable it before their other imports::
+
+    from app.profiling import startup
+
+
+    startup.enable_from_argv()
+
+    from app.agent.manus import Manus  # noqa: E402
+
+While enabled, every module executed by a file loader is timed, and code
+wrapped in ``startup_phase`` (config loading, logger sinks, tokenizer load,
+tool construction, MCP connects) is recorded in the same tree, so imports
+triggered inside a phase show up as its children. ``finish`` prints the
+sorted tree to stderr and returns a non-zero exit code when the startup
+budget is exceeded. When the profiler is not enabled, ``startup_phase`` is a
+no-op.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from importlib import machinery
+from typing import Callable, Dict, Iterator, List, Optional, TextIO
+
+
+PROFILE_FLAG = "--profile-startup"
+BUDGET_FLAG = "--startup-budget"
+BUDGET_ENV = "OPENMANUS_STARTUP_BUDGET"
+
+# Loaders whose exec_module is timed, builtin and frozen modules are not
+_LOADER_CLASSES = (
+    machinery.SourceFileLoader,
+    machinery.SourcelessFileLoader,
+    machinery.ExtensionFileLoader,
+)
+
+
+class _Node:
+    __slots__ = ("name", "kind", "total", "children")
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.total = 0.0
+        self.children: List["_Node"] = []
+
+    @property
+    def self_time(self) -> float:
+        return max(self.total - sum(child.total for child in self.children), 0.0)
+
+
+class _StartupProfiler:
+    def __init__(self, budget: Optional[float] = None):
+        self.budget = budget
+        self.root = _Node("startup", "phase")
+        self._stack: List[_Node] = [self.root]
+        self._thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._originals: Dict[type, Optional[Callable]] = {}
+
+    @contextmanager
+    def record(self, name: str, kind: str) -> Iterator[None]:
+        # Imports on other threads would interleave with the main stack
+        if threading.get_ident() != self._thread_id:
+            yield
+            return
+
+        node = _Node(name, kind)
+        self._stack[-1].children.append(node)
+        self._stack.append(node)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            node.total = time.perf_counter() - started_at
+            # Unwind past phases that were left open by a failed await
+            while len(self._stack) > 1 and self._stack.pop() is not node:
+                pass
+
+    def install(self) -> None:
+        for loader_class in _LOADER_CLASSES:
+            own = loader_class.__dict__.get("exec_module")
+            self._originals[loader_class] = own
+            loader_class.exec_module = self._timed(loader_class.exec_module)
+
+    def uninstall(self) -> None:
+        for loader_class, own in self._originals.items():
+            if own is None:
+                del loader_class.exec_module
+            else:
+                loader_class.exec_module = own
+        self._originals.clear()
+
+    def _timed(self, exec_module: Callable) -> Callable:
+        profiler = self
+
+        def timed_exec_module(loader, module):
+            with profiler.record(module.__name__, "import"):
+                return exec_module(loader, module)
+
+        return timed_exec_module
+
+    def stop(self) -> None:
+        self.uninstall()
+        self.root.total = time.perf_counter() - self._started_at
+
+    def format_report(self, min_ms: float = 5.0) -> str:
+        lines = [
+            f"Startup profile: {self.root.total * 1000:.1f} ms total"
+            + (f", budget {self.budget * 1000:.0f} ms" if self.budget else ""),
+            f"{'total ms':>10} {'self ms':>9}  name",
+        ]
+        self._format_children(self.root, 0, min_ms, lines)
+        return "\n".join(lines)
+
+    def _format_children(
+        self, node: _Node, depth: int, min_ms: float, lines: List[str]
+    ) -> None:
+        hidden_count, hidden_total = 0, 0.0
+        for child in sorted(node.children, key=lambda n: n.total, reverse=True):
+            if child.total * 1000 < min_ms:
+                hidden_count += 1
+                hidden_total += child.total
+                continue
+            label = child.name if child.kind == "import" else f"[{child.name}]"
+            lines.append(
+                f"{child.total * 1000:10.1f} {child.self_time * 1000:9.1f}  "
+                f"{'  ' * depth}{label}"
+            )
+            self._format_children(child, depth + 1, min_ms, lines)
+        # Summarize small entries only when they add up to something
+        if hidden_count and hidden_total * 1000 >= min_ms:
+            lines.append(
+                f"{hidden_total * 1000:10.1f} {'':9}  {'  ' * depth}"
+                f"... {hidden_count} more under {min_ms:g} ms"
+            )
+
+
+_profiler: Optional[_StartupProfiler] = None
+
+
+def is_enabled() -> bool:
+    return _profiler is not None
+
+
+def enable(budget: Optional[float] = None) -> None:
+    """Start timing imports and phases.
+
+    Args:
+        budget: Startup budget in seconds, checked by finish()
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = _StartupProfiler(budget)
+        _profiler.install()
+
+
+def enable_from_argv(argv: Optional[List[str]] = None) -> bool:
+    """Enable profiling if the profiling flags are on the command line.
+
+    The flags are removed from argv, so the script's own argument parser
+    does not need to know about them. The budget can also be set through
+    the OPENMANUS_STARTUP_BUDGET environment variable.
+
+    Returns:
+        Whether profiling was enabled
+    """
+    argv = sys.argv if argv is None else argv
+    budget = os.environ.get(BUDGET_ENV)
+    enabled = False
+    remaining = []
+    args = iter(argv)
+    for arg in args:
+        if arg == PROFILE_FLAG:
+            enabled = True
+        elif arg == BUDGET_FLAG:
+            budget = next(args, budget)
+        elif arg.startswith(BUDGET_FLAG + "="):
+            budget = arg.split("=", 1)[1]
+        else:
+            remaining.append(arg)
+    argv[:] = remaining
+
+    if enabled:
+        enable(float(budget) if budget else None)
+    return enabled
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """Record a named startup phase, a no-op unless profiling is enabled"""
+    if _profiler is None:
+        yield
+        return
+    with _profiler.record(name, "phase"):
+        yield
+
+
+def finish(min_ms: float = 5.0, stream: Optional[TextIO] = None) -> int:
+    """Stop profiling, print the report and check the budget.
+
+    The report goes to stderr by default since some entry points (the MCP
+    stdio server) use stdout for their protocol.
+
+    Returns:
+        Exit code: 1 if the startup budget was exceeded, 0 otherwise
+    """
+    global _profiler
+    if _profiler is None:
+        return 0
+    profiler, _profiler = _profiler, None
+    profiler.stop()
+
+    stream = stream or sys.stderr
+    print(profiler.format_report(min_ms), file=stream)
+    if profiler.budget and profiler.root.total > profiler.budget:
+        print(
+            f"Startup budget exceeded: {profiler.root.total:.3f}s "
+            f"> {profiler.budget:.3f}s",
+            file=stream,
+        )
+        return 1
+    return 0
@@ -0,0 +1,180 @@
+"""Local routing of queries between a direct answer and a tool-using agent.
+
+Asking an LLM whether a query is simple costs a network round trip before
+any real work starts. ``QueryRouter`` scores the query locally instead:
+hand-weighted features (URLs, file names, action verbs, requests for live
+data, several steps) and the BM25 relevance of the query to the agent's
+tool descriptions add up to the log-odds that the query needs the agent.
+Only when that score is not confident enough does it fall back to the
+classifier LLM. Recent decisions are kept in an LRU cache, lookups are
+counted in the ``openmanus_cache_lookups_total`` metric (cache "route").
+"""
+import math
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app import metrics
+from app.config import RouterSettings, config
+from app.logger import logger
+from app.tool.tool_collection import ToolCollection
+from app.tool.tool_selector import ToolIndex
+
+
+# Ask a classifier whether a query can be answered directly
+Classifier = Callable[[str], Awaitable[bool]]
+
+# Log-odds of a query needing the agent, added up per matching feature
+_FEATURES: List[Tuple[str, float, re.Pattern]] = [
+    ("url", 3.0, re.compile(r"https?://|www\.|\b[\w-]+\.(?:com|org|net|io|dev)\b")),
+    (
+        "file",
+        2.5,
+        re.compile(
+            r"```|(?:^|\s)[~.]?/\w|\b\w+\.(?:py|js|ts|json|csv|xlsx?|pdf|docx?|txt|"
+            r"md|html|ya?ml|toml|png|jpe?g|zip)\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "action",
+        2.0,
+        re.compile(
+            r"\b(?:search|look up|browse|visit|open|go to|download|upload|scrape|"
+            r"crawl|install|run|execute|deploy|save|create|write (?:a |the )?"
+            r"(?:file|script|program|code|report)|build|generate|fix|debug|"
+            r"refactor|automate|schedule|send|email|book|fill|click|plot|chart|"
+            r"analy[sz]e|compare|convert|extract|summari[sz]e (?:this|the) "
+            r"(?:page|site|file|document))\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "live_data",
+        2.0,
+        re.compile(
+            r"\b(?:latest|current(?:ly)?|today|tonight|tomorrow|yesterday|right now|"
+            r"this (?:week|month|year)|news|price|prices|stock|weather|score|"
+            r"trending|20[2-9]\d)\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "steps",
+        1.0,
+        re.compile(
+            r"\b(?:and then|after that|afterwards|step by step|for each|every)\b|"
+            r"(?:^|\n)\s*(?:\d+[.)]|[-*])\s",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "question",
+        -1.5,
+        re.compile(
+            r"^\s*(?:what(?:'s| is| are| was| does)|who(?:'s| is| was)|when (?:is|was|"
+            r"did)|where is|why|how (?:does|do|is|are|many|much)|define|explain|"
+            r"meaning of|translate|tell me (?:a|about)|can you explain)\b",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "chat",
+        -3.0,
+        re.compile(
+            r"^\s*(?:hi|hello|hey|thanks|thank you|good (?:morning|evening|night)|"
+            r"how are you|ok|okay|bye)\b[\s!.?]*$",
+            re.IGNORECASE,
+        ),
+    ),
+    ("arithmetic", -2.5, re.compile(r"^[\s\d.,+\-*/x×÷^%()=?]+$")),
+]
+
+# Log-odds before any feature, queries lean towards a direct answer
+_BIAS = -1.0
+# Words beyond which every further word adds to the log-odds, up to a cap
+_LONG_QUERY_WORDS = 25
+_LONG_QUERY_WEIGHT = 0.05
+_LONG_QUERY_MAX = 1.5
+# Weight of the best tool relevance score, and its cap
+_TOOL_WEIGHT = 0.4
+_TOOL_MAX = 1.5
+
+
+class Route:
+    """A routing decision for a query."""
+
+    def __init__(self, simple: bool, confidence: float, source: str):
+        self.simple = simple
+        self.confidence = confidence
+        # "local", "classifier" or "cache"
+        self.source = source
+
+    def __repr__(self) -> str:
+        label = "simple" if self.simple else "complex"
+        return f"Route({label}, confidence={self.confidence:.2f}, {self.source})"
+
+
+class QueryRouter:
+    """Decides whether a query can be answered directly or needs the agent.
+
+    Queries are scored locally and only sent to the classifier when the
+    local confidence stays below ``confidence_threshold``.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[RouterSettings] = None,
+        tools: Optional[ToolCollection] = None,
+    ):
+        self.settings = settings or config.router or RouterSettings()
+        self._tool_index = ToolIndex(tools.to_params()) if tools else None
+        self._decisions: "OrderedDict[str, Route]" = OrderedDict()
+
+    def score(self, query: str) -> float:
+        """Probability that the query needs the agent"""
+        log_odds = _BIAS
+        for _, weight, pattern in _FEATURES:
+            if pattern.search(query):
+                log_odds += weight
+        words = len(query.split())
+        log_odds += min(
+            max(words - _LONG_QUERY_WORDS, 0) * _LONG_QUERY_WEIGHT, _LONG_QUERY_MAX
+        )
+        if self._tool_index is not None:
+            ranked = self._tool_index.rank(query)
+            if ranked:
+                log_odds += min(ranked[0][0] * _TOOL_WEIGHT, _TOOL_MAX)
+        return 1 / (1 + math.exp(-log_odds))
+
+    async def route(self, query: str, classifier: Optional[Classifier] = None) -> Route:
+        """Route a query, asking the classifier only when the score is unsure"""
+        key = " ".join(query.lower().split())
+        cached = self._decisions.get(key)
+        if cached is not None:
+            self._decisions.move_to_end(key)
+            metrics.CACHE_LOOKUPS.inc(cache="route", result="hit")
+            return Route(cached.simple, cached.confidence, "cache")
+        metrics.CACHE_LOOKUPS.inc(cache="route", result="miss")
+
+        complex_probability = self.score(query)
+        decision = Route(
+            complex_probability < 0.5,
+            max(complex_probability, 1 - complex_probability),
+            "local",
+        )
+        if (
+            decision.confidence < self.settings.confidence_threshold
+            and classifier is not None
+            and self.settings.use_classifier
+        ):
+            try:
+                decision = Route(await classifier(query), 1.0, "classifier")
+            except Exception as e:
+                logger.warning(f"Query classifier failed, routing locally: {e}")
+        logger.info(f"Routed query: {decision}")
+
+        self._decisions[key] = decision
+        if len(self._decisions) > max(self.settings.cache_size, 0):
+            self._decisions.popitem(last=False)
+        return decision
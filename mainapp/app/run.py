@@ -0,0 +1,37 @@
+"""The scope of one agent or flow run.
+
+Every run binds the same per-run state: its log context, budget, CPU and
+memory profilers and metrics. ``run_scope`` enters them in one place, so
+agents and flows do not each repeat the list.
+"""
+from contextlib import ExitStack, contextmanager
+from typing import Any, Iterator, Optional
+
+from app import metrics
+from app.budget import RunBudget, use_budget
+from app.logger import run_context
+from app.profiling.cpu import profile_run
+from app.profiling.memory import profile_memory
+
+
+@contextmanager
+def run_scope(
+    name: str, budget: Optional[RunBudget] = None, *tools: Any
+) -> Iterator[Optional[RunBudget]]:
+    """Bind the budget, log context, profilers and metrics of a run.
+
+    Args:
+        name: Name of the agent or flow
+        budget: Budget of the run, None keeps the enclosing one
+        tools: Extra tools for the memory profiler, e.g. a planning tool
+
+    Yields:
+        The budget bound for the run, if any
+    """
+    with ExitStack() as stack:
+        stack.enter_context(run_context(name))
+        bound = stack.enter_context(use_budget(budget))
+        stack.enter_context(profile_run(name))
+        stack.enter_context(profile_memory(name, *tools))
+        stack.enter_context(metrics.run_scope(name))
+        yield bound
@@ -0,0 +1,62 @@
+"""Run a single prompt on a fresh agent or flow.
+
+Shared by the entry points that run prompts unattended (the batch runner and
+the job queue workers), so each prompt gets its own agent, memory, budget
+and sandbox.
+"""
+import asyncio
+from typing import List
+
+from app.budget import RunBudget, use_budget
+from app.exceptions import BudgetExceeded
+from app.flow.flow_factory import FlowFactory, FlowType
+from app.sandbox.client import isolated_sandbox
+
+
+# Wall time per prompt unless [budget] max_seconds says otherwise
+DEFAULT_MAX_SECONDS = 3600
+
+# "agent" runs a Manus agent, the others a flow of that type
+MODES: List[str] = ["agent"] + [flow_type.value for flow_type in FlowType]
+
+
+def create_budget(max_seconds: float = DEFAULT_MAX_SECONDS) -> RunBudget:
+    """A budget with the [budget] limits, bounded in wall time"""
+    budget = RunBudget.from_config()
+    if budget.max_seconds is None:
+        budget.max_seconds = max_seconds
+    return budget
+
+
+async def run_prompt(prompt: str, mode: str, budget: RunBudget) -> str:
+    """Run one prompt on a fresh Manus agent or flow in a sandbox of its own.
+
+    Runs stopped by their budget return what they did so far; that is not a
+    result, so it is raised as a failure for callers to retry.
+
+    Raises:
+        BudgetExceeded: If the run exhausted its budget
+        asyncio.TimeoutError: If the run outlives its budget by a minute
+    """
+    from app.agent.manus import Manus
+
+    async def run() -> str:
+        agent = await Manus.create()
+        try:
+            if mode == "agent":
+                with use_budget(budget):
+                    return await agent.run(prompt)
+            flow = FlowFactory.create_flow(
+                flow_type=FlowType(mode), agents={"manus": agent}, budget=budget
+            )
+            return await flow.execute(prompt)
+        finally:
+            await agent.cleanup()
+
+    async with isolated_sandbox():
+        # Backstop only, the budget normally stops the run
+        result = await asyncio.wait_for(run(), timeout=budget.max_seconds + 60)
+    reason = budget.exceeded_reason()
+    if reason:
+        raise BudgetExceeded(reason)
+    return result
@@ -4,18 +4,40 @@ Docker Sandbox Module
 Provides secure containerized execution environment with resource limits
 and isolation for running untrusted code.
 """
-from app.sandbox.client import (
-    BaseSandboxClient,
-    LocalSandboxClient,
-    create_sandbox_client,
-)
-from app.sandbox.core.exceptions import (
-    SandboxError,
-    SandboxResourceError,
-    SandboxTimeoutError,
+from typing import TYPE_CHECKING
+
+from app.lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from app.sandbox.client import (
+        BaseSandboxClient,
+        LocalSandboxClient,
+        create_sandbox_client,
+    )
+    from app.sandbox.core.exceptions import (
+        SandboxError,
+        SandboxResourceError,
+        SandboxTimeoutError,
+    )
+    from app.sandbox.core.manager import SandboxManager
+    from app.sandbox.core.sandbox import DockerSandbox
+
+
+# Imported on first access so that using SANDBOX_CLIENT does not import docker
+__getattr__ = lazy_exports(
+    __name__,
+    {
+        "DockerSandbox": "app.sandbox.core.sandbox",
+        "SandboxManager": "app.sandbox.core.manager",
+        "BaseSandboxClient": "app.sandbox.client",
+        "LocalSandboxClient": "app.sandbox.client",
+        "create_sandbox_client": "app.sandbox.client",
+        "SandboxError": "app.sandbox.core.exceptions",
+        "SandboxTimeoutError": "app.sandbox.core.exceptions",
+        "SandboxResourceError": "app.sandbox.core.exceptions",
+    },
 )
-from app.sandbox.core.manager import SandboxManager
-from app.sandbox.core.sandbox import DockerSandbox
 
 
 __all__ = [
@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Protocol
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, Optional, Protocol
 
+from app import metrics
 from app.config import SandboxSettings
-from app.sandbox.core.sandbox import DockerSandbox
+
+
+# docker is only imported when a sandbox is actually created, every agent run
+# touches SANDBOX_CLIENT but most never start a container
+if TYPE_CHECKING:
+    from app.sandbox.core.sandbox import DockerSandbox
 
 
 class SandboxFileOperations(Protocol):
@@ -88,7 +96,7 @@ class LocalSandboxClient(BaseSandboxClient):
 
     def __init__(self):
         """Initializes local sandbox client."""
-        self.sandbox: Optional[DockerSandbox] = None
+        self.sandbox: Optional["DockerSandbox"] = None
 
     async def create(
         self,
@@ -104,8 +112,16 @@ class LocalSandboxClient(BaseSandboxClient):
         Raises:
             RuntimeError: If sandbox creation fails.
         """
+        from app.sandbox.core.sandbox import DockerSandbox
+
         self.sandbox = DockerSandbox(config, volume_bindings)
-        await self.sandbox.create()
+        try:
+            await self.sandbox.create()
+        except Exception:
+            metrics.SANDBOX_EVENTS.inc(event="create_failed")
+            raise
+        metrics.SANDBOXES_ACTIVE.inc()
+        metrics.SANDBOX_EVENTS.inc(event="created")
 
     async def run_command(self, command: str, timeout: Optional[int] = None) -> str:
         """Runs command in sandbox.
@@ -187,6 +203,8 @@ class LocalSandboxClient(BaseSandboxClient):
         if self.sandbox:
             await self.sandbox.cleanup()
             self.sandbox = None
+            metrics.SANDBOXES_ACTIVE.dec()
+            metrics.SANDBOX_EVENTS.inc(event="deleted")
 
 
 def create_sandbox_client() -> LocalSandboxClient:
@@ -199,3 +217,38 @@ def create_sandbox_client() -> LocalSandboxClient:
 
 
 SANDBOX_CLIENT = create_sandbox_client()
+
+_current_client: ContextVar[Optional[LocalSandboxClient]] = ContextVar(
+    "sandbox_client", default=None
+)
+
+
+def current_sandbox_client() -> LocalSandboxClient:
+    """The sandbox client of the running task, SANDBOX_CLIENT by default"""
+    return _current_client.get() or SANDBOX_CLIENT
+
+
+@contextmanager
+def use_sandbox_client(client: LocalSandboxClient) -> Iterator[LocalSandboxClient]:
+    """Bind a sandbox client for the enclosed code and the tasks it starts"""
+    token = _current_client.set(client)
+    try:
+        yield client
+    finally:
+        _current_client.reset(token)
+
+
+@asynccontextmanager
+async def isolated_sandbox() -> AsyncIterator[LocalSandboxClient]:
+    """Give the enclosed code, and the tasks it starts, a sandbox of its own.
+
+    The sandbox is still created lazily by the first tool that needs it and
+    is cleaned up on exit, so concurrent runs never share or remove each
+    other's container.
+    """
+    client = create_sandbox_client()
+    try:
+        with use_sandbox_client(client):
+            yield client
+    finally:
+        await client.cleanup()
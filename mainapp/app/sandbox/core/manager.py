@@ -6,6 +6,7 @@ from typing import Dict, Optional, Set
 import docker
 from docker.errors import APIError, ImageNotFound
 
+from app import metrics
 from app.config import SandboxSettings
 from app.logger import logger
 from app.sandbox.core.sandbox import DockerSandbox
@@ -146,12 +147,15 @@ class SandboxManager:
                 self._sandboxes[sandbox_id] = sandbox
                 self._last_used[sandbox_id] = asyncio.get_event_loop().time()
                 self._locks[sandbox_id] = asyncio.Lock()
+                metrics.SANDBOXES_ACTIVE.inc()
+                metrics.SANDBOX_EVENTS.inc(event="created")
 
                 logger.info(f"Created sandbox {sandbox_id}")
                 return sandbox_id
 
             except Exception as e:
                 logger.error(f"Failed to create sandbox: {e}")
+                metrics.SANDBOX_EVENTS.inc(event="create_failed")
                 if sandbox_id in self._sandboxes:
                     await self.delete_sandbox(sandbox_id)
                 raise RuntimeError(f"Failed to create sandbox: {e}")
@@ -234,6 +238,7 @@ class SandboxManager:
                 logger.error("Sandbox cleanup timed out")
 
         # Clean up remaining references
+        metrics.SANDBOXES_ACTIVE.dec(len(self._sandboxes))
         self._sandboxes.clear()
         self._last_used.clear()
         self._locks.clear()
@@ -268,7 +273,9 @@ class SandboxManager:
 
                 # Remove sandbox record from manager
                 async with self._global_lock:
-                    self._sandboxes.pop(sandbox_id, None)
+                    if self._sandboxes.pop(sandbox_id, None) is not None:
+                        metrics.SANDBOXES_ACTIVE.dec()
+                        metrics.SANDBOX_EVENTS.inc(event="deleted")
                     self._last_used.pop(sandbox_id, None)
                     self._locks.pop(sandbox_id, None)
                     logger.info(f"Deleted sandbox {sandbox_id}")
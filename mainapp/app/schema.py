@@ -1,7 +1,11 @@
+import hashlib
+import json
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, ClassVar, Dict, List, Literal, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from app import metrics
 
 
 class Role(str, Enum):
@@ -52,7 +56,13 @@ class ToolCall(BaseModel):
 
 
 class Message(BaseModel):
-    """Represents a chat message in the conversation"""
+    """Represents a chat message in the conversation.
+
+    The wire-format dict sent to the LLM is built once and cached on the
+    message. Assigning to any field drops the cache; mutating nested objects
+    in place (e.g. a ``ToolCall`` inside ``tool_calls``) is not tracked, so
+    treat messages as immutable once they are added to memory.
+    """
 
     role: ROLE_TYPE = Field(...)  # type: ignore
     content: Optional[str] = Field(default=None)
@@ -61,6 +71,25 @@ class Message(BaseModel):
     tool_call_id: Optional[str] = Field(default=None)
     base64_image: Optional[str] = Field(default=None)
 
+    _dict_cache: Optional[dict] = PrivateAttr(default=None)
+    _payload_cache: Dict[bool, Optional[dict]] = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in Message.model_fields:
+            self._invalidate_cache()
+
+    def _invalidate_cache(self) -> None:
+        """Drop cached serializations after a field changes"""
+        self._dict_cache = None
+        self._payload_cache = {}
+
+    def __eq__(self, other: Any) -> bool:
+        # Compare fields only, the serialization caches are not part of the value
+        if not isinstance(other, Message):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
         if isinstance(other, list):
@@ -83,45 +112,66 @@ class Message(BaseModel):
 
     def to_dict(self) -> dict:
         """Convert message to dictionary format"""
-        message = {"role": self.role}
-        if self.content is not None:
-            message["content"] = self.content
-        if self.tool_calls is not None:
-            message["tool_calls"] = [tool_call.dict() for tool_call in self.tool_calls]
-        if self.name is not None:
-            message["name"] = self.name
-        if self.tool_call_id is not None:
-            message["tool_call_id"] = self.tool_call_id
-        if self.base64_image is not None:
-            message["base64_image"] = self.base64_image
-        return message
+        if self._dict_cache is None:
+            message = {"role": self.role}
+            if self.content is not None:
+                message["content"] = self.content
+            if self.tool_calls is not None:
+                message["tool_calls"] = [
+                    tool_call.model_dump() for tool_call in self.tool_calls
+                ]
+            if self.name is not None:
+                message["name"] = self.name
+            if self.tool_call_id is not None:
+                message["tool_call_id"] = self.tool_call_id
+            if self.base64_image is not None:
+                message["base64_image"] = self.base64_image
+            self._dict_cache = message
+        # Shallow copy so callers can add or remove keys without touching the cache
+        return dict(self._dict_cache)
+
+    def to_payload(self, supports_images: bool = False) -> Optional[dict]:
+        """Return the cached OpenAI wire payload for this message.
+
+        The returned dict is shared with the cache and must not be mutated.
+        Returns None for messages that carry neither content nor tool calls.
+        """
+        if supports_images not in self._payload_cache:
+            self._payload_cache[supports_images] = format_message_dict(
+                self.to_dict(), supports_images
+            )
+        return self._payload_cache[supports_images]
 
     @classmethod
     def user_message(
         cls, content: str, base64_image: Optional[str] = None
     ) -> "Message":
         """Create a user message"""
-        return cls(role=Role.USER, content=content, base64_image=base64_image)
+        return cls.model_construct(
+            role=Role.USER.value, content=content, base64_image=base64_image
+        )
 
     @classmethod
     def system_message(cls, content: str) -> "Message":
         """Create a system message"""
-        return cls(role=Role.SYSTEM, content=content)
+        return cls.model_construct(role=Role.SYSTEM.value, content=content)
 
     @classmethod
     def assistant_message(
         cls, content: Optional[str] = None, base64_image: Optional[str] = None
     ) -> "Message":
         """Create an assistant message"""
-        return cls(role=Role.ASSISTANT, content=content, base64_image=base64_image)
+        return cls.model_construct(
+            role=Role.ASSISTANT.value, content=content, base64_image=base64_image
+        )
 
     @classmethod
     def tool_message(
         cls, content: str, name, tool_call_id: str, base64_image: Optional[str] = None
     ) -> "Message":
         """Create a tool message"""
-        return cls(
-            role=Role.TOOL,
+        return cls.model_construct(
+            role=Role.TOOL.value,
             content=content,
             name=name,
             tool_call_id=tool_call_id,
@@ -143,6 +193,8 @@ class Message(BaseModel):
             content: Optional message content
             base64_image: Optional base64 encoded image
         """
+        # Content, kwargs and the tool calls come from the LLM or the caller,
+        # so unlike the other factories this one validates its input
         formatted_calls = [
             {"id": call.id, "function": call.function.model_dump(), "type": "function"}
             for call in tool_calls
@@ -156,6 +208,96 @@ class Message(BaseModel):
         )
 
 
+def format_message_dict(message: dict, supports_images: bool = False) -> Optional[dict]:
+    """Convert a message dict into the OpenAI wire format.
+
+    Inlines ``base64_image`` as an ``image_url`` content part when the target
+    model supports images and drops it otherwise. The input dict is not
+    modified. Returns None if the message has neither content nor tool calls.
+    """
+    if "role" not in message:
+        raise ValueError("Message dict must contain 'role' field")
+
+    message = dict(message)
+    base64_image = message.pop("base64_image", None)
+
+    # Process base64 images if present and model supports images
+    if supports_images and base64_image:
+        # Initialize or convert content to appropriate format
+        content = message.get("content")
+        if not content:
+            content = []
+        elif isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        elif isinstance(content, list):
+            # Convert string items to proper text objects
+            content = [
+                {"type": "text", "text": item} if isinstance(item, str) else item
+                for item in content
+            ]
+
+        # Add the image to content
+        message["content"] = content + [
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+            }
+        ]
+
+    if "content" in message or "tool_calls" in message:
+        return message
+    return None
+
+
+class ToolParams(list):
+    """A read-only list of tool schemas in function call format.
+
+    Built once per tool set by ``ToolCollection.to_params`` and handed to
+    ``LLM.ask_tool`` as is. The schemas are validated on construction and
+    their token counts are memoized per tokenizer in a process-wide cache
+    keyed by a fingerprint of the schemas, so agents with identical tool sets
+    share the count.
+    """
+
+    _token_counts: ClassVar[Dict[Tuple[str, str], int]] = {}
+
+    def __init__(self, params: List[dict]):
+        for param in params:
+            if not isinstance(param, dict) or "type" not in param:
+                raise ValueError("Each tool must be a dict with 'type' field")
+        super().__init__(params)
+        self.fingerprint = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("ToolParams is read-only")
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+    def __copy__(self) -> "ToolParams":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "ToolParams":
+        return self
+
+    def count_tokens(self, tokenizer: Any) -> int:
+        """Count schema tokens with the given tiktoken encoding, memoized"""
+        key = (self.fingerprint, tokenizer.name)
+        if key not in self._token_counts:
+            metrics.CACHE_LOOKUPS.inc(cache="tool_tokens", result="miss")
+            self._token_counts[key] = sum(
+                len(tokenizer.encode(str(param))) for param in self
+            )
+        else:
+            metrics.CACHE_LOOKUPS.inc(cache="tool_tokens", result="hit")
+        return self._token_counts[key]
+
+
 class Memory(BaseModel):
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
@@ -0,0 +1,6 @@
+"""Multi-session agent server.
+
+``SessionManager`` hosts many concurrent agent sessions on one event loop and
+``create_app`` exposes them over HTTP and WebSocket. Start it with
+``run_server.py``.
+"""
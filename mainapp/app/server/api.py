@@ -0,0 +1,179 @@
+"""HTTP and WebSocket API of the agent server.
+
+Endpoints:
+
+- ``POST /sessions``: create a session
+- ``GET /sessions``, ``GET /sessions/{id}``: list or inspect sessions
+- ``DELETE /sessions/{id}``: close a session
+- ``POST /sessions/{id}/messages``: send ``{"message": ...}``, returns the result
+- ``POST /sessions/{id}/stream``: same, streams progress events as SSE
+- ``POST /sessions/{id}/cancel``: cancel the message being processed
+- ``WS /sessions/{id}/ws``: send ``{"type": "message", "message": ...}`` or
+  ``{"type": "cancel"}``, receive progress events as JSON
+- ``GET /health``
+
+Events are serialized with ``event_to_dict``; the last event of a message
+has type ``run_finished`` and carries the result.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.events import collect_result, event_to_dict
+from app.exceptions import (
+    SessionBusy,
+    SessionError,
+    SessionLimitReached,
+    SessionNotFound,
+)
+from app.logger import logger
+from app.server.sessions import SessionManager
+
+
+_ERROR_STATUS = {SessionNotFound: 404, SessionBusy: 409, SessionLimitReached: 503}
+
+
+def _error_response(error: SessionError) -> JSONResponse:
+    return JSONResponse({"error": str(error)}, status_code=_ERROR_STATUS[type(error)])
+
+
+async def _read_message(request: Request) -> Optional[str]:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return None
+    message = body.get("message") if isinstance(body, dict) else None
+    return message if isinstance(message, str) and message.strip() else None
+
+
+def create_app(manager: SessionManager) -> Starlette:
+    """Build the ASGI app serving the sessions of a manager"""
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok", "sessions": len(manager.sessions)})
+
+    async def create_session(request: Request) -> JSONResponse:
+        try:
+            session = await manager.create()
+        except SessionError as e:
+            return _error_response(e)
+        return JSONResponse(session.to_dict(), status_code=201)
+
+    async def list_sessions(request: Request) -> JSONResponse:
+        return JSONResponse([session.to_dict() for session in manager.list()])
+
+    async def get_session(request: Request) -> JSONResponse:
+        try:
+            session = manager.get(request.path_params["session_id"])
+        except SessionError as e:
+            return _error_response(e)
+        return JSONResponse(session.to_dict())
+
+    async def close_session(request: Request) -> JSONResponse:
+        try:
+            await manager.close(request.path_params["session_id"])
+        except SessionError as e:
+            return _error_response(e)
+        return JSONResponse({"closed": True})
+
+    async def send_message(request: Request) -> JSONResponse:
+        message = await _read_message(request)
+        if message is None:
+            return JSONResponse(
+                {"error": "A non-empty message is required"}, status_code=400
+            )
+        try:
+            events = manager.send(request.path_params["session_id"], message)
+        except SessionError as e:
+            return _error_response(e)
+        return JSONResponse({"result": await collect_result(events)})
+
+    async def stream_message(request: Request):
+        message = await _read_message(request)
+        if message is None:
+            return JSONResponse(
+                {"error": "A non-empty message is required"}, status_code=400
+            )
+        try:
+            events = manager.send(request.path_params["session_id"], message)
+        except SessionError as e:
+            return _error_response(e)
+
+        async def sse():
+            # Closing the response (client gone) closes the stream, which
+            # cancels the run
+            async for event in events:
+                payload = json.dumps(event_to_dict(event), ensure_ascii=False)
+                yield f"event: {event.type}\ndata: {payload}\n\n"
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    async def cancel_message(request: Request) -> JSONResponse:
+        try:
+            session = manager.get(request.path_params["session_id"])
+        except SessionError as e:
+            return _error_response(e)
+        return JSONResponse({"cancelled": session.cancel()})
+
+    async def session_socket(websocket: WebSocket) -> None:
+        session_id = websocket.path_params["session_id"]
+        await websocket.accept()
+        running: Optional[asyncio.Task] = None
+
+        async def forward(events) -> None:
+            async for event in events:
+                await websocket.send_json(event_to_dict(event))
+
+        try:
+            while True:
+                request = await websocket.receive_json()
+                kind = request.get("type") if isinstance(request, dict) else None
+                try:
+                    if kind == "cancel":
+                        manager.get(session_id).cancel()
+                    elif kind == "message" and str(request.get("message")).strip():
+                        events = manager.send(session_id, request["message"])
+                        running = asyncio.create_task(forward(events))
+                    else:
+                        await websocket.send_json(
+                            {"type": "error", "error": "Unknown request"}
+                        )
+                except SessionError as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if running is not None and not running.done():
+                running.cancel()
+                await asyncio.gather(running, return_exceptions=True)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        manager.start()
+        try:
+            yield
+        finally:
+            logger.info("Closing all sessions")
+            await manager.close_all()
+
+    return Starlette(
+        routes=[
+            Route("/health", health),
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions", list_sessions, methods=["GET"]),
+            Route("/sessions/{session_id}", get_session, methods=["GET"]),
+            Route("/sessions/{session_id}", close_session, methods=["DELETE"]),
+            Route("/sessions/{session_id}/messages", send_message, methods=["POST"]),
+            Route("/sessions/{session_id}/stream", stream_message, methods=["POST"]),
+            Route("/sessions/{session_id}/cancel", cancel_message, methods=["POST"]),
+            WebSocketRoute("/sessions/{session_id}/ws", session_socket),
+        ],
+        lifespan=lifespan,
+    )
@@ -0,0 +1,177 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.agent.base import BaseAgent
+from app.budget import RunBudget
+from app.config import ServerSettings
+from app.events import BaseEvent, stream_events
+from app.exceptions import SessionBusy, SessionLimitReached, SessionNotFound
+from app.logger import logger
+from app.sandbox.client import (
+    LocalSandboxClient,
+    create_sandbox_client,
+    use_sandbox_client,
+)
+
+
+AgentFactory = Callable[[], Awaitable[BaseAgent]]
+
+
+class Session:
+    """One conversation: an agent with its own memory, sandbox and browser."""
+
+    def __init__(self, agent: BaseAgent):
+        self.id = uuid.uuid4().hex
+        self.agent = agent
+        self.sandbox: LocalSandboxClient = create_sandbox_client()
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+        self.messages = 0
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def cancel(self) -> bool:
+        """Cancel the message being processed, False if there is none"""
+        if self._task is None or self._task.done():
+            return False
+        self._task.cancel()
+        return True
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "agent": self.agent.name,
+            "created_at": self.created_at,
+            "idle_seconds": round(time.monotonic() - self.last_active, 1),
+            "messages": self.messages,
+            "running": self.running,
+        }
+
+
+class SessionManager:
+    """Holds the sessions of the agent server.
+
+    All sessions run on one event loop and share the process' LLM clients,
+    connection pools and tokenizers. Each session keeps its own agent, and
+    with it memory and browser context, plus a sandbox client of its own.
+    One message is processed per session at a time; sessions left idle for
+    ``session_idle_timeout`` seconds are closed.
+    """
+
+    def __init__(self, agent_factory: AgentFactory, settings: ServerSettings):
+        self.agent_factory = agent_factory
+        self.settings = settings
+        self.sessions: Dict[str, Session] = {}
+        # Sessions whose agent is still being created, they count towards
+        # max_sessions
+        self._creating = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start closing idle sessions in the background"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._close_idle_sessions())
+
+    async def _close_idle_sessions(self) -> None:
+        interval = min(self.settings.session_idle_timeout, 60)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                idle = now - session.last_active
+                if not session.running and idle > self.settings.session_idle_timeout:
+                    logger.info(f"Closing session {session.id}, idle for {idle:.0f}s")
+                    await self.close(session.id)
+
+    async def create(self) -> Session:
+        if len(self.sessions) + self._creating >= self.settings.max_sessions:
+            raise SessionLimitReached(
+                f"Server holds its maximum of {self.settings.max_sessions} sessions"
+            )
+        self._creating += 1
+        try:
+            agent = await self.agent_factory()
+        finally:
+            self._creating -= 1
+        session = Session(agent)
+        self.sessions[session.id] = session
+        logger.info(f"Created session {session.id}")
+        return session
+
+    def get(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFound(f"No session with id {session_id}")
+        return session
+
+    def list(self) -> List[Session]:
+        return list(self.sessions.values())
+
+    async def close(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFound(f"No session with id {session_id}")
+        task = session._task
+        if session.cancel() and task is not asyncio.current_task():
+            # The run stops using the agent and sandbox before they are cleaned up
+            await asyncio.wait({task})
+        try:
+            cleanup = getattr(session.agent, "cleanup", None)
+            if cleanup is not None:
+                await cleanup()
+        finally:
+            await session.sandbox.cleanup()
+        logger.info(f"Closed session {session_id}")
+
+    async def close_all(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for session_id in list(self.sessions):
+            try:
+                await self.close(session_id)
+            except Exception as e:
+                logger.warning(f"Failed to close session {session_id}: {e}")
+
+    def send(self, session_id: str, message: str) -> AsyncIterator[BaseEvent]:
+        """Process a message, yielding the agent's progress events.
+
+        The session is marked busy right away, so a second message sent
+        before the stream is consumed is rejected with SessionBusy. The last
+        event is RunFinished with the agent's result.
+        """
+        session = self.get(session_id)
+        if session.running:
+            raise SessionBusy(f"Session {session_id} is processing a message")
+        session.running = True
+        return self._stream(session, message)
+
+    async def _stream(self, session: Session, message: str) -> AsyncIterator[BaseEvent]:
+        events = stream_events(
+            lambda: self._run(session, message), source=session.agent.name
+        )
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+            session.running = False
+            session.last_active = time.monotonic()
+
+    async def _run(self, session: Session, message: str) -> str:
+        session._task = asyncio.current_task()
+        session.messages += 1
+        agent = session.agent
+        # A run that ended early (terminate, errors) leaves its step counter
+        agent.current_step = 0
+        agent.budget = RunBudget.from_config()
+        try:
+            with use_sandbox_client(session.sandbox):
+                return await agent.run(message)
+        except asyncio.CancelledError:
+            logger.info(f"Cancelled message {session.messages} of session {session.id}")
+            return "Cancelled"
+        finally:
+            session._task = None
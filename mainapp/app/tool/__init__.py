@@ -1,12 +1,36 @@
-from app.tool.base import BaseTool
-from app.tool.bash import Bash
-from app.tool.browser_use_tool import BrowserUseTool
-from app.tool.create_chat_completion import CreateChatCompletion
-from app.tool.planning import PlanningTool
-from app.tool.str_replace_editor import StrReplaceEditor
-from app.tool.terminate import Terminate
-from app.tool.tool_collection import ToolCollection
-from app.tool.web_search import WebSearch
+from typing import TYPE_CHECKING
+
+from app.lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from app.tool.base import BaseTool
+    from app.tool.bash import Bash
+    from app.tool.browser_use_tool import BrowserUseTool
+    from app.tool.create_chat_completion import CreateChatCompletion
+    from app.tool.planning import PlanningTool
+    from app.tool.str_replace_editor import StrReplaceEditor
+    from app.tool.terminate import Terminate
+    from app.tool.tool_collection import ToolCollection
+    from app.tool.web_search import WebSearch
+
+
+# Exports are imported on first access so that importing one tool does not
+# pull in the optional backends of all the others
+__getattr__ = lazy_exports(
+    __name__,
+    {
+        "BaseTool": "app.tool.base",
+        "Bash": "app.tool.bash",
+        "BrowserUseTool": "app.tool.browser_use_tool",
+        "CreateChatCompletion": "app.tool.create_chat_completion",
+        "PlanningTool": "app.tool.planning",
+        "StrReplaceEditor": "app.tool.str_replace_editor",
+        "Terminate": "app.tool.terminate",
+        "ToolCollection": "app.tool.tool_collection",
+        "WebSearch": "app.tool.web_search",
+    },
+)
 
 
 __all__ = [
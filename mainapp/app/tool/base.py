@@ -3,6 +3,8 @@ from typing import Any, Dict, Optional
 
 from pydantic import BaseModel, Field
 
+from app.profiling.startup import startup_phase
+
 
 class BaseTool(ABC, BaseModel):
     name: str
@@ -12,6 +14,10 @@ class BaseTool(ABC, BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
+    def __init__(self, **data):
+        with startup_phase(f"construct {type(self).__name__}"):
+            super().__init__(**data)
+
     async def __call__(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
         return await self.execute(**kwargs)
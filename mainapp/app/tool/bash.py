@@ -1,7 +1,10 @@
 import asyncio
 import os
+import signal
 from typing import Optional
 
+from pydantic import Field
+
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, CLIResult
 
@@ -24,9 +27,10 @@ class _BashSession:
     _timeout: float = 120.0  # seconds
     _sentinel: str = "<<exit>>"
 
-    def __init__(self):
+    def __init__(self, cwd: Optional[str] = None):
         self._started = False
         self._timed_out = False
+        self._cwd = cwd
 
     async def start(self):
         if self._started:
@@ -35,6 +39,7 @@ class _BashSession:
         self._process = await asyncio.create_subprocess_shell(
             self.command,
             preexec_fn=os.setsid,
+            cwd=self._cwd,
             shell=True,
             bufsize=0,
             stdin=asyncio.subprocess.PIPE,
@@ -52,6 +57,15 @@ class _BashSession:
             return
         self._process.terminate()
 
+    def kill(self):
+        """Kill the bash shell and every process started from it."""
+        if not self._started or self._process.returncode is not None:
+            return
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
     async def run(self, command: str):
         """Execute a command in the bash shell."""
         if not self._started:
@@ -96,6 +110,12 @@ class _BashSession:
             raise ToolError(
                 f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
             ) from None
+        except asyncio.CancelledError:
+            # Cancelled from outside (e.g. the run budget ran out), kill the whole
+            # process group so the command does not keep running in the background
+            self._timed_out = True
+            self.kill()
+            raise
 
         if output.endswith("\n"):
             output = output[:-1]
@@ -129,6 +149,10 @@ class Bash(BaseTool):
         "required": ["command"],
     }
 
+    cwd: Optional[str] = Field(
+        None, description="Directory the shell starts in, the process' by default"
+    )
+
     _session: Optional[_BashSession] = None
 
     async def execute(
@@ -137,13 +161,13 @@ class Bash(BaseTool):
         if restart:
             if self._session:
                 self._session.stop()
-            self._session = _BashSession()
+            self._session = _BashSession(self.cwd)
             await self._session.start()
 
             return CLIResult(system="tool has been restarted.")
 
         if self._session is None:
-            self._session = _BashSession()
+            self._session = _BashSession(self.cwd)
             await self._session.start()
 
         if command is not None:
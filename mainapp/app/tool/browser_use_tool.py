@@ -1,21 +1,22 @@
 import asyncio
 import base64
 import json
-from typing import Generic, Optional, TypeVar
+from typing import TYPE_CHECKING, Any, Generic, Optional, TypeVar
 
-from browser_use import Browser as BrowserUseBrowser
-from browser_use import BrowserConfig
-from browser_use.browser.context import BrowserContext, BrowserContextConfig
-from browser_use.dom.service import DomService
 from pydantic import Field, field_validator
 from pydantic_core.core_schema import ValidationInfo
 
 from app.config import config
-from app.llm import LLM
+from app.llm import LLM, ROUTINE, use_llm_tier
 from app.tool.base import BaseTool, ToolResult
 from app.tool.web_search import WebSearch
 
 
+# browser_use (and playwright behind it) is only imported once a browser is
+# actually started, importing it costs about a second of startup time
+if TYPE_CHECKING:
+    from browser_use.browser.context import BrowserContext
+
 _BROWSER_DESCRIPTION = """\
 A powerful browser automation tool that allows interaction with web pages through various actions.
 * This tool provides commands for controlling a browser session, navigating web pages, and extracting information
@@ -122,15 +123,17 @@ class BrowserUseTool(BaseTool, Generic[Context]):
     }
 
     lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
-    browser: Optional[BrowserUseBrowser] = Field(default=None, exclude=True)
-    context: Optional[BrowserContext] = Field(default=None, exclude=True)
-    dom_service: Optional[DomService] = Field(default=None, exclude=True)
-    web_search_tool: WebSearch = Field(default_factory=WebSearch, exclude=True)
+    # browser_use Browser, BrowserContext and DomService, created on first use
+    browser: Optional[Any] = Field(default=None, exclude=True)
+    context: Optional[Any] = Field(default=None, exclude=True)
+    dom_service: Optional[Any] = Field(default=None, exclude=True)
+    web_search_tool: Optional[WebSearch] = Field(default=None, exclude=True)
 
     # Context for generic functionality
     tool_context: Optional[Context] = Field(default=None, exclude=True)
 
-    llm: Optional[LLM] = Field(default_factory=LLM)
+    # Created on the first extract_content call
+    llm: Optional[LLM] = None
 
     @field_validator("parameters", mode="before")
     def validate_parameters(cls, v: dict, info: ValidationInfo) -> dict:
@@ -138,8 +141,13 @@ class BrowserUseTool(BaseTool, Generic[Context]):
             raise ValueError("Parameters cannot be empty")
         return v
 
-    async def _ensure_browser_initialized(self) -> BrowserContext:
+    async def _ensure_browser_initialized(self) -> "BrowserContext":
         """Ensure browser and context are initialized."""
+        from browser_use import Browser as BrowserUseBrowser
+        from browser_use import BrowserConfig
+        from browser_use.browser.context import BrowserContextConfig
+        from browser_use.dom.service import DomService
+
         if self.browser is None:
             browser_config_kwargs = {"headless": False, "disable_security": True}
 
@@ -254,6 +262,8 @@ class BrowserUseTool(BaseTool, Generic[Context]):
                             error="Query is required for 'web_search' action"
                         )
                     # Execute the web search and return results directly without browser navigation
+                    if self.web_search_tool is None:
+                        self.web_search_tool = WebSearch()
                     search_response = await self.web_search_tool.execute(
                         query=query, fetch_content=True, num_results=1
                     )
@@ -428,11 +438,15 @@ Page content:
                     }
 
                     # Use LLM to extract content with required function calling
-                    response = await self.llm.ask_tool(
-                        messages,
-                        tools=[extraction_function],
-                        tool_choice="required",
-                    )
+                    if self.llm is None:
+                        self.llm = LLM()
+                    with use_llm_tier(ROUTINE):
+                        response = await self.llm.ask_tool(
+                            messages,
+                            tools=[extraction_function],
+                            tool_choice="required",
+                            request_type="extract",
+                        )
 
                     if response and response.tool_calls:
                         args = json.loads(response.tool_calls[0].function.arguments)
@@ -477,7 +491,7 @@ Page content:
                 return ToolResult(error=f"Browser action '{action}' failed: {str(e)}")
 
     async def get_current_state(
-        self, context: Optional[BrowserContext] = None
+        self, context: Optional["BrowserContext"] = None
     ) -> ToolResult:
         """
         Get the current browser state as a ToolResult.
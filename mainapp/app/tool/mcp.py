@@ -1,20 +1,25 @@
+import time
 from contextlib import AsyncExitStack
-from typing import Dict, List, Optional
-
-from mcp.client.sse import sse_client
-from mcp.client.stdio import stdio_client
-from mcp.types import ListToolsResult, TextContent
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
+from app import metrics
 from app.logger import logger
+from app.profiling.startup import startup_phase
 from app.tool.base import BaseTool, ToolResult
 from app.tool.tool_collection import ToolCollection
-from mcp import ClientSession, StdioServerParameters
+
+
+# The mcp package imports its whole client and server stack on import, so it
+# is only imported once a server is actually connected
+if TYPE_CHECKING:
+    from mcp import ClientSession
+    from mcp.types import ListToolsResult
 
 
 class MCPClientTool(BaseTool):
     """Represents a tool proxy that can be called on the MCP server from the client side."""
 
-    session: Optional[ClientSession] = None
+    session: Optional[Any] = None  # mcp.ClientSession
     server_id: str = ""  # Add server identifier
     original_name: str = ""
 
@@ -23,15 +28,27 @@ class MCPClientTool(BaseTool):
         if not self.session:
             return ToolResult(error="Not connected to MCP server")
 
+        started_at = time.perf_counter()
+        status = "error"
         try:
             logger.info(f"Executing tool: {self.original_name}")
+            from mcp.types import TextContent
+
             result = await self.session.call_tool(self.original_name, kwargs)
+            status = "error" if getattr(result, "isError", False) else "ok"
             content_str = ", ".join(
                 item.text for item in result.content if isinstance(item, TextContent)
             )
             return ToolResult(output=content_str or "No output returned.")
         except Exception as e:
             return ToolResult(error=f"Error executing tool: {str(e)}")
+        finally:
+            metrics.MCP_CALLS.inc(
+                server=self.server_id, tool=self.original_name, status=status
+            )
+            metrics.MCP_LATENCY.observe(
+                time.perf_counter() - started_at, server=self.server_id
+            )
 
 
 class MCPClients(ToolCollection):
@@ -39,7 +56,7 @@ class MCPClients(ToolCollection):
     A collection of tools that connects to multiple MCP servers and manages available tools through the Model Context Protocol.
     """
 
-    sessions: Dict[str, ClientSession] = {}
+    sessions: Dict[str, "ClientSession"] = {}
     exit_stacks: Dict[str, AsyncExitStack] = {}
     description: str = "MCP client tools for server interaction"
 
@@ -58,15 +75,19 @@ class MCPClients(ToolCollection):
         if server_id in self.sessions:
             await self.disconnect(server_id)
 
+        from mcp import ClientSession
+        from mcp.client.sse import sse_client
+
         exit_stack = AsyncExitStack()
         self.exit_stacks[server_id] = exit_stack
 
-        streams_context = sse_client(url=server_url)
-        streams = await exit_stack.enter_async_context(streams_context)
-        session = await exit_stack.enter_async_context(ClientSession(*streams))
-        self.sessions[server_id] = session
+        with startup_phase(f"connect MCP server {server_id}"):
+            streams_context = sse_client(url=server_url)
+            streams = await exit_stack.enter_async_context(streams_context)
+            session = await exit_stack.enter_async_context(ClientSession(*streams))
+            self.sessions[server_id] = session
 
-        await self._initialize_and_list_tools(server_id)
+            await self._initialize_and_list_tools(server_id)
 
     async def connect_stdio(
         self, command: str, args: List[str], server_id: str = ""
@@ -81,18 +102,22 @@ class MCPClients(ToolCollection):
         if server_id in self.sessions:
             await self.disconnect(server_id)
 
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
         exit_stack = AsyncExitStack()
         self.exit_stacks[server_id] = exit_stack
 
-        server_params = StdioServerParameters(command=command, args=args)
-        stdio_transport = await exit_stack.enter_async_context(
-            stdio_client(server_params)
-        )
-        read, write = stdio_transport
-        session = await exit_stack.enter_async_context(ClientSession(read, write))
-        self.sessions[server_id] = session
+        with startup_phase(f"connect MCP server {server_id}"):
+            server_params = StdioServerParameters(command=command, args=args)
+            stdio_transport = await exit_stack.enter_async_context(
+                stdio_client(server_params)
+            )
+            read, write = stdio_transport
+            session = await exit_stack.enter_async_context(ClientSession(read, write))
+            self.sessions[server_id] = session
 
-        await self._initialize_and_list_tools(server_id)
+            await self._initialize_and_list_tools(server_id)
 
     async def _initialize_and_list_tools(self, server_id: str) -> None:
         """Initialize session and populate tool map."""
@@ -102,6 +127,34 @@ class MCPClients(ToolCollection):
 
         await session.initialize()
         response = await session.list_tools()
+        self._register_server_tools(server_id, response)
+        logger.info(
+            f"Connected to server {server_id} with tools: {[tool.name for tool in response.tools]}"
+        )
+
+    async def refresh_tools(
+        self, responses: Optional[Dict[str, "ListToolsResult"]] = None
+    ) -> None:
+        """Rebuild the tool map from the tools of every connected server.
+
+        Args:
+            responses: list_tools responses by server id, e.g. from
+                list_tools_by_server(); the servers are asked when omitted
+        """
+        if responses is None:
+            responses = await self.list_tools_by_server()
+        for server_id, response in responses.items():
+            if server_id in self.sessions:
+                self._register_server_tools(server_id, response)
+
+    def _register_server_tools(
+        self, server_id: str, response: "ListToolsResult"
+    ) -> None:
+        """Replace the tools of a server with the ones from a list_tools response."""
+        session = self.sessions[server_id]
+        self.tool_map = {
+            k: v for k, v in self.tool_map.items() if v.server_id != server_id
+        }
 
         # Create proper tool objects for each server tool
         for tool in response.tools:
@@ -119,14 +172,20 @@ class MCPClients(ToolCollection):
             )
             self.tool_map[tool_name] = server_tool
 
-        # Update tools tuple
+        # Update tools tuple, this also drops the cached tool schemas
         self.tools = tuple(self.tool_map.values())
-        logger.info(
-            f"Connected to server {server_id} with tools: {[tool.name for tool in response.tools]}"
-        )
 
-    async def list_tools(self) -> ListToolsResult:
+    async def list_tools_by_server(self) -> Dict[str, "ListToolsResult"]:
+        """List the tools of each connected server, keyed by server id."""
+        return {
+            server_id: await session.list_tools()
+            for server_id, session in list(self.sessions.items())
+        }
+
+    async def list_tools(self) -> "ListToolsResult":
         """List all available tools."""
+        from mcp.types import ListToolsResult
+
         tools_result = ListToolsResult(tools=[])
         for session in self.sessions.values():
             response = await session.list_tools()
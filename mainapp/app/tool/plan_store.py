@@ -0,0 +1,198 @@
+"""Storage backends for PlanningTool plans.
+
+Plans are kept per namespace, so flows of different sessions never see each
+other's plans. Two backends are available, chosen with the ``[plan_store]``
+config section:
+
+- ``memory``: plans live for the life of the process and are shared by all
+  tools using the same namespace.
+- ``sqlite``: plans, including the output of each step, are written to a
+  SQLite database, so a flow restarted with the same plan id resumes after
+  its completed steps. Several processes can share the database file.
+
+Stores hand out copies, a plan changed by the caller is only stored by
+``save``. This keeps both backends behaving the same way.
+"""
+import copy
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import PROJECT_ROOT, PlanStoreSettings, config
+
+
+class PlanStore(ABC):
+    """Plans of one namespace, keyed by plan id."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    @abstractmethod
+    def get(self, plan_id: str) -> Optional[Dict]:
+        """Return a copy of the plan, or None if it does not exist."""
+
+    @abstractmethod
+    def add(self, plan: Dict) -> bool:
+        """Store a new plan, False if its plan id is already taken."""
+
+    @abstractmethod
+    def save(self, plan: Dict) -> None:
+        """Store a plan, replacing the stored version."""
+
+    @abstractmethod
+    def delete(self, plan_id: str) -> bool:
+        """Delete a plan, False if it did not exist."""
+
+    @abstractmethod
+    def list(self) -> List[Dict]:
+        """Copies of all plans, oldest first."""
+
+
+# Plans of every namespace of the memory backend, shared by the process
+_memory_plans: Dict[str, Dict[str, Dict]] = {}
+_memory_lock = threading.Lock()
+
+
+class InMemoryPlanStore(PlanStore):
+    """Process-wide plan store, lost when the process exits."""
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        with _memory_lock:
+            self.plans = _memory_plans.setdefault(namespace, {})
+
+    def get(self, plan_id: str) -> Optional[Dict]:
+        plan = self.plans.get(plan_id)
+        return copy.deepcopy(plan) if plan is not None else None
+
+    def add(self, plan: Dict) -> bool:
+        with _memory_lock:
+            if plan["plan_id"] in self.plans:
+                return False
+            self.plans[plan["plan_id"]] = copy.deepcopy(plan)
+        return True
+
+    def save(self, plan: Dict) -> None:
+        with _memory_lock:
+            self.plans[plan["plan_id"]] = copy.deepcopy(plan)
+
+    def delete(self, plan_id: str) -> bool:
+        with _memory_lock:
+            return self.plans.pop(plan_id, None) is not None
+
+    def list(self) -> List[Dict]:
+        return [copy.deepcopy(plan) for plan in list(self.plans.values())]
+
+
+class SQLitePlanStore(PlanStore):
+    """Plan store backed by a SQLite database file.
+
+    The database runs in WAL mode with a busy timeout, so flows in other
+    processes can read and write their own namespaces at the same time. All
+    stores of a process share one connection per database file.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS plans (
+            namespace TEXT NOT NULL,
+            plan_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (namespace, plan_id)
+        )
+    """
+
+    # Connection and its lock per database file
+    _connections: Dict[Path, Tuple[Any, threading.Lock]] = {}
+    _connections_lock = threading.Lock()
+
+    def __init__(self, namespace: str, path: str):
+        import sqlite3
+
+        super().__init__(namespace)
+        self._integrity_error = sqlite3.IntegrityError
+        self._conn, self._lock = self._connect((PROJECT_ROOT / path).resolve())
+
+    @classmethod
+    def _connect(cls, db_path: Path) -> Tuple[Any, threading.Lock]:
+        """The shared connection to a database file, opened on first use"""
+        import sqlite3
+
+        with cls._connections_lock:
+            shared = cls._connections.get(db_path)
+            if shared is None:
+                db_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(
+                    db_path, timeout=5.0, check_same_thread=False, isolation_level=None
+                )
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(cls._SCHEMA)
+                shared = cls._connections[db_path] = (conn, threading.Lock())
+            return shared
+
+    def _query(self, sql: str, *params) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, plan_id: str) -> Optional[Dict]:
+        rows = self._query(
+            "SELECT data FROM plans WHERE namespace = ? AND plan_id = ?",
+            self.namespace,
+            plan_id,
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def add(self, plan: Dict) -> bool:
+        now = time.time()
+        try:
+            self._query(
+                "INSERT INTO plans VALUES (?, ?, ?, ?, ?)",
+                self.namespace,
+                plan["plan_id"],
+                json.dumps(plan, ensure_ascii=False),
+                now,
+                now,
+            )
+        except self._integrity_error:
+            return False
+        return True
+
+    def save(self, plan: Dict) -> None:
+        now = time.time()
+        self._query(
+            "INSERT INTO plans VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (namespace, plan_id) "
+            "DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            self.namespace,
+            plan["plan_id"],
+            json.dumps(plan, ensure_ascii=False),
+            now,
+            now,
+        )
+
+    def delete(self, plan_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM plans WHERE namespace = ? AND plan_id = ?",
+                (self.namespace, plan_id),
+            )
+            return cursor.rowcount > 0
+
+    def list(self) -> List[Dict]:
+        rows = self._query(
+            "SELECT data FROM plans WHERE namespace = ? ORDER BY created_at",
+            self.namespace,
+        )
+        return [json.loads(data) for (data,) in rows]
+
+
+def create_plan_store(namespace: str = "default") -> PlanStore:
+    """Create the plan store configured in the ``[plan_store]`` section"""
+    settings = config.plan_store or PlanStoreSettings()
+    if settings.backend == "sqlite":
+        return SQLitePlanStore(namespace, settings.path)
+    return InMemoryPlanStore(namespace)
@@ -1,8 +1,11 @@
 # tool/planning.py
 from typing import Dict, List, Literal, Optional
 
+from pydantic import Field, model_validator
+
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, ToolResult
+from app.tool.plan_store import PlanStore, create_plan_store
 
 
 _PLANNING_TOOL_DESCRIPTION = """
@@ -15,6 +18,10 @@ class PlanningTool(BaseTool):
     """
     A planning tool that allows the agent to create and manage plans for solving complex tasks.
     The tool provides functionality for creating plans, updating plan steps, and tracking progress.
+
+    Plans are kept in a PlanStore under the tool's namespace; tools with the
+    same namespace share their plans, tools with different ones never see
+    each other's.
     """
 
     name: str = "planning"
@@ -61,14 +68,36 @@ class PlanningTool(BaseTool):
                 "description": "Additional notes for a step. Optional for mark_step command.",
                 "type": "string",
             },
+            "step_dependencies": {
+                "description": "For each step, the indices of earlier steps it needs results from. Steps whose dependencies are done can run in parallel, e.g. [[], [], [0, 1]] runs steps 0 and 1 together and step 2 after both. Optional for create and update commands; without it steps run one after another.",
+                "type": "array",
+                "items": {"type": "array", "items": {"type": "integer"}},
+            },
         },
         "required": ["command"],
         "additionalProperties": False,
     }
 
-    plans: dict = {}  # Dictionary to store plans by plan_id
+    namespace: str = Field("default", description="Plan store namespace")
+    store: Optional[PlanStore] = Field(None, exclude=True)
     _current_plan_id: Optional[str] = None  # Track the current active plan
 
+    @model_validator(mode="after")
+    def _init_store(self) -> "PlanningTool":
+        if self.store is None:
+            self.store = create_plan_store(self.namespace)
+        return self
+
+    def get_plan_data(self, plan_id: str) -> Optional[Dict]:
+        """A copy of the stored plan, or None if there is no such plan"""
+        return self.store.get(plan_id)
+
+    def _require_plan(self, plan_id: str) -> Dict:
+        plan = self.store.get(plan_id)
+        if plan is None:
+            raise ToolError(f"No plan found with ID: {plan_id}")
+        return plan
+
     async def execute(
         self,
         *,
@@ -83,6 +112,7 @@ class PlanningTool(BaseTool):
             Literal["not_started", "in_progress", "completed", "blocked"]
         ] = None,
         step_notes: Optional[str] = None,
+        step_dependencies: Optional[List[List[int]]] = None,
         **kwargs,
     ):
         """
@@ -96,12 +126,14 @@ class PlanningTool(BaseTool):
         - step_index: Index of the step to update (used with mark_step command)
         - step_status: Status to set for a step (used with mark_step command)
         - step_notes: Additional notes for a step (used with mark_step command)
+        - step_dependencies: Indices of earlier steps each step depends on
+          (used with create and update commands)
         """
 
         if command == "create":
-            return self._create_plan(plan_id, title, steps)
+            return self._create_plan(plan_id, title, steps, step_dependencies)
         elif command == "update":
-            return self._update_plan(plan_id, title, steps)
+            return self._update_plan(plan_id, title, steps, step_dependencies)
         elif command == "list":
             return self._list_plans()
         elif command == "get":
@@ -118,17 +150,16 @@ class PlanningTool(BaseTool):
             )
 
     def _create_plan(
-        self, plan_id: Optional[str], title: Optional[str], steps: Optional[List[str]]
+        self,
+        plan_id: Optional[str],
+        title: Optional[str],
+        steps: Optional[List[str]],
+        step_dependencies: Optional[List[List[int]]] = None,
     ) -> ToolResult:
         """Create a new plan with the given ID, title, and steps."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: create")
 
-        if plan_id in self.plans:
-            raise ToolError(
-                f"A plan with ID '{plan_id}' already exists. Use 'update' to modify existing plans."
-            )
-
         if not title:
             raise ToolError("Parameter `title` is required for command: create")
 
@@ -148,9 +179,17 @@ class PlanningTool(BaseTool):
             "steps": steps,
             "step_statuses": ["not_started"] * len(steps),
             "step_notes": [""] * len(steps),
+            "step_outputs": [""] * len(steps),
         }
+        if step_dependencies is not None:
+            plan["step_dependencies"] = self._validate_dependencies(
+                step_dependencies, len(steps)
+            )
 
-        self.plans[plan_id] = plan
+        if not self.store.add(plan):
+            raise ToolError(
+                f"A plan with ID '{plan_id}' already exists. Use 'update' to modify existing plans."
+            )
         self._current_plan_id = plan_id  # Set as active plan
 
         return ToolResult(
@@ -158,16 +197,17 @@ class PlanningTool(BaseTool):
         )
 
     def _update_plan(
-        self, plan_id: Optional[str], title: Optional[str], steps: Optional[List[str]]
+        self,
+        plan_id: Optional[str],
+        title: Optional[str],
+        steps: Optional[List[str]],
+        step_dependencies: Optional[List[List[int]]] = None,
     ) -> ToolResult:
         """Update an existing plan with new title or steps."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: update")
 
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
-
-        plan = self.plans[plan_id]
+        plan = self._require_plan(plan_id)
 
         if title:
             plan["title"] = title
@@ -184,37 +224,61 @@ class PlanningTool(BaseTool):
             old_steps = plan["steps"]
             old_statuses = plan["step_statuses"]
             old_notes = plan["step_notes"]
+            old_outputs = plan.get("step_outputs", [""] * len(old_steps))
 
             # Create new step statuses and notes
             new_statuses = []
             new_notes = []
+            new_outputs = []
+
+            # Old positions of each step text, so steps that moved keep their
+            # status too; the same position is preferred for repeated texts
+            positions: Dict[str, List[int]] = {}
+            for i, step in enumerate(old_steps):
+                positions.setdefault(step, []).append(i)
 
             for i, step in enumerate(steps):
-                # If the step exists at the same position in old steps, preserve status and notes
-                if i < len(old_steps) and step == old_steps[i]:
-                    new_statuses.append(old_statuses[i])
-                    new_notes.append(old_notes[i])
+                candidates = positions.get(step)
+                if candidates:
+                    old = i if i in candidates else candidates[0]
+                    candidates.remove(old)
+                    new_statuses.append(old_statuses[old])
+                    new_notes.append(old_notes[old])
+                    new_outputs.append(old_outputs[old])
                 else:
                     new_statuses.append("not_started")
                     new_notes.append("")
+                    new_outputs.append("")
 
             plan["steps"] = steps
             plan["step_statuses"] = new_statuses
             plan["step_notes"] = new_notes
+            plan["step_outputs"] = new_outputs
+            # Old indices may point at different steps now
+            if step_dependencies is None:
+                plan.pop("step_dependencies", None)
+
+        if step_dependencies is not None:
+            plan["step_dependencies"] = self._validate_dependencies(
+                step_dependencies, len(plan["steps"])
+            )
 
+        self.store.save(plan)
         return ToolResult(
             output=f"Plan updated successfully: {plan_id}\n\n{self._format_plan(plan)}"
         )
 
     def _list_plans(self) -> ToolResult:
         """List all available plans."""
-        if not self.plans:
+        plans = self.store.list()
+        if not plans:
             return ToolResult(
                 output="No plans available. Create a plan with the 'create' command."
             )
 
         output = "Available plans:\n"
-        for plan_id, plan in self.plans.items():
+        for plan in plans:
+            plan_id = plan["plan_id"]
             current_marker = " (active)" if plan_id == self._current_plan_id else ""
             completed = sum(
                 1 for status in plan["step_statuses"] if status == "completed"
@@ -235,10 +299,7 @@ class PlanningTool(BaseTool):
                 )
             plan_id = self._current_plan_id
 
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
-
-        plan = self.plans[plan_id]
+        plan = self._require_plan(plan_id)
         return ToolResult(output=self._format_plan(plan))
 
     def _set_active_plan(self, plan_id: Optional[str]) -> ToolResult:
@@ -246,12 +307,10 @@ class PlanningTool(BaseTool):
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: set_active")
 
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
-
+        plan = self._require_plan(plan_id)
         self._current_plan_id = plan_id
         return ToolResult(
-            output=f"Plan '{plan_id}' is now the active plan.\n\n{self._format_plan(self.plans[plan_id])}"
+            output=f"Plan '{plan_id}' is now the active plan.\n\n{self._format_plan(plan)}"
         )
 
     def _mark_step(
@@ -270,14 +329,11 @@ class PlanningTool(BaseTool):
                 )
             plan_id = self._current_plan_id
 
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
+        plan = self._require_plan(plan_id)
 
         if step_index is None:
             raise ToolError("Parameter `step_index` is required for command: mark_step")
 
-        plan = self.plans[plan_id]
-
         if step_index < 0 or step_index >= len(plan["steps"]):
             raise ToolError(
                 f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(plan['steps'])-1}."
@@ -299,6 +355,7 @@ class PlanningTool(BaseTool):
         if step_notes:
             plan["step_notes"][step_index] = step_notes
 
+        self.store.save(plan)
         return ToolResult(
             output=f"Step {step_index} updated in plan '{plan_id}'.\n\n{self._format_plan(plan)}"
         )
@@ -308,17 +365,55 @@ class PlanningTool(BaseTool):
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: delete")
 
-        if plan_id not in self.plans:
+        if not self.store.delete(plan_id):
             raise ToolError(f"No plan found with ID: {plan_id}")
 
-        del self.plans[plan_id]
-
         # If the deleted plan was the active plan, clear the active plan
         if self._current_plan_id == plan_id:
             self._current_plan_id = None
 
         return ToolResult(output=f"Plan '{plan_id}' has been deleted.")
 
+    @staticmethod
+    def _validate_dependencies(
+        step_dependencies: List[List[int]], step_count: int
+    ) -> List[List[int]]:
+        """Check that every step only depends on earlier steps, so plans stay acyclic"""
+        if (
+            not isinstance(step_dependencies, list)
+            or len(step_dependencies) != step_count
+        ):
+            raise ToolError(
+                f"Parameter `step_dependencies` must have one list per step "
+                f"({step_count})"
+            )
+        validated = []
+        for index, dependencies in enumerate(step_dependencies):
+            if not isinstance(dependencies, list) or not all(
+                isinstance(dep, int) and 0 <= dep < index for dep in dependencies
+            ):
+                raise ToolError(
+                    f"Invalid dependencies for step {index}: {dependencies}. "
+                    "Steps can only depend on earlier steps."
+                )
+            validated.append(sorted(set(dependencies)))
+        return validated
+
+    @staticmethod
+    def get_step_dependencies(plan: Dict) -> List[List[int]]:
+        """Dependencies per step, plans without them run their steps in order"""
+        dependencies = plan.get("step_dependencies")
+        if dependencies is None:
+            return [[index - 1] if index else [] for index in range(len(plan["steps"]))]
+        return dependencies
+
+    def set_step_output(self, plan_id: str, step_index: int, output: str) -> None:
+        """Keep the full output of a step, so a resumed flow can reuse it"""
+        plan = self._require_plan(plan_id)
+        outputs = plan.setdefault("step_outputs", [""] * len(plan["steps"]))
+        outputs[step_index] = output
+        self.store.save(plan)
+
     def _format_plan(self, plan: Dict) -> str:
         """Format a plan for display."""
         output = f"Plan: {plan['title']} (ID: {plan['plan_id']})\n"
@@ -356,7 +451,11 @@ class PlanningTool(BaseTool):
                 "blocked": "[!]",
             }.get(status, "[ ]")
 
-            output += f"{i}. {status_symbol} {step}\n"
+            output += f"{i}. {status_symbol} {step}"
+            dependencies = plan.get("step_dependencies")
+            if dependencies and dependencies[i]:
+                output += f" (after {', '.join(map(str, dependencies[i]))})"
+            output += "\n"
             if notes:
                 output += f"   Notes: {notes}\n"
 
@@ -0,0 +1,105 @@
+"""Name-based registry of the built-in tools.
+
+Tools are registered by name as ``"module:Class"`` paths, so looking up or
+listing tools does not import their modules. Agents and the MCP server
+create their tools through ``create_tool``, so heavy optional backends
+(browser_use, search libraries, docker, pandas) are only imported when a tool
+that needs them is actually created. ``lazy_tool`` goes one step further and
+also defers constructing the tool until it is first used.
+"""
+import inspect
+from importlib import import_module
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import Field, PrivateAttr
+
+from app.tool.base import BaseTool
+
+
+TOOL_REGISTRY: Dict[str, str] = {
+    "ask_human": "app.tool.ask_human:AskHuman",
+    "bash": "app.tool.bash:Bash",
+    "browser_use": "app.tool.browser_use_tool:BrowserUseTool",
+    "create_chat_completion": "app.tool.create_chat_completion:CreateChatCompletion",
+    "data_visualization": "app.tool.chart_visualization.data_visualization:DataVisualization",
+    "planning": "app.tool.planning:PlanningTool",
+    "python_execute": "app.tool.python_execute:PythonExecute",
+    "str_replace_editor": "app.tool.str_replace_editor:StrReplaceEditor",
+    "terminate": "app.tool.terminate:Terminate",
+    "visualization_preparation": "app.tool.chart_visualization.chart_prepare:VisualizationPrepare",
+    "web_search": "app.tool.web_search:WebSearch",
+}
+
+_classes: Dict[str, Type[BaseTool]] = {}
+
+
+def tool_names() -> List[str]:
+    """Names of all registered tools, without importing any of them"""
+    return list(TOOL_REGISTRY)
+
+
+def get_tool_class(name: str) -> Type[BaseTool]:
+    """Import and return the class registered under a tool name.
+
+    Raises:
+        KeyError: If no tool is registered under the name.
+    """
+    if name not in _classes:
+        module_name, class_name = TOOL_REGISTRY[name].split(":")
+        _classes[name] = getattr(import_module(module_name), class_name)
+    return _classes[name]
+
+
+def create_tool(name: str, **kwargs) -> BaseTool:
+    """Instantiate a registered tool by name"""
+    return get_tool_class(name)(**kwargs)
+
+
+class LazyTool(BaseTool):
+    """Stands in for a registered tool and creates it on first use.
+
+    Name, description and parameters are the tool class' defaults, so the
+    tool can be offered to the LLM without constructing it. Calls and public
+    attributes go to the tool, created on first access; cleanup() leaves a
+    tool that was never created alone.
+    """
+
+    registered_name: str
+    tool_kwargs: Dict[str, Any] = Field(default_factory=dict)
+
+    _tool: Optional[BaseTool] = PrivateAttr(default=None)
+
+    @property
+    def tool(self) -> BaseTool:
+        if self._tool is None:
+            self._tool = create_tool(self.registered_name, **self.tool_kwargs)
+        return self._tool
+
+    async def execute(self, **kwargs) -> Any:
+        return await self.tool(**kwargs)
+
+    async def cleanup(self) -> None:
+        cleanup = getattr(self._tool, "cleanup", None)
+        if cleanup is not None:
+            result = cleanup()
+            if inspect.isawaitable(result):
+                await result
+
+    def __getattr__(self, item: str) -> Any:
+        # Private attributes stay on the proxy, so probing them (e.g. by the
+        # memory profiler) does not create the tool
+        if item.startswith("_"):
+            return super().__getattr__(item)
+        return getattr(self.tool, item)
+
+
+def lazy_tool(name: str, **kwargs) -> LazyTool:
+    """A registered tool that is only constructed when first used"""
+    fields = get_tool_class(name).model_fields
+    return LazyTool(
+        name=fields["name"].default,
+        description=fields["description"].default,
+        parameters=fields["parameters"].default,
+        registered_name=name,
+        tool_kwargs=kwargs,
+    )
@@ -1,8 +1,27 @@
-from app.tool.search.baidu_search import BaiduSearchEngine
-from app.tool.search.base import WebSearchEngine
-from app.tool.search.bing_search import BingSearchEngine
-from app.tool.search.duckduckgo_search import DuckDuckGoSearchEngine
-from app.tool.search.google_search import GoogleSearchEngine
+from typing import TYPE_CHECKING
+
+from app.lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from app.tool.search.baidu_search import BaiduSearchEngine
+    from app.tool.search.base import WebSearchEngine
+    from app.tool.search.bing_search import BingSearchEngine
+    from app.tool.search.duckduckgo_search import DuckDuckGoSearchEngine
+    from app.tool.search.google_search import GoogleSearchEngine
+
+
+# Engines are imported on first access, each pulls in its own search library
+__getattr__ = lazy_exports(
+    __name__,
+    {
+        "BaiduSearchEngine": "app.tool.search.baidu_search",
+        "WebSearchEngine": "app.tool.search.base",
+        "BingSearchEngine": "app.tool.search.bing_search",
+        "DuckDuckGoSearchEngine": "app.tool.search.duckduckgo_search",
+        "GoogleSearchEngine": "app.tool.search.google_search",
+    },
+)
 
 
 __all__ = [
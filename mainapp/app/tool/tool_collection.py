@@ -1,13 +1,24 @@
 """Collection classes for managing multiple tools."""
-from typing import Any, Dict, List
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+from app import metrics
+from app.budget import current_budget
 from app.exceptions import ToolError
 from app.logger import logger
+from app.profiling.cpu import profile_phase
+from app.schema import ToolParams
 from app.tool.base import BaseTool, ToolFailure, ToolResult
 
 
 class ToolCollection:
-    """A collection of defined tools."""
+    """A collection of defined tools.
+
+    The function call schemas of the tools are built once and cached until the
+    tool set changes, either through ``add_tool``/``add_tools`` or by assigning
+    ``tools`` (as the MCP client does when servers connect or disconnect).
+    """
 
     class Config:
         arbitrary_types_allowed = True
@@ -16,23 +27,65 @@ class ToolCollection:
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
 
+    @property
+    def tools(self) -> Tuple[BaseTool, ...]:
+        return self._tools
+
+    @tools.setter
+    def tools(self, tools: Tuple[BaseTool, ...]) -> None:
+        self._tools = tuple(tools)
+        self.invalidate_params()
+
+    def invalidate_params(self) -> None:
+        """Drop the cached tool schemas, call after changing a tool in place"""
+        self._params: Optional[ToolParams] = None
+
     def __iter__(self):
         return iter(self.tools)
 
-    def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+    def to_params(self) -> ToolParams:
+        if self._params is None:
+            metrics.CACHE_LOOKUPS.inc(cache="tool_params", result="miss")
+            self._params = ToolParams([tool.to_param() for tool in self.tools])
+        else:
+            metrics.CACHE_LOOKUPS.inc(cache="tool_params", result="hit")
+        return self._params
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
     ) -> ToolResult:
         tool = self.tool_map.get(name)
         if not tool:
+            metrics.TOOL_CALLS.inc(tool=name, status="invalid")
             return ToolFailure(error=f"Tool {name} is invalid")
+
+        # Never let a tool outlive the run budget, it is cancelled at the deadline
+        budget = current_budget()
+        if budget is not None and budget.exhausted:
+            metrics.TOOL_CALLS.inc(tool=name, status="skipped")
+            return ToolFailure(
+                error=f"Tool {name} was not run: {budget.exceeded_reason()}"
+            )
+        timeout = budget.remaining_time() if budget is not None else None
+        started_at = time.perf_counter()
+        status = "error"
         try:
-            result = await tool(**tool_input)
+            async with asyncio.timeout(timeout) as deadline:
+                with profile_phase(f"tool.{name}"):
+                    result = await tool(**tool_input)
+            status = "error" if getattr(result, "error", None) else "ok"
             return result
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            status = "cancelled"
+            logger.warning(f"Tool {name} cancelled: run budget exhausted")
+            return ToolFailure(error=f"Tool {name} was cancelled: run budget exhausted")
         except ToolError as e:
             return ToolFailure(error=e.message)
+        finally:
+            metrics.TOOL_CALLS.inc(tool=name, status=status)
+            metrics.TOOL_LATENCY.observe(time.perf_counter() - started_at, tool=name)
 
     async def execute_all(self) -> List[ToolResult]:
         """Execute all tools in the collection sequentially."""
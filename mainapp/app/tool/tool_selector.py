@@ -0,0 +1,150 @@
+"""Relevance-based selection of the tool subset sent to the LLM each step."""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import ToolSelectionSettings, config
+from app.schema import Message, ToolParams
+from app.tool.tool_collection import ToolCollection
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from has have how i if in is it its me "
+    "my of on or please that the this to use used using was what when where which "
+    "will with you your".split()
+)
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, tool names split on underscores"""
+    return [
+        token
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in _STOPWORDS
+    ]
+
+
+class ToolIndex:
+    """BM25 index over the names and descriptions of a fixed tool set."""
+
+    K1 = 1.5
+    B = 0.75
+    # Name tokens are repeated so name matches outrank description matches
+    NAME_WEIGHT = 3
+
+    def __init__(self, params: ToolParams):
+        self.names: List[str] = []
+        self.term_freqs: List[Counter] = []
+        self.lengths: List[int] = []
+        doc_freqs: Counter = Counter()
+
+        for param in params:
+            function = param.get("function", {})
+            name = function.get("name", "")
+            tokens = _tokenize(name) * self.NAME_WEIGHT
+            tokens += _tokenize(function.get("description") or "")
+            term_freq = Counter(tokens)
+
+            self.names.append(name)
+            self.term_freqs.append(term_freq)
+            self.lengths.append(len(tokens))
+            doc_freqs.update(term_freq.keys())
+
+        count = len(self.names)
+        self.avg_length = (sum(self.lengths) / count) if count else 0.0
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (count - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freqs.items()
+        }
+
+    def rank(self, query: str) -> List[Tuple[float, str]]:
+        """Score every tool against the query, best first"""
+        query_terms = set(_tokenize(query))
+        scores = []
+        for name, term_freq, length in zip(self.names, self.term_freqs, self.lengths):
+            score = 0.0
+            norm = self.K1 * (1 - self.B + self.B * length / (self.avg_length or 1))
+            for term in query_terms & term_freq.keys():
+                freq = term_freq[term]
+                score += self.idf[term] * freq * (self.K1 + 1) / (freq + norm)
+            scores.append((score, name))
+        # Stable sort keeps the collection order for equal scores
+        return sorted(scores, key=lambda item: -item[0])
+
+
+class ToolSelector:
+    """Selects the tools most relevant to the current task and recent messages.
+
+    Tools are ranked with a local BM25 index over their names and descriptions.
+    The index is built once per tool set and reused until the collection's
+    cached schemas change. Pinned tools and tools called in the recent
+    messages are always included so the agent can keep using them.
+    """
+
+    def __init__(self, settings: Optional[ToolSelectionSettings] = None):
+        self.settings = settings or config.tool_selection or ToolSelectionSettings()
+        self._index: Optional[ToolIndex] = None
+        self._index_fingerprint: Optional[str] = None
+        self._subsets: Dict[Tuple[str, Tuple[str, ...]], ToolParams] = {}
+
+    def select(
+        self,
+        tools: ToolCollection,
+        messages: List[Message],
+        pinned: Iterable[str] = (),
+    ) -> ToolParams:
+        """Return the tool schemas to send for the next LLM call."""
+        params = tools.to_params()
+        if not self.settings.enabled or len(params) <= self.settings.min_tools:
+            return params
+
+        index = self._get_index(params)
+        keep = {name.lower() for name in self.settings.pinned_tools}
+        keep.update(name.lower() for name in pinned)
+        keep.update(self._recently_called(messages))
+
+        selected = {name for name in index.names if name.lower() in keep}
+        ranked = index.rank(self._build_query(messages))
+        for _, name in ranked[: self.settings.top_k]:
+            selected.add(name)
+
+        names = tuple(name for name in index.names if name in selected)
+        return self._get_subset(params, names)
+
+    def _get_index(self, params: ToolParams) -> ToolIndex:
+        if self._index_fingerprint != params.fingerprint:
+            self._index = ToolIndex(params)
+            self._index_fingerprint = params.fingerprint
+            self._subsets.clear()
+        return self._index
+
+    def _get_subset(self, params: ToolParams, names: Tuple[str, ...]) -> ToolParams:
+        """Build the subset once per distinct selection so its token count is reused"""
+        key = (params.fingerprint, names)
+        if key not in self._subsets:
+            wanted = set(names)
+            self._subsets[key] = ToolParams(
+                [param for param in params if param["function"]["name"] in wanted]
+            )
+        return self._subsets[key]
+
+    def _build_query(self, messages: List[Message]) -> str:
+        """The task (first user message) plus the most recent messages"""
+        parts = []
+        task = next((msg for msg in messages if msg.role == "user"), None)
+        if task and task.content:
+            parts.append(str(task.content))
+        for msg in messages[-self.settings.history_messages :]:
+            if msg is not task and msg.content:
+                parts.append(str(msg.content))
+        return "\n".join(parts)
+
+    def _recently_called(self, messages: List[Message]) -> List[str]:
+        return [
+            call.function.name.lower()
+            for msg in messages[-self.settings.history_messages :]
+            if msg.tool_calls
+            for call in msg.tool_calls
+        ]
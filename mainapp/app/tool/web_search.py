@@ -1,22 +1,34 @@
 import asyncio
+from importlib import import_module
 from typing import Any, Dict, List, Optional
 
-import requests
-from bs4 import BeautifulSoup
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from app import metrics
 from app.config import config
 from app.logger import logger
 from app.tool.base import BaseTool, ToolResult
-from app.tool.search import (
-    BaiduSearchEngine,
-    BingSearchEngine,
-    DuckDuckGoSearchEngine,
-    GoogleSearchEngine,
-    WebSearchEngine,
-)
-from app.tool.search.base import SearchItem
+from app.tool.search.base import SearchItem, WebSearchEngine
+
+
+# Engine modules import their search libraries at module level, so they are
+# only imported when an engine is first used
+_SEARCH_ENGINES: Dict[str, str] = {
+    "google": "app.tool.search.google_search:GoogleSearchEngine",
+    "baidu": "app.tool.search.baidu_search:BaiduSearchEngine",
+    "duckduckgo": "app.tool.search.duckduckgo_search:DuckDuckGoSearchEngine",
+    "bing": "app.tool.search.bing_search:BingSearchEngine",
+}
+_engine_instances: Dict[str, WebSearchEngine] = {}
+
+
+def _get_search_engine(name: str) -> WebSearchEngine:
+    if name not in _engine_instances:
+        module_name, class_name = _SEARCH_ENGINES[name].split(":")
+        engine_class = getattr(import_module(module_name), class_name)
+        _engine_instances[name] = engine_class()
+    return _engine_instances[name]
 
 
 class SearchResult(BaseModel):
@@ -118,6 +130,9 @@ class WebContentFetcher:
         Returns:
             Extracted text content or None if fetching fails
         """
+        import requests
+        from bs4 import BeautifulSoup
+
         headers = {
             "WebSearch": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
@@ -190,12 +205,6 @@ class WebSearch(BaseTool):
         },
         "required": ["query"],
     }
-    _search_engine: dict[str, WebSearchEngine] = {
-        "google": GoogleSearchEngine(),
-        "baidu": BaiduSearchEngine(),
-        "duckduckgo": DuckDuckGoSearchEngine(),
-        "bing": BingSearchEngine(),
-    }
     content_fetcher: WebContentFetcher = WebContentFetcher()
 
     async def execute(
@@ -295,15 +304,23 @@ class WebSearch(BaseTool):
         failed_engines = []
 
         for engine_name in engine_order:
-            engine = self._search_engine[engine_name]
+            engine = _get_search_engine(engine_name)
             logger.info(f"🔎 Attempting search with {engine_name.capitalize()}...")
-            search_items = await self._perform_search_with_engine(
-                engine, query, num_results, search_params
-            )
+            try:
+                search_items = await self._perform_search_with_engine(
+                    engine, query, num_results, search_params
+                )
+            except Exception:
+                metrics.SEARCH_ATTEMPTS.inc(engine=engine_name, status="error")
+                raise
 
             if not search_items:
+                metrics.SEARCH_ATTEMPTS.inc(engine=engine_name, status="empty")
+                failed_engines.append(engine_name)
                 continue
 
+            metrics.SEARCH_ATTEMPTS.inc(engine=engine_name, status="ok")
+
             if failed_engines:
                 logger.info(
                     f"Search successful with {engine_name.capitalize()} after trying: {', '.join(failed_engines)}"
@@ -372,15 +389,11 @@ class WebSearch(BaseTool):
         )
 
         # Start with preferred engine, then fallbacks, then remaining engines
-        engine_order = [preferred] if preferred in self._search_engine else []
+        engine_order = [preferred] if preferred in _SEARCH_ENGINES else []
         engine_order.extend(
-            [
-                fb
-                for fb in fallbacks
-                if fb in self._search_engine and fb not in engine_order
-            ]
+            [fb for fb in fallbacks if fb in _SEARCH_ENGINES and fb not in engine_order]
         )
-        engine_order.extend([e for e in self._search_engine if e not in engine_order])
+        engine_order.extend([e for e in _SEARCH_ENGINES if e not in engine_order])
 
         return engine_order
 
@@ -1,4 +1,11 @@
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
 import asyncio
+import sys
 
 from app.agent.manus import Manus
 from app.logger import logger
@@ -6,7 +13,12 @@ from app.logger import logger
 
 async def main():
     # Create and initialize Manus agent
-    agent = await Manus.create()
+    with startup.startup_phase("Manus.create()"):
+        agent = await Manus.create()
+    if startup.is_enabled():
+        # --profile-startup only covers startup, stop before prompting
+        await agent.cleanup()
+        return startup.finish()
     try:
         prompt = input("Enter your prompt: ")
         if not prompt.strip():
@@ -24,4 +36,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
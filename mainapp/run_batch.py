@@ -0,0 +1,180 @@
+"""Run a batch of prompts from a JSONL or CSV file.
+
+Each input record needs a prompt and may carry an id, the 1-based record
+number is used otherwise::
+
+    {"id": "report-eu", "prompt": "Write the daily report for EU sales"}
+
+    id,prompt
+    report-eu,Write the daily report for EU sales
+
+Prompts run concurrently, each on a fresh agent or flow with its own budget
+and sandbox. One JSON line per prompt is appended to the output file as soon
+as it finishes, with the result, token usage, cost and timings. Running the
+same command again skips the ids already completed successfully, so an
+interrupted batch resumes where it stopped.
+
+All runs share the process' LLM clients; set ``max_concurrent_requests`` in
+the ``[llm]`` config section to keep the batch under the provider's limits.
+"""
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Set
+
+from app.logger import logger
+from app.runner import DEFAULT_MAX_SECONDS, MODES, create_budget, run_prompt
+
+
+def read_prompts(path: Path, id_field: str, prompt_field: str) -> Iterator[Dict]:
+    """Yield {"id", "prompt"} records from a JSONL or CSV file"""
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for number, record in enumerate(records, start=1):
+            prompt = (record.get(prompt_field) or "").strip()
+            if not prompt:
+                logger.warning(f"Skipping record {number} without a prompt")
+                continue
+            record_id = record.get(id_field)
+            yield {
+                "id": str(record_id if record_id not in (None, "") else number),
+                "prompt": prompt,
+            }
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Ids with a successful result in an earlier output file"""
+    if not path.exists():
+        return set()
+    done = set()
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short when the previous run was killed
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+async def run_batch(args: argparse.Namespace) -> int:
+    output_path = Path(args.output)
+    done = completed_ids(output_path)
+    records = [
+        record
+        for record in read_prompts(Path(args.input), args.id_field, args.prompt_field)
+        if record["id"] not in done
+    ]
+    logger.info(
+        f"Running {len(records)} prompts, {args.concurrency} at a time "
+        f"({len(done)} already completed)"
+    )
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for record in records:
+        queue.put_nowait(record)
+    counts = {"ok": 0, "error": 0}
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("a", encoding="utf-8") as output:
+
+        def write(entry: Dict) -> None:
+            output.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            output.flush()
+            counts[entry["status"]] += 1
+
+        async def worker() -> None:
+            while not queue.empty():
+                record = queue.get_nowait()
+                budget = create_budget(args.max_seconds)
+                started_at = time.time()
+                entry = {"id": record["id"], "status": "ok"}
+                try:
+                    entry["result"] = await run_prompt(
+                        record["prompt"], args.mode, budget
+                    )
+                except asyncio.TimeoutError:
+                    entry.update(status="error", error="timed out")
+                except Exception as e:
+                    logger.error(f"Prompt {record['id']} failed: {e}")
+                    entry.update(status="error", error=str(e))
+                entry.update(
+                    input_tokens=budget.input_tokens,
+                    output_tokens=budget.output_tokens,
+                    cost=round(budget.cost, 6),
+                    models=budget.usage_by_model,
+                    elapsed=round(time.time() - started_at, 3),
+                    started_at=datetime.fromtimestamp(
+                        started_at, timezone.utc
+                    ).isoformat(),
+                    finished_at=datetime.now(timezone.utc).isoformat(),
+                )
+                write(entry)
+                logger.info(
+                    f"Prompt {record['id']} {entry['status']} in "
+                    f"{entry['elapsed']:.1f}s ({budget.summary()})"
+                )
+
+        await asyncio.gather(*(worker() for _ in range(max(args.concurrency, 1))))
+
+    logger.info(
+        f"Batch finished: {counts['ok']} ok, {counts['error']} failed, "
+        f"{len(done)} skipped as already completed"
+    )
+    return 1 if counts["error"] else 0
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="JSONL or CSV file with the prompts")
+    parser.add_argument(
+        "-o", "--output", required=True, help="JSONL file results are appended to"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=4, help="Prompts run at once"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="agent",
+        help="Run each prompt on a Manus agent or on a flow of that type",
+    )
+    parser.add_argument("--id-field", default="id", help="Field holding the id")
+    parser.add_argument(
+        "--prompt-field", default="prompt", help="Field holding the prompt"
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=DEFAULT_MAX_SECONDS,
+        help="Wall time per prompt unless [budget] max_seconds is set",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if startup.is_enabled():
+        # --profile-startup only covers startup, stop before running prompts
+        sys.exit(startup.finish())
+    try:
+        sys.exit(asyncio.run(run_batch(args)))
+    except KeyboardInterrupt:
+        logger.warning("Batch interrupted, rerun the command to resume")
+        sys.exit(130)
@@ -1,15 +1,33 @@
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
 import asyncio
+import sys
 import time
 
 from app.agent.manus import Manus
+from app.budget import RunBudget
 from app.flow.flow_factory import FlowFactory, FlowType
 from app.logger import logger
 
 
+# Wall time for a whole request unless [budget] max_seconds says otherwise
+DEFAULT_MAX_SECONDS = 3600
+
+
 async def run_flow():
-    agents = {
-        "manus": Manus(),
-    }
+    with startup.startup_phase("create agents"):
+        agents = {
+            "manus": Manus(),
+        }
+    if startup.is_enabled():
+        # --profile-startup only covers startup, stop before prompting
+        with startup.startup_phase("create flow"):
+            FlowFactory.create_flow(flow_type=FlowType.PLANNING, agents=agents)
+        return startup.finish()
 
     try:
         prompt = input("Enter your prompt: ")
@@ -18,9 +36,16 @@ async def run_flow():
             logger.warning("Empty prompt provided.")
             return
 
+        # The budget shrinks LLM and tool timeouts as the deadline approaches,
+        # so a single stuck call cannot eat the whole run
+        budget = RunBudget.from_config()
+        if budget.max_seconds is None:
+            budget.max_seconds = DEFAULT_MAX_SECONDS
+
         flow = FlowFactory.create_flow(
             flow_type=FlowType.PLANNING,
             agents=agents,
+            budget=budget,
         )
         logger.warning("Processing your request...")
 
@@ -28,13 +53,17 @@ async def run_flow():
             start_time = time.time()
             result = await asyncio.wait_for(
                 flow.execute(prompt),
-                timeout=3600,  # 60 minute timeout for the entire execution
+                # Backstop only, the budget normally stops the flow first
+                timeout=budget.max_seconds + 60,
             )
             elapsed_time = time.time() - start_time
             logger.info(f"Request processed in {elapsed_time:.2f} seconds")
+            logger.info(f"Run usage: {budget.summary()}")
             logger.info(result)
         except asyncio.TimeoutError:
-            logger.error("Request processing timed out after 1 hour")
+            logger.error(
+                f"Request processing timed out after {budget.max_seconds:.0f} seconds"
+            )
             logger.info(
                 "Operation terminated due to timeout. Please try a simpler request."
             )
@@ -46,4 +75,4 @@ async def run_flow():
 
 
 if __name__ == "__main__":
-    asyncio.run(run_flow())
+    sys.exit(asyncio.run(run_flow()))
@@ -0,0 +1,150 @@
+"""Submit agent jobs to the durable job queue and run its workers.
+
+    python run_jobs.py submit "Write the daily report for EU sales" --priority 5
+    python run_jobs.py work --processes 4
+    python run_jobs.py status <job id>
+    python run_jobs.py result <job id>
+
+Jobs are stored in the SQLite database of the ``[job_queue]`` config
+section, so they survive restarts; jobs of a crashed worker are retried by
+the others once their lease expires.
+"""
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
+import argparse
+import json
+import sys
+from typing import List
+
+from app.exceptions import JobNotFound
+from app.jobs.queue import FINISHED_STATUSES, SUCCEEDED, JobQueue
+from app.runner import MODES
+
+
+def submit(queue: JobQueue, args: argparse.Namespace) -> int:
+    prompt = sys.stdin.read() if args.prompt == "-" else args.prompt
+    if not prompt.strip():
+        print("A non-empty prompt is required", file=sys.stderr)
+        return 2
+    print(
+        queue.submit(
+            prompt.strip(),
+            mode=args.mode,
+            priority=args.priority,
+            max_attempts=args.max_attempts,
+            job_id=args.id,
+        )
+    )
+    return 0
+
+
+def status(queue: JobQueue, args: argparse.Namespace) -> int:
+    job = queue.get(args.job_id)
+    job.pop("result")
+    print(json.dumps(job, indent=2, ensure_ascii=False))
+    return 0
+
+
+def result(queue: JobQueue, args: argparse.Namespace) -> int:
+    job = queue.get(args.job_id)
+    if job["status"] == SUCCEEDED:
+        print(job["result"])
+        return 0
+    message = f"Job {args.job_id} is {job['status']}"
+    if job["status"] in FINISHED_STATUSES and job["error"]:
+        message += f": {job['error']}"
+    print(message, file=sys.stderr)
+    return 1
+
+
+def list_jobs(queue: JobQueue, args: argparse.Namespace) -> int:
+    for job in queue.list(status=args.status, limit=args.limit):
+        print(json.dumps(job, ensure_ascii=False))
+    print(json.dumps(queue.counts()), file=sys.stderr)
+    return 0
+
+
+def cancel(queue: JobQueue, args: argparse.Namespace) -> int:
+    if queue.cancel(args.job_id):
+        return 0
+    print(f"Job {args.job_id} already finished", file=sys.stderr)
+    return 1
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="Queue a prompt")
+    submit_parser.add_argument("prompt", help="The prompt, - to read it from stdin")
+    submit_parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="agent",
+        help="Run the prompt on a Manus agent or on a flow of that type",
+    )
+    submit_parser.add_argument(
+        "--priority", type=int, default=0, help="Higher priorities run first"
+    )
+    submit_parser.add_argument(
+        "--max-attempts", type=int, help="Attempts before the job fails"
+    )
+    submit_parser.add_argument(
+        "--id", help="Job id, resubmitting an existing id does nothing"
+    )
+    submit_parser.set_defaults(handler=submit)
+
+    for name, handler, help_text in (
+        ("status", status, "Show the state of a job"),
+        ("result", result, "Print the result of a succeeded job"),
+        ("cancel", cancel, "Cancel a queued or running job"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("job_id")
+        command.set_defaults(handler=handler)
+
+    list_parser = commands.add_parser("list", help="List jobs, newest first")
+    list_parser.add_argument("--status", help="Only jobs in this state")
+    list_parser.add_argument("--limit", type=int, default=100)
+    list_parser.set_defaults(handler=list_jobs)
+
+    work_parser = commands.add_parser("work", help="Run a pool of worker processes")
+    work_parser.add_argument(
+        "-p", "--processes", type=int, help="Worker processes, [job_queue] workers"
+    )
+    work_parser.add_argument(
+        "-j",
+        "--jobs-per-worker",
+        type=int,
+        help="Jobs per process, [job_queue] jobs_per_worker",
+    )
+    work_parser.add_argument(
+        "--exit-when-idle",
+        action="store_true",
+        help="Stop once the queue is empty instead of waiting for new jobs",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if startup.is_enabled():
+        # --profile-startup only covers startup
+        sys.exit(startup.finish())
+    if args.command == "work":
+        from app.jobs.worker import run_workers
+
+        run_workers(args.processes, args.jobs_per_worker, args.exit_when_idle)
+        sys.exit(0)
+    queue = JobQueue()
+    try:
+        sys.exit(args.handler(queue, args))
+    except JobNotFound as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        queue.close()
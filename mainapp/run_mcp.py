@@ -1,4 +1,10 @@
 #!/usr/bin/env python
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
 import argparse
 import asyncio
 import sys
@@ -91,12 +97,19 @@ def parse_args() -> argparse.Namespace:
 async def run_mcp() -> None:
     """Main entry point for the MCP runner."""
     args = parse_args()
-    runner = MCPRunner()
+    with startup.startup_phase("MCPRunner()"):
+        runner = MCPRunner()
 
     try:
-        await runner.initialize(args.connection, args.server_url)
-
-        if args.prompt:
+        with startup.startup_phase("connect MCP agent"):
+            await runner.initialize(args.connection, args.server_url)
+
+        if startup.is_enabled():
+            # --profile-startup only covers startup, exit after connecting
+            exit_code = startup.finish()
+            if exit_code:
+                sys.exit(exit_code)
+        elif args.prompt:
             await runner.run_single_prompt(args.prompt)
         elif args.interactive:
             await runner.run_interactive()
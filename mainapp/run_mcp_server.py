@@ -1,5 +1,13 @@
 # coding: utf-8
 # A shortcut to launch OpenManus MCP server, where its introduction also solves other import issues.
+import sys
+
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
 from app.mcp.server import MCPServer, parse_args
 
 
@@ -7,5 +15,11 @@ if __name__ == "__main__":
     args = parse_args()
 
     # Create and run server (maintaining original flow)
-    server = MCPServer()
+    with startup.startup_phase("MCPServer()"):
+        server = MCPServer()
+    if startup.is_enabled():
+        # --profile-startup only covers startup, exit before serving
+        with startup.startup_phase("register tools"):
+            server.register_all_tools()
+        sys.exit(startup.finish())
     server.run(transport=args.transport)
@@ -0,0 +1,34 @@
+from app.profiling import startup
+
+
+# Enabled before the imports below so they show up in the profile
+startup.enable_from_argv()
+
+import argparse
+import sys
+
+import uvicorn
+
+from app.agent.manus import Manus
+from app.config import ServerSettings, config
+from app.server.api import create_app
+from app.server.sessions import SessionManager
+
+
+def parse_args() -> argparse.Namespace:
+    settings = config.server or ServerSettings()
+    parser = argparse.ArgumentParser(description="Multi-session agent server")
+    parser.add_argument("--host", default=settings.host, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=settings.port, help="Port")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with startup.startup_phase("create app"):
+        manager = SessionManager(Manus.create, config.server or ServerSettings())
+        app = create_app(manager)
+    if startup.is_enabled():
+        # --profile-startup only covers startup, exit before serving
+        sys.exit(startup.finish())
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -1,7 +1,8 @@
-from typing import Dict
+from typing import Dict, Set
 from langchain_google_genai import ChatGoogleGenerativeAI
 from app.agent.manus import Manus
 from app.logger import logger
+from app.router import QueryRouter
 import asyncio
 from dotenv import load_dotenv
 import os
@@ -29,6 +30,32 @@ llm = ChatGoogleGenerativeAI(
 
 manus = Manus()
 
+# Scores queries locally, Gemini is only asked when the score is unsure
+router = QueryRouter(tools=manus.available_tools)
+
+# Warm-ups still running after a query was answered directly
+_warm_ups: Set[asyncio.Task] = set()
+
+
+def _finish_warm_up(task: asyncio.Task) -> None:
+    """Forget a parked warm-up and log it if it failed.
+
+    A failed warm-up is not retried here, Manus connects again on its next run.
+    """
+    _warm_ups.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Manus warm-up failed: {task.exception()}")
+
+
+async def classify(query: str) -> bool:
+    """Ask Gemini whether a query can be answered directly"""
+    analysis = await gemini.ainvoke(
+        f"""Is this a simple question for which i do not need any tools or llm and that can be answered directly?
+        Answer with just YES or NO.
+        Question: {query}"""
+    )
+    return analysis.content.strip().upper() == "YES"
+
 
 async def process_query(query: str) -> str:
     """
@@ -36,22 +63,21 @@ async def process_query(query: str) -> str:
     Simple queries go to Gemini, complex ones to Manus.
     """
     try:
-        # Quick complexity check using ainvoke for async operation
-        analysis = await gemini.ainvoke(
-            f"""Is this a simple question for which i do not need any tools or llm and that can be answered directly? 
-            Answer with just YES or NO.
-            Question: {query}"""
-        )
-
-        is_simple = analysis.content.strip().upper() == "YES"
+        # Manus connects its MCP servers while the query is routed
+        warm_up = asyncio.create_task(manus.warm_up())
+        route = await router.route(query, classify)
 
-        if is_simple:
+        if route.simple:
             logger.info("Using Gemini for simple query")
+            _warm_ups.add(warm_up)
+            warm_up.add_done_callback(_finish_warm_up)
             # Use ainvoke for async operation
             response = await llm.ainvoke(query)
             return response.content
         else:
             logger.info("Using Manus for complex task")
+            # Also wait for a warm-up an earlier query left running
+            await asyncio.gather(warm_up, *_warm_ups)
             return await manus.run(query)
 
     except Exception as e:
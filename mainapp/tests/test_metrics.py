@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from app import metrics
+from app.config import MetricsSettings
+
+
+REQUESTS = metrics.REGISTRY.counter(
+    "test_run_scope_requests_total", "Requests made by test runs", ("run",)
+)
+
+
+def test_overlapping_runs_are_dumped_separately(tmp_path, monkeypatch):
+    settings = MetricsSettings(json_dir=str(tmp_path))
+    monkeypatch.setattr(metrics, "_settings", lambda: settings)
+    a_started = asyncio.Event()
+    b_finished = asyncio.Event()
+
+    async def run_a() -> None:
+        with metrics.run_scope("A"):
+            REQUESTS.inc(run="A")
+            a_started.set()
+            await b_finished.wait()
+            REQUESTS.inc(run="A")
+
+    async def run_b() -> None:
+        await a_started.wait()
+        with metrics.run_scope("B"):
+            REQUESTS.inc(run="B")
+        b_finished.set()
+
+    async def main() -> None:
+        await asyncio.gather(run_a(), run_b())
+        # Runs started afterwards are still dumped, nested ones are not
+        with metrics.run_scope("C"):
+            with metrics.run_scope("C-inner"):
+                REQUESTS.inc(run="C")
+
+    asyncio.run(main())
+
+    dumps = {}
+    for path in tmp_path.glob("*.json"):
+        payload = json.loads(path.read_text())
+        samples = payload["metrics"][REQUESTS.name]["samples"]
+        dumps[payload["run"]] = {
+            sample["labels"]["run"]: sample["value"] for sample in samples
+        }
+    assert dumps == {"A": {"A": 2}, "B": {"B": 1}, "C": {"C": 1}}
+
+
+def test_runs_in_the_same_second_get_their_own_file(tmp_path, monkeypatch):
+    settings = MetricsSettings(json_dir=str(tmp_path))
+    monkeypatch.setattr(metrics, "_settings", lambda: settings)
+    for _ in range(3):
+        with metrics.run_scope("same"):
+            REQUESTS.inc(run="same")
+    assert len(list(tmp_path.glob("same_*.json"))) == 3